@@ -1,130 +1,287 @@
-from flask import Flask, jsonify, request, render_template_string, send_from_directory
+from flask import Flask, Response, abort, jsonify, request, render_template_string
 from flask_cors import CORS
 import subprocess
 import threading
 import time
-import json
 import os
+import re
 import sys
+import tempfile
+
+from comments import MAX_VIDEOS
+from database_helper import TikTokDatabase
+from export_dashboard_data import DATA_FILE, export_dashboard_data as run_export
+from event_bus import EventBus, format_sse
+from jobs import ACTIVE_STATES, JobManager
+from static_assets import AssetStore
+import metrics
 
 app = Flask(__name__)
 CORS(app)
 
-# Global variable to track scraping status
-scraping_status = {
-    "is_running": False,
-    "progress": 0,
-    "message": "",
-    "error": None
-}
-
-def run_scraping():
-    """Run the TikTok scraping process in a separate thread"""
-    global scraping_status
+# Validators and compressed variants for everything served from the repo root
+assets = AssetStore('.')
+
+# Exports write the same file, so run them one at a time
+export_lock = threading.Lock()
+
+def export_dashboard():
+    """Export dashboard data in-process and refresh the cached payload"""
+    with export_lock:
+        data = run_export()
+        assets.invalidate(DATA_FILE)
+    return data
+
+# Progress events for /api/status/stream subscribers
+events = EventBus()
+
+SCRAPE_TIMEOUT = int(os.environ.get('SCRAPE_TIMEOUT', '300'))
+# Passed to comments.py as --max-videos, so "video N of M" progress never overruns
+TRENDING_VIDEO_COUNT = MAX_VIDEOS
+STREAM_KEEPALIVE = 15
+
+VIDEO_LINE = re.compile(r'^Video (\d+):')
+VIDEO_ID_LINE = re.compile(r'^\s+Video ID: (\S+)')
+# The collector fetches videos concurrently, so comment lines name their video
+COMMENTS_LINE = re.compile(r'💬 (?:Added )?(\d+) (?:new )?comments(?: saved)?(?: for (\S+))?')
+
+def legacy_status(job=None):
+    """The original /api/status shape, derived from a job snapshot"""
+    if job is None:
+        return {"is_running": False, "progress": 0, "message": "", "error": None}
+    return {
+        "is_running": job["state"] in ACTIVE_STATES,
+        "progress": job["progress"],
+        "message": job["message"],
+        "error": job["error"],
+        "job_id": job["job_id"],
+        "state": job["state"],
+    }
+
+def publish_job(job, change):
+    """Forward job updates to stream subscribers"""
+    status = legacy_status(job.to_dict())
+    events.publish("status", status)
+    if change == "finished":
+        events.publish("done", status)
+
+jobs = JobManager(on_update=publish_job)
+
+def current_status():
+    """Status of the latest refresh job"""
+    latest = jobs.latest
+    return legacy_status(latest.to_dict() if latest else None)
+
+def publish_collector_line(job, line, video, indexes=None):
+    """Turn one line of comments.py output into per-video progress events
     
-    try:
-        scraping_status["is_running"] = True
-        scraping_status["progress"] = 0
-        scraping_status["message"] = "Starting TikTok scraping..."
-        scraping_status["error"] = None
-        
-        # Step 1: Run data collection
-        scraping_status["progress"] = 20
-        scraping_status["message"] = "Collecting trending videos..."
-        
-        # Use python executable path for better compatibility
-        python_executable = sys.executable
-        
-        result = subprocess.run([python_executable, "comments.py"], 
-                              capture_output=True, text=True, timeout=300)
-        
-        if result.returncode != 0:
-            raise Exception(f"Data collection failed: {result.stderr}")
-        
-        # Step 2: Export dashboard data
-        scraping_status["progress"] = 80
-        scraping_status["message"] = "Updating dashboard data..."
-        
-        result = subprocess.run([python_executable, "export_dashboard_data.py"], 
-                              capture_output=True, text=True, timeout=60)
-        
-        if result.returncode != 0:
-            raise Exception(f"Dashboard export failed: {result.stderr}")
-        
-        scraping_status["progress"] = 100
-        scraping_status["message"] = "Scraping completed successfully!"
-        
-    except subprocess.TimeoutExpired:
-        scraping_status["error"] = "Scraping timed out after 5 minutes"
-        scraping_status["message"] = "Error: Scraping timed out"
-    except Exception as e:
-        scraping_status["error"] = str(e)
-        scraping_status["message"] = f"Error: {str(e)}"
-    finally:
-        scraping_status["is_running"] = False
+    ``video`` holds the video announced last; ``indexes`` maps video ids to
+    their "Video N" index for comment lines that arrive out of order.
+    """
+    indexes = {} if indexes is None else indexes
+    match = VIDEO_LINE.match(line)
+    if match:
+        video.clear()
+        video["index"] = int(match.group(1))
+        progress = 20 + min(video["index"], TRENDING_VIDEO_COUNT) * 60 // TRENDING_VIDEO_COUNT
+        job.update(progress=min(progress, 79),
+                   message=f"Collecting video {video['index']} of {TRENDING_VIDEO_COUNT}...")
+        return
+    match = VIDEO_ID_LINE.match(line)
+    if match and video:
+        video["video_id"] = match.group(1)
+        indexes[video["video_id"]] = video["index"]
+        events.publish("video", dict(video, stage="started", job_id=job.job_id))
+        return
+    match = COMMENTS_LINE.search(line)
+    if match and match.group(2):
+        video_id = match.group(2)
+        events.publish("video", {"index": indexes.get(video_id), "video_id": video_id,
+                                 "comments": int(match.group(1)), "stage": "comments", "job_id": job.job_id})
+    elif match and video:
+        video["comments"] = int(match.group(1))
+        events.publish("video", dict(video, stage="comments", job_id=job.job_id))
+
+def run_collector(job):
+    """Run comments.py, streaming its output into progress events
+    
+    The process is killed when the job is cancelled or SCRAPE_TIMEOUT passes.
+    """
+    # Use python executable path for better compatibility
+    python_executable = sys.executable
+    
+    # The collector's run report is merged into this process's /metrics
+    fd, report_path = tempfile.mkstemp(prefix="collector-", suffix=".json")
+    os.close(fd)
+    process = subprocess.Popen([python_executable, "-u", "comments.py", "--metrics-report", report_path,
+                                "--max-videos", str(TRENDING_VIDEO_COUNT)],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, bufsize=1, encoding="utf-8", errors="replace",
+                               env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+    deadline = time.time() + SCRAPE_TIMEOUT
+    timed_out = threading.Event()
+    
+    def watch():
+        while process.poll() is None:
+            if job.cancel_event.wait(0.5) or time.time() > deadline:
+                if not job.cancel_event.is_set():
+                    timed_out.set()
+                process.kill()
+                return
+    
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+    
+    video, indexes = {}, {}
+    for line in process.stdout:
+        publish_collector_line(job, line.rstrip("\n"), video, indexes)
+    returncode = process.wait()
+    stderr_thread.join()
+    watcher.join()
+    if os.path.getsize(report_path):
+        metrics.merge_report(report_path)
+    os.remove(report_path)
+    
+    job.check_cancelled()
+    if timed_out.is_set():
+        raise Exception(f"Scraping timed out after {SCRAPE_TIMEOUT}s")
+    if returncode != 0:
+        raise Exception(f"Data collection failed: {''.join(stderr_lines)}")
+
+def refresh_job(job):
+    """Collect fresh data and export the dashboard, as a background job"""
+    # Step 1: Run data collection
+    with job.stage("collect", progress=20, message="Collecting trending videos..."), \
+            metrics.STAGE_SECONDS.time(script="app", stage="collect"):
+        run_collector(job)
+    
+    # Step 2: Export dashboard data
+    with job.stage("export", progress=80, message="Updating dashboard data..."), \
+            metrics.STAGE_SECONDS.time(script="app", stage="export"):
+        try:
+            export_dashboard()
+        except Exception as e:
+            raise Exception(f"Dashboard export failed: {e}")
+    
+    job.update(progress=100, message="Scraping completed successfully!")
 
 @app.route('/')
 def index():
     """Serve the main dashboard page"""
-    return send_from_directory('.', 'index.html')
+    return serve_static('index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    """Serve static files (CSS, JS, JSON)"""
-    return send_from_directory('.', filename)
+    """Serve static files (CSS, JS, JSON) with ETags and gzip/brotli variants"""
+    resp = assets.response(filename, request)
+    if resp is None:
+        abort(404)
+    return resp
 
 @app.route('/api/refresh', methods=['POST'])
 def refresh_data():
-    """Start the TikTok scraping process"""
-    global scraping_status
-    
-    if scraping_status["is_running"]:
-        return jsonify({"error": "Scraping already in progress"}), 400
-    
-    # Start scraping in a separate thread
-    thread = threading.Thread(target=run_scraping)
-    thread.daemon = True
-    thread.start()
-    
-    return jsonify({"message": "Scraping started", "status": "running"})
+    """Start a refresh job, or attach to the one already running"""
+    job, created = jobs.submit("refresh", refresh_job)
+    return jsonify({
+        "message": "Scraping started" if created else "Scraping already in progress",
+        "status": "running",
+        "job_id": job.job_id,
+        "attached": not created
+    })
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get the current scraping status"""
-    global scraping_status
-    return jsonify(scraping_status)
+    return jsonify(current_status())
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Recent refresh jobs with per-stage timings"""
+    limit = request.args.get('limit', default=20, type=int)
+    return jsonify({"jobs": jobs.history(min(max(limit, 1), 200))})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """One job by id"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Ask a queued or running job to stop"""
+    if not jobs.cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 404
+    return jsonify({"message": "Cancellation requested", "job_id": job_id})
+
+@app.route('/api/status/stream', methods=['GET'])
+def stream_status():
+    """Push status, per-video and completion events as Server-Sent Events"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = events.subscribe(last_event_id)
+    
+    def generate():
+        try:
+            # Start every stream with the current state
+            yield format_sse({"id": 0, "event": "status", "data": current_status()})
+            while True:
+                event = subscription.get(timeout=STREAM_KEEPALIVE)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/export', methods=['POST'])
 def export_dashboard_data():
     """Manually export dashboard data"""
     try:
-        # Use python executable path for better compatibility
-        python_executable = sys.executable
-        
-        result = subprocess.run([python_executable, "export_dashboard_data.py"], 
-                              capture_output=True, text=True, timeout=60)
-        
-        if result.returncode != 0:
-            return jsonify({"error": f"Export failed: {result.stderr}"}), 500
-        
+        export_dashboard()
         return jsonify({"message": "Dashboard data exported successfully"})
-    except subprocess.TimeoutExpired:
-        return jsonify({"error": "Export timed out"}), 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": f"Export failed: {e}"}), 500
 
 @app.route('/api/dashboard-data', methods=['GET'])
 def get_dashboard_data():
     """Get the current dashboard data"""
     try:
-        with open('dashboard_data.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
-    except FileNotFoundError:
-        return jsonify({"error": "Dashboard data not found"}), 404
+        resp = assets.response(DATA_FILE, request, mimetype='application/json')
+        if resp is None:
+            return jsonify({"error": "Dashboard data not found"}), 404
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/search', methods=['GET'])
+def search_comments():
+    """Full-text comment search: ?q=&video_id=&author=&min_likes=&limit=&offset="""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing search query (q)"}), 400
+    with TikTokDatabase(read_only=True) as db:
+        page = db.search_comments(
+            query,
+            video_id=request.args.get('video_id') or None,
+            author=request.args.get('author') or None,
+            min_likes=request.args.get('min_likes', default=0, type=int),
+            limit=request.args.get('limit', default=20, type=int),
+            offset=request.args.get('offset', default=0, type=int),
+        )
+    return jsonify(page)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Refresh timings and counters in the Prometheus text format"""
+    return Response(metrics.REGISTRY.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for deployment platforms"""
@@ -133,4 +290,4 @@ def health_check():
 if __name__ == '__main__':
     # Get port from environment variable (for deployment platforms)
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=False, host='0.0.0.0', port=port) 
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=port, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark the parallel phrase engine against the serial counting path.
+
+Counts synthetic comments with 1..N worker processes, checks that every
+run matches the serial Counter (same counts, same first-seen order) and
+prints the speedup.
+
+    python benchmarks/bench_phrase_engine.py --comments 300000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phrase_engine import count_phrases_parallel
+from synthetic_data import synthetic_comment_text
+from text_analytics import count_comment_phrases, count_extract_phrases
+
+COUNTERS = {
+    "database": count_comment_phrases,
+    "fetch": count_extract_phrases,
+}
+
+
+def run(n_comments: int, workers_list: list, profile: str, seed: int = 42) -> bool:
+    rng = random.Random(seed)
+    texts = [synthetic_comment_text(rng) for _ in range(n_comments)]
+    count = COUNTERS[profile]
+
+    started = time.perf_counter()
+    expected = count(texts)
+    serial = time.perf_counter() - started
+    print(f"📊 {profile} counter, {n_comments:,} comments, {len(expected):,} distinct phrases, "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"   serial     {serial:7.2f}s")
+
+    identical = True
+    for workers in workers_list:
+        started = time.perf_counter()
+        result = count_phrases_parallel(texts, count, workers=workers)
+        elapsed = time.perf_counter() - started
+        same = result == expected and list(result) == list(expected)
+        identical = identical and same
+        print(f"   {workers:2d} workers {elapsed:7.2f}s  {serial / elapsed:5.2f}x  "
+              f"{'✅ identical' if same else '❌ differs'}")
+    return identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel phrase counting")
+    parser.add_argument("--comments", type=int, default=300_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--profile", choices=sorted(COUNTERS), default="database")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.comments, sorted(set(args.workers)), args.profile) else 1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark comment search latency on a synthetic corpus.
+
+Seeds a database (one million comments by default, see synthetic_data.py)
+unless --db points at an existing one, then times search_comments for a
+mix of queries and filters and prints p50/p95/max per query. Counting
+the matches of one query is timed with FTS5 and with a LIKE scan.
+
+    python benchmarks/bench_search.py --comments 1000000
+    python benchmarks/bench_search.py --db synthetic.db --repeat 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_helper import TikTokDatabase
+from synthetic_data import seed_database
+
+# (label, query, filters); synthetic comments use a 50-word vocabulary, so
+# single common words match a large share of the corpus
+QUERIES = [
+    ("common word", "funny", {}),
+    ("rare word", "cooking", {}),
+    ("two words", "cat dance", {}),
+    ("three words", "queen slay iconic", {}),
+    ("prefix", "leg*", {}),
+    ("page 5", "cute dog", {"offset": 80}),
+    ("min likes", "funny", {"min_likes": 20}),
+    ("by video", "funny", {"video_id": "syn000000042"}),
+    ("by author", "love", {"author": "commenter123"}),
+]
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(db_path: str, repeat: int) -> bool:
+    with TikTokDatabase(db_path) as db:
+        with db.connection() as conn:
+            n_comments = conn.execute('SELECT COUNT(*) FROM comments').fetchone()[0]
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'comments_fts'").fetchone() is not None
+        print(f"🔎 {n_comments:,} comments, {'FTS5 index' if has_fts else 'no FTS5 (LIKE fallback)'}, "
+              f"{repeat} runs per query")
+
+        ok = True
+        for label, query, filters in QUERIES:
+            timings, results = [], 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                page = db.search_comments(query, limit=20, **filters)
+                timings.append((time.perf_counter() - started) * 1000)
+                results = len(page["results"])
+            ok = ok and results > 0
+            print(f"   {'✅' if results else '❌'} {label:<12} p50 {statistics.median(timings):8.2f} ms  "
+                  f"p95 {percentile(timings, 0.95):8.2f} ms  max {max(timings):8.2f} ms  ({results} results)")
+
+        # "Which comments mention X" without the index: a full LIKE scan
+        with db.connection() as conn:
+            for label, sql, params in [
+                ("FTS5 count", "SELECT COUNT(*) FROM comments_fts WHERE comments_fts MATCH ?", ('"cat" "dance"',)),
+                ("LIKE count", "SELECT COUNT(*) FROM comments WHERE text LIKE ? AND text LIKE ?", ('%cat%', '%dance%')),
+            ]:
+                if label.startswith("FTS5") and not has_fts:
+                    continue
+                started = time.perf_counter()
+                matches = conn.execute(sql, params).fetchone()[0]
+                print(f"   {label} for 'cat dance': {(time.perf_counter() - started) * 1000:8.2f} ms "
+                      f"({matches:,} matches)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full-text comment search")
+    parser.add_argument("--comments", type=int, default=1_000_000)
+    parser.add_argument("--db", help="Existing database to search instead of seeding a new one")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.db:
+        sys.exit(0 if run(args.db, args.repeat) else 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search.db")
+        seed_database(db_path, n_comments=args.comments)
+        sys.exit(0 if run(db_path, args.repeat) else 1)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for ingest, phrase ranking, export and serving.
+
+Every benchmark runs on synthetic data (synthetic_data.py) in a temporary
+directory, once per corpus size, and is timed `--repeat` times:
+
+- insert_video / insert_comments / insert_hashtags: rows per second
+  through TikTokDatabase, one call per video as the collectors make them
+- extract_phrases: fetch_tikhub's exact phrase ranking over N comments
+- get_top_phrases: the database ranking over a seeded N-comment database
+- export_dashboard_data: wall time of a full export from that database
+- api_dashboard_data: /api/dashboard-data requests per second through the
+  Flask test client (full body, gzip, and 304 revalidation)
+
+Results are written as JSON (benchmarks/results/ by default) with the
+commit and machine they ran on. `--compare` checks a run against an
+earlier results file and exits non-zero when any median slowed down by
+more than `--threshold`.
+
+    python benchmarks/run_benchmarks.py                        # 10^3..10^5
+    python benchmarks/run_benchmarks.py --max-size 1000000     # up to 10^6
+    python benchmarks/run_benchmarks.py --only insert --repeat 10
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --load new.json --compare old.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database_helper import TikTokDatabase
+from synthetic_data import HASHTAGS, seed_database, synthetic_comment_text
+
+RESULTS_FORMAT = 1
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+COMMENTS_PER_VIDEO = 20
+HASHTAGS_PER_VIDEO = 5
+API_REQUESTS = 500
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, unit: str, max_size: Optional[int] = None, variants: tuple = (None,)):
+    """Register fn(size, variant, workdir, repeat) -> list of timings in seconds
+
+    Each timing covers `size` units of work (rows, comments), or one run
+    over a `size`-comment database for unit "runs".
+    """
+    def register(fn: Callable):
+        BENCHMARKS.append({"name": name, "unit": unit, "max_size": max_size,
+                           "variants": variants, "fn": fn})
+        return fn
+    return register
+
+
+def measure(run: Callable, setup: Optional[Callable] = None, repeat: int = 5) -> List[float]:
+    """Time run(state) `repeat` times, with a fresh state from setup() outside the timing"""
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - started)
+        if hasattr(state, "close"):
+            state.close()
+    return timings
+
+
+def quietly(fn: Callable, *args, **kwargs):
+    """Call fn with its progress prints swallowed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+# Synthetic rows in the shapes the insert methods take
+
+def synthetic_videos(n: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    return [{
+        "video_id": f"bench{i:09d}",
+        "video_url": f"https://www.tiktok.com/@user{i % 997}/video/bench{i:09d}",
+        "author": f"user{i % 997}",
+        "cover": f"https://example.com/cover/{i}.jpg",
+        "stats": {"diggCount": rng.randint(0, 5_000_000), "commentCount": rng.randint(0, 50_000),
+                  "shareCount": rng.randint(0, 20_000), "playCount": rng.randint(0, 50_000_000)},
+        "create_time": 1_700_000_000 + i,
+    } for i in range(n)]
+
+
+def synthetic_comments(n: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    return [{
+        "comment_id": f"benchc{i:010d}",
+        "text": synthetic_comment_text(rng),
+        "author": f"commenter{rng.randrange(50_000)}",
+        "likes_count": int(rng.paretovariate(1.2)) - 1,
+    } for i in range(n)]
+
+
+def fresh_database(workdir: str, videos: List[Dict] = ()) -> TikTokDatabase:
+    """An empty, migrated database holding `videos`"""
+    fd, path = tempfile.mkstemp(dir=workdir, suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    db = TikTokDatabase(path)
+    with db.connection():
+        pass
+    for video in videos:
+        db.insert_video(video)
+    return db
+
+
+def per_video(items: List, chunk: int) -> List[tuple]:
+    """(video_id, items) calls of `chunk` items each"""
+    return [(f"bench{i // chunk:09d}", items[i:i + chunk]) for i in range(0, len(items), chunk)]
+
+
+_seeded = {}
+
+
+def seeded_database(workdir: str, n_comments: int) -> str:
+    """Path of a synthetic database with n_comments comments, seeded once per run"""
+    if n_comments not in _seeded:
+        path = os.path.join(workdir, f"seeded-{n_comments}.db")
+        quietly(seed_database, path, n_comments=n_comments)
+        _seeded[n_comments] = path
+    return _seeded[n_comments]
+
+
+# Benchmarks
+
+@benchmark("insert_video", "videos", max_size=10 ** 4)
+def bench_insert_video(size, variant, workdir, repeat):
+    videos = synthetic_videos(size)
+
+    def run(db):
+        for video in videos:
+            db.insert_video(video)
+    return measure(run, lambda: fresh_database(workdir), repeat)
+
+
+@benchmark("insert_comments", "comments")
+def bench_insert_comments(size, variant, workdir, repeat):
+    calls = per_video(synthetic_comments(size), COMMENTS_PER_VIDEO)
+    videos = synthetic_videos(len(calls))
+
+    def run(db):
+        for video_id, comments in calls:
+            db.insert_comments(video_id, comments)
+    return measure(run, lambda: fresh_database(workdir, videos), repeat)
+
+
+@benchmark("insert_hashtags", "hashtags", max_size=10 ** 5)
+def bench_insert_hashtags(size, variant, workdir, repeat):
+    rng = random.Random(42)
+    calls = per_video([rng.choice(HASHTAGS) + str(i % 50) for i in range(size)], HASHTAGS_PER_VIDEO)
+    videos = synthetic_videos(len(calls))
+
+    def run(db):
+        for video_id, hashtags in calls:
+            db.insert_hashtags(video_id, hashtags)
+    return measure(run, lambda: fresh_database(workdir, videos), repeat)
+
+
+@benchmark("extract_phrases", "comments")
+def bench_extract_phrases(size, variant, workdir, repeat):
+    from fetch_tikhub import extract_phrases
+    rng = random.Random(42)
+    texts = [synthetic_comment_text(rng) for _ in range(size)]
+    return measure(lambda _: extract_phrases(texts, 30, approximate=False), repeat=repeat)
+
+
+@benchmark("get_top_phrases", "runs")
+def bench_get_top_phrases(size, variant, workdir, repeat):
+    with TikTokDatabase(seeded_database(workdir, size), read_only=True) as db:
+        return measure(lambda _: db.get_top_phrases(30, approximate=False), repeat=repeat)
+
+
+@benchmark("export_dashboard_data", "runs")
+def bench_export_dashboard_data(size, variant, workdir, repeat):
+    from export_dashboard_data import export_dashboard_data
+    db_path = seeded_database(workdir, size)
+    data_file = os.path.join(workdir, f"dashboard-{size}.json")
+    return measure(lambda _: quietly(export_dashboard_data, db_path, data_file), repeat=repeat)
+
+
+@benchmark("api_dashboard_data", "requests", max_size=10 ** 5, variants=("full", "gzip", "304"))
+def bench_api_dashboard_data(size, variant, workdir, repeat):
+    """API_REQUESTS requests for the dashboard exported from a `size`-comment database"""
+    import app as app_module
+    from export_dashboard_data import DATA_FILE, export_dashboard_data
+    from static_assets import AssetStore
+
+    site = os.path.join(workdir, f"site-{size}")
+    os.makedirs(site, exist_ok=True)
+    quietly(export_dashboard_data, seeded_database(workdir, size), os.path.join(site, DATA_FILE))
+    app_module.assets = AssetStore(site)
+    client = app_module.app.test_client()
+
+    headers = {}
+    if variant == "gzip":
+        headers["Accept-Encoding"] = "gzip"
+    elif variant == "304":
+        headers["If-None-Match"] = client.get("/api/dashboard-data").headers["ETag"]
+    expected = 304 if variant == "304" else 200
+    if client.get("/api/dashboard-data", headers=headers).status_code != expected:
+        raise RuntimeError(f"/api/dashboard-data did not answer {expected}")
+
+    def run(_):
+        for _ in range(API_REQUESTS):
+            client.get("/api/dashboard-data", headers=headers)
+    return measure(run, repeat=repeat)
+
+
+def units_for(bench: Dict, size: int) -> int:
+    return {"requests": API_REQUESTS, "runs": 1}.get(bench["unit"], size)
+
+
+def summarize(timings: List[float], units: int) -> Dict:
+    median = statistics.median(timings)
+    return {
+        "timings": [round(t, 6) for t in timings],
+        "min": round(min(timings), 6),
+        "median": round(median, 6),
+        "mean": round(statistics.mean(timings), 6),
+        "stdev": round(statistics.stdev(timings), 6) if len(timings) > 1 else 0.0,
+        "units": units,
+        "per_second": round(units / median, 1) if median else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(sizes: List[int], repeat: int, only: List[str]) -> Dict:
+    """Run every selected benchmark at every size it supports"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for bench in BENCHMARKS:
+            if only and not any(pattern in bench["name"] for pattern in only):
+                continue
+            for size in sizes:
+                if bench["max_size"] and size > bench["max_size"]:
+                    continue
+                for variant in bench["variants"]:
+                    key = f"{bench['name']}[{size}{'-' + variant if variant else ''}]"
+                    try:
+                        timings = bench["fn"](size, variant, workdir, repeat)
+                    except Exception as e:
+                        print(f"   ❌ {key:<40} {e}")
+                        continue
+                    result = dict(summarize(timings, units_for(bench, size)), unit=bench["unit"])
+                    results[key] = result
+                    print(f"   ✅ {key:<40} median {result['median'] * 1000:10.2f} ms  "
+                          f"{result['per_second']:>12,.0f} {bench['unit']}/s")
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Print median changes per benchmark; return the keys that slowed down past threshold"""
+    print(f"📊 Comparing {current.get('commit') or 'current'} against {baseline.get('commit') or 'baseline'} "
+          f"(regression above +{threshold:.0%})")
+    regressions = []
+    for key, result in current["results"].items():
+        before = baseline["results"].get(key)
+        if not before or not before["median"]:
+            continue
+        change = result["median"] / before["median"] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(key)
+        marker = "❌" if regressed else ("🚀" if change < -threshold else "✅")
+        print(f"   {marker} {key:<40} {before['median'] * 1000:10.2f} → {result['median'] * 1000:10.2f} ms  "
+              f"{change:+7.1%}")
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    if missing:
+        print(f"   ⏭️ Not in this run: {', '.join(missing)}")
+    return regressions
+
+
+def save_results(results: Dict, path: Optional[str] = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{results.get('commit') or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    if results.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"{path}: unsupported results format {results.get('format')}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest, phrase ranking, export and API serving")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Corpus sizes (default: SIZES up to --max-size)")
+    parser.add_argument("--max-size", type=int, default=10 ** 5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", default=[], help="Run benchmarks whose name contains any of these")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--load", metavar="PATH", help="Use an existing results file instead of running")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Median slowdown that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.load:
+        current = load_results(args.load)
+    else:
+        sizes = sorted(args.sizes or [size for size in SIZES if size <= args.max_size])
+        print(f"⏱️ Benchmarks at sizes {sizes}, {args.repeat} runs each")
+        current = run_suite(sizes, max(1, args.repeat), args.only)
+        print(f"💾 Results saved to {save_results(current, args.output)}")
+
+    if args.compare:
+        regressions = compare(load_results(args.compare), current, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
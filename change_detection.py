@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Change detection for incremental refreshes.
+
+A trending list is mostly the same videos from one run to the next, and
+refetching comments for a video whose counters have barely moved spends
+API quota for nothing. This module compares the fresh stats of a video
+with the stats stored when its comments were last fetched, and schedules
+a comment fetch only when the change passes a threshold.
+
+The stored stats are the baseline of the last fetch, not of the last
+sighting. Skipped videos keep their old baseline, so slow growth builds
+up across runs until it crosses the threshold.
+
+Baselines come from the `videos` table (comments.py) or from
+`refresh_state.json` (fetch_tikhub.py, which has no database).
+"""
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Configuration
+MIN_COMMENT_DELTA = int(os.environ.get("CHANGE_MIN_COMMENT_DELTA", "5"))
+MIN_LIKES_RATIO = float(os.environ.get("CHANGE_MIN_LIKES_RATIO", "0.10"))
+MIN_PLAYS_RATIO = float(os.environ.get("CHANGE_MIN_PLAYS_RATIO", "0.10"))
+MAX_BASELINE_AGE = int(os.environ.get("CHANGE_MAX_BASELINE_AGE", str(3 * 24 * 3600)))
+STATE_MAX_AGE = int(os.environ.get("CHANGE_STATE_MAX_AGE", str(14 * 24 * 3600)))
+
+# TikTok API stats keys -> videos table columns
+STAT_COLUMNS = {
+    "commentCount": "comment_count",
+    "diggCount": "likes_count",
+    "playCount": "play_count",
+    "shareCount": "share_count",
+}
+
+
+def normalize_stats(stats: Dict) -> Dict[str, int]:
+    """Map TikTok stats (camelCase) to videos-table column names."""
+    return {column: int(stats.get(key) or 0) for key, column in STAT_COLUMNS.items()}
+
+
+def _ratio(old: int, new: int) -> float:
+    return (new - old) / old if old else float(new > 0)
+
+
+class ChangeDetector:
+    """Decides per video whether comments need refetching, and tallies the outcome."""
+
+    def __init__(self, min_comment_delta: int = MIN_COMMENT_DELTA, min_likes_ratio: float = MIN_LIKES_RATIO,
+                 min_plays_ratio: float = MIN_PLAYS_RATIO, max_baseline_age: int = MAX_BASELINE_AGE,
+                 full_refresh: bool = False):
+        self.min_comment_delta = min_comment_delta
+        self.min_likes_ratio = min_likes_ratio
+        self.min_plays_ratio = min_plays_ratio
+        self.max_baseline_age = max_baseline_age
+        self.full_refresh = full_refresh
+        self.reasons: Dict[str, int] = {}
+        self.scheduled = 0
+        self.skipped = 0
+        self.skipped_videos: List[str] = []
+
+    def check(self, baseline: Optional[Dict], stats: Dict, now: Optional[float] = None) -> Tuple[bool, str]:
+        """Return (fetch_comments, reason) for fresh stats against a baseline.
+
+        ``stats`` uses TikTok keys. ``baseline`` uses column names plus an
+        optional ``fetched_at`` epoch, or is None for unseen videos.
+        """
+        fresh = normalize_stats(stats)
+        now = now or time.time()
+        if self.full_refresh:
+            return True, "full refresh"
+        if baseline is None:
+            return True, "new video"
+        fetched_at = baseline.get("fetched_at")
+        if fetched_at and now - fetched_at > self.max_baseline_age:
+            return True, "baseline expired"
+        if fresh["comment_count"] - int(baseline.get("comment_count") or 0) >= self.min_comment_delta:
+            return True, "comments changed"
+        if _ratio(int(baseline.get("likes_count") or 0), fresh["likes_count"]) >= self.min_likes_ratio:
+            return True, "likes changed"
+        if _ratio(int(baseline.get("play_count") or 0), fresh["play_count"]) >= self.min_plays_ratio:
+            return True, "plays changed"
+        return False, "unchanged"
+
+    def decide(self, video_id: str, baseline: Optional[Dict], stats: Dict) -> bool:
+        """check() plus bookkeeping for the run report."""
+        fetch, reason = self.check(baseline, stats)
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        if fetch:
+            self.scheduled += 1
+        else:
+            self.skipped += 1
+            self.skipped_videos.append(video_id)
+        return fetch
+
+    def report(self) -> Dict:
+        return {
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "reasons": dict(self.reasons),
+        }
+
+    def summary(self) -> str:
+        total = self.scheduled + self.skipped
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(self.reasons.items()))
+        return f"comments fetched for {self.scheduled}/{total} videos, {self.skipped} skipped ({reasons})"
+
+
+class RefreshState:
+    """JSON file of per-video baselines and the comments fetched with them."""
+
+    def __init__(self, path: Path, max_age: int = STATE_MAX_AGE):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.videos: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("videos", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def baseline(self, video_id: str) -> Optional[Dict]:
+        return self.videos.get(video_id)
+
+    def cached_comments(self, video_id: str) -> List[Dict]:
+        entry = self.videos.get(video_id)
+        return list(entry.get("comments", [])) if entry else []
+
+    def record_fetch(self, video_id: str, stats: Dict, comments: List[Dict]):
+        """Store a new baseline after comments were fetched."""
+        entry = normalize_stats(stats)
+        entry["fetched_at"] = int(time.time())
+        entry["seen_at"] = entry["fetched_at"]
+        entry["comments"] = comments
+        self.videos[video_id] = entry
+
+    def record_seen(self, video_id: str):
+        """Mark a skipped video as still trending without moving its baseline."""
+        if video_id in self.videos:
+            self.videos[video_id]["seen_at"] = int(time.time())
+
+    def save(self):
+        """Drop videos not seen for max_age, then write the file atomically."""
+        cutoff = time.time() - self.max_age
+        self.videos = {vid: entry for vid, entry in self.videos.items()
+                       if entry.get("seen_at", 0) >= cutoff}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"videos": self.videos}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.path)
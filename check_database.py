@@ -1,9 +1,100 @@
 import sqlite3
+import sys
+import re
+import argparse
+from typing import Dict, List
 
-def check_database():
-    """Check database structure and data"""
+from database_helper import TikTokDatabase
+
+# The per-video and dashboard helpers of TikTokDatabase, with sample arguments;
+# their SQL is captured from the connection, not copied here
+DASHBOARD_CALLS = {
+    'get_video_comment_count': ('syn000000001',),
+    'get_top_comments': (10,),
+    'get_recent_videos': (10,),
+    'get_trending_hashtags': (20, False),
+    'get_video_stats': (),
+    'get_top_phrases': (30, False),
+    'get_fastest_rising': (10, 24),
+}
+
+def capture_dashboard_queries(db_path: str = "tiktok_data.db") -> Dict[str, List[str]]:
+    """Call each dashboard helper on a read-only handle and record the SELECTs it runs
+
+    The statements come from the connection's trace callback with their
+    parameters already bound, so they can be explained as they are.
+    """
+    queries = {}
+    with TikTokDatabase(db_path, read_only=True) as db:
+        conn = db.get_connection()
+        for name, args in DASHBOARD_CALLS.items():
+            statements = []
+            conn.set_trace_callback(statements.append)
+            try:
+                getattr(db, name)(*args)
+            finally:
+                conn.set_trace_callback(None)
+            # Schema lookups (the un-migrated fallbacks) read sqlite_master, not data
+            queries[name] = [sql for sql in statements
+                             if re.match(r'\s*(SELECT|WITH)\b', sql, re.IGNORECASE)
+                             and 'sqlite_master' not in sql]
+    return queries
+
+SQL_KEYWORDS = {'WHERE', 'JOIN', 'ON', 'ORDER', 'GROUP', 'LIMIT', 'WINDOW', 'LEFT', 'INNER', 'USING'}
+
+def _query_sources(sql: str) -> dict:
+    """Map each FROM/JOIN alias in sql to the table or CTE it names"""
+    sources = {}
+    for match in re.finditer(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        table, alias = match.group(1), match.group(2)
+        sources[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            sources[alias] = table
+    return sources
+
+def full_table_scans(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN steps of sql that read a whole table or index"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    # "SCAN <table>" without "USING ... INDEX" means a full table scan;
+    # scans of subqueries and CTE results are not table reads. A skip-scan
+    # ("ANY(column)") seeks once per distinct leading value, which is
+    # still a walk over the whole index.
+    sources = _query_sources(sql)
+    return [step for step in plan
+            if (step.startswith('SCAN') and 'INDEX' not in step
+                and sources.get(step.split()[1], step.split()[1]) in tables)
+            or 'ANY(' in step]
+
+def explain_dashboard_queries(db_path: str = "tiktok_data.db") -> bool:
+    """Print EXPLAIN QUERY PLAN for each dashboard query
+
+    Returns False if any query still scans or skip-scans a whole table.
+    """
+    queries = capture_dashboard_queries(db_path)
+    conn = sqlite3.connect(db_path)
+    all_indexed = True
     
-    db_path = "tiktok_data.db"
+    print("🔍 Dashboard Query Plans:")
+    print("=" * 50)
+    for name, statements in queries.items():
+        if not statements:
+            all_indexed = False
+            print(f"\n❌ {name}: no query captured")
+        for sql in statements:
+            full_scans = full_table_scans(conn, sql)
+            status = "✅" if not full_scans else "❌"
+            all_indexed = all_indexed and not full_scans
+            
+            print(f"\n{status} {name}")
+            for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}'):
+                print(f"   {row[3]}")
+    
+    conn.close()
+    return all_indexed
+
+def check_database(db_path: str = "tiktok_data.db"):
+    """Check database structure and data"""
     
     try:
         conn = sqlite3.connect(db_path)
@@ -57,4 +148,17 @@ def check_database():
         print(f"Error checking database: {e}")
 
 if __name__ == "__main__":
-    check_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inspect the TikTok database")
+    parser.add_argument("db_path", nargs="?", default="tiktok_data.db")
+    parser.add_argument("--explain", action="store_true",
+                        help="Check that every dashboard query uses an index")
+    parser.add_argument("--seed", type=int, default=0, metavar="N",
+                        help="With --explain, first seed db_path with N synthetic comments")
+    args = parser.parse_args()
+    
+    if args.explain:
+        if args.seed:
+            from synthetic_data import seed_database
+            seed_database(args.db_path, n_comments=args.seed, history_days=7)
+        sys.exit(0 if explain_dashboard_queries(args.db_path) else 1)
+    check_database(args.db_path)
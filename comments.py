@@ -1,193 +1,436 @@
+"""
+Collect trending videos, comments and hashtags with TikTokApi.
+
+Collection runs as a staged asyncio pipeline:
+
+    discover (1 producer) -> video queue -> fetch (N workers) -> record queue -> write (1 writer)
+
+Both queues are bounded, so a slow stage holds back the stages before it
+instead of buffering the whole run in memory. The writer batches records
+and runs every SQLite call in a single worker thread, keeping the event
+loop free for network I/O. Each stage counts items, errors, busy time and
+time spent blocked on its neighbours.
+
+app.py follows progress by parsing the "Video N:", "  Video ID:" and
+"💬 N comments" lines printed here.
+
+The pipeline only needs an object shaped like TikTokApi, so it runs
+offline with synthetic_data.FakeTikTokApi:
+
+    python comments.py --fake --db /tmp/fake.db
+"""
+
+import argparse
 import asyncio
-from datetime import datetime
-from TikTokApi import TikTokApi
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import metrics
 from database_helper import TikTokDatabase
+from change_detection import ChangeDetector
+from sources import REPLAY_SPEED, SourceApi, TikTokApiSource, open_source
 
-async def get_trending_data():
-    # Get ms_token from environment variable
-    ms_token = os.getenv("ms_token")
-    if not ms_token:
-        print("Error: MSTOKEN environment variable not set!")
-        print("Please set your ms_token from TikTok cookies as an environment variable.")
-        return
-    
-    # Initialize database
-    db = TikTokDatabase()
-    
-    # Initialize the API
-    api = TikTokApi()
-    
-    print("Type of api:", type(api))
-    print("API object:", api)
-    
-    # Track statistics
-    new_videos = 0
-    existing_videos = 0
-    new_comments = 0
-    new_hashtags = 0
+# Configuration
+MAX_VIDEOS = int(os.environ.get("COLLECT_MAX_VIDEOS", "40"))
+FETCHERS = int(os.environ.get("COLLECT_FETCHERS", "4"))
+QUEUE_SIZE = int(os.environ.get("COLLECT_QUEUE_SIZE", "8"))
+WRITE_BATCH = int(os.environ.get("COLLECT_WRITE_BATCH", "10"))
+WRITE_LINGER = float(os.environ.get("COLLECT_WRITE_LINGER", "0.2"))
+TRENDING_PAGE_SIZE = 20
+NEW_VIDEO_COMMENTS = 20
+EXISTING_VIDEO_COMMENTS = 10
 
-    try:
-        # Create a session with ms_token
-        print("Creating session with ms_token...")
-        await api.create_sessions(ms_tokens=[ms_token], num_sessions=1, sleep_after=3, browser="firefox", headless=False)
-        print("Session created successfully!")
-        
-        # Get trending videos
-        trending_videos = api.trending.videos(count=20)   # Start with 30 videos
-        print("Type of trending_videos:", type(trending_videos))
-        print("Trending videos object:", trending_videos)
-        
-        # Try to iterate through videos
-        async for video in trending_videos:
-            print(f"Video {new_videos + existing_videos + 1}:")
-            print(f"  Video ID: {video.id}")
-            print(f"  Video URL: {video.url}")
-            print(f"  Author: {video.author.username if video.author else 'Unknown'}")
-            print(f"  Stats: {video.stats}")
-            
-            # Debug: Check available attributes for covers and avatars
-            print(f"  Available video attributes: {[attr for attr in dir(video) if not attr.startswith('_')]}")
-            if video.author:
-                print(f"  Available author attributes: {[attr for attr in dir(video.author) if not attr.startswith('_')]}")
-            
-            # Check if cover attributes exist
-            if hasattr(video, 'dynamic_cover'):
-                print(f"  Dynamic cover: {video.dynamic_cover}")
-            if hasattr(video, 'cover'):
-                print(f"  Cover: {video.cover}")
-            if video.author and hasattr(video.author, 'avatarMedium'):
-                print(f"  Author avatar: {video.author.avatarMedium}")
-            
-            # Check if video already exists
-            if db.video_exists(video.id):
-                print("  ⏭️ Video already exists in database")
-                existing_videos += 1
-                
-                # Still get comments for existing videos (they might have new comments)
-                existing_comment_count = db.get_video_comment_count(video.id)
-                print(f"  📊 Already have {existing_comment_count} comments for this video")
-                
-                # Get additional comments
-                print(f"  Getting additional comments...")
-                comments = []
-                comment_count = 0
-                try:
-                    async for comment in video.comments(count=10):  # Get fewer comments for existing videos
-                        comment_data = {
-                            'comment_id': comment.id,
-                            'text': comment.text,
-                            'author': comment.author.username if comment.author else 'Unknown',
-                            'likes_count': comment.likes_count,
-                            'create_time': None
-                        }
-                        comments.append(comment_data)
-                        comment_count += 1
-                        if comment_count >= 10:
-                            break
-                            
-                except Exception as comment_error:
-                    print(f"    Error getting comments: {comment_error}")
-                
-                # Insert new comments
-                if comments:
-                    comments_inserted = db.insert_comments(video.id, comments)
-                    new_comments += comments_inserted
-                    print(f"  💬 Added {comments_inserted} new comments")
-                
-            else:
-                print("  🆕 New video - saving to database")
-                
-                # Get the full video data dictionary
-                video_dict = video.as_dict
-                
-                # Extract author data
-                author_dict = video_dict.get('author', {})
-                
-                # Prepare video data using correct field names
-                video_data = {
-                    'video_id': video.id,
-                    'video_url': video.url,
-                    'author': author_dict.get('uniqueId') or author_dict.get('nickname'),
-                    'author_avatar_medium': author_dict.get('avatarMedium'),
-                    'dynamic_cover': video_dict.get('video', {}).get('cover'),
-                    'cover': video_dict.get('video', {}).get('cover'),
-                    'stats': video.stats,
-                    'create_time': str(video.create_time) if video.create_time else None
-                }
-                
-                # Insert video into database
-                if db.insert_video(video_data):
-                    print("  ✅ Video saved to database")
-                    new_videos += 1
-                
-                # Get hashtags for new videos
-                hashtags = []
-                if video.hashtags:
-                    hashtags = [tag.name for tag in video.hashtags]
-                    hashtags_inserted = db.insert_hashtags(video.id, hashtags)
-                    new_hashtags += hashtags_inserted
-                    print(f"  🏷️ {hashtags_inserted} hashtags saved")
-                
-                # Get comments for new videos
-                print(f"  Getting comments...")
-                comments = []
-                comment_count = 0
-                try:
-                    async for comment in video.comments(count=20):
-                        print(f"    Comment {comment_count + 1}: {comment.text}")
-                        print(f"      Author: {comment.author.username if comment.author else 'Unknown'}")
-                        print(f"      Likes: {comment.likes_count}")
-                        
-                        # Prepare comment data
-                        comment_data = {
-                            'comment_id': comment.id,
-                            'text': comment.text,
-                            'author': comment.author.username if comment.author else 'Unknown',
-                            'likes_count': comment.likes_count,
-                            'create_time': None  # Comment objects don't have create_time
-                        }
-                        comments.append(comment_data)
-                        
-                        comment_count += 1
-                        if comment_count >= 20:
-                            break
-                            
-                except Exception as comment_error:
-                    print(f"    Error getting comments: {comment_error}")
-                
-                # Insert comments into database
-                if comments:
-                    comments_inserted = db.insert_comments(video.id, comments)
-                    new_comments += comments_inserted
-                    print(f"  💬 {comments_inserted} comments saved to database")
-            
-            print("---")
-            
-            if (new_videos + existing_videos) >= 40:
+_DONE = None
+
+COMMENT_FETCH_SECONDS = metrics.histogram("tiktok_comment_fetch_seconds", "Fetching one video's comments")
+COLLECTED = metrics.counter("tiktok_collected_total", "Videos, comments and hashtags written by the collector",
+                            ("kind",))
+
+
+class StageCounters:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name: str, unit: str = "videos"):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.extra: Dict[str, int] = {}
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def add(self, key: str, count: int):
+        self.extra[key] = self.extra.get(key, 0) + count
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "stage": self.name,
+            self.unit: self.items,
+            **self.extra,
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "per_second": round(self.items / self.elapsed, 2) if self.elapsed else 0.0,
+        }
+
+    def summary(self) -> str:
+        extra = "".join(f", {count} {key}" for key, count in self.extra.items())
+        return (f"{self.name}: {self.items} {self.unit}{extra} in {self.elapsed:.2f}s "
+                f"({self.to_dict()['per_second']}/s, busy {self.busy_seconds:.2f}s, "
+                f"blocked {self.blocked_seconds:.2f}s, {self.errors} errors)")
+
+
+async def _put(queue: asyncio.Queue, item, counters: StageCounters):
+    """queue.put that books time spent waiting on a full queue as backpressure"""
+    started = time.perf_counter()
+    await queue.put(item)
+    counters.blocked_seconds += time.perf_counter() - started
+
+
+def _username(obj) -> str:
+    return obj.author.username if getattr(obj, "author", None) else 'Unknown'
+
+
+def _comment_data(comment) -> Dict:
+    return {
+        'comment_id': comment.id,
+        'text': comment.text,
+        'author': _username(comment),
+        'likes_count': comment.likes_count,
+        'create_time': None  # Comment objects don't have create_time
+    }
+
+
+def _video_data(video) -> Dict:
+    """Fields for insert_video from a TikTokApi video"""
+    video_dict = video.as_dict
+    author_dict = video_dict.get('author', {})
+    return {
+        'video_id': video.id,
+        'video_url': video.url,
+        'author': author_dict.get('uniqueId') or author_dict.get('nickname'),
+        'author_avatar_medium': author_dict.get('avatarMedium'),
+        'dynamic_cover': video_dict.get('video', {}).get('cover'),
+        'cover': video_dict.get('video', {}).get('cover'),
+        'stats': video.stats,
+        'create_time': str(video.create_time) if video.create_time else None
+    }
+
+
+class CollectionPipeline:
+    """Discover -> fetch -> write stages connected by bounded asyncio queues"""
+
+    def __init__(self, api, db: TikTokDatabase, detector: ChangeDetector, max_videos: int = MAX_VIDEOS,
+                 fetchers: int = FETCHERS, queue_size: int = QUEUE_SIZE, write_batch: int = WRITE_BATCH,
+                 write_linger: float = WRITE_LINGER):
+        self.api = api
+        self.db = db
+        self.detector = detector
+        self.max_videos = max_videos
+        self.fetchers = max(1, fetchers)
+        self.queue_size = max(1, queue_size)
+        self.write_batch = max(1, write_batch)
+        self.write_linger = write_linger
+        # One thread owns every SQLite call, in submission order
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.discover = StageCounters("discover")
+        self.fetch = StageCounters("fetch")
+        self.write = StageCounters("write")
+        self.totals = {"new_videos": 0, "existing_videos": 0, "new_comments": 0, "new_hashtags": 0}
+
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, fn, *args)
+
+    async def produce(self, videos: asyncio.Queue):
+        """Stream trending videos into the video queue"""
+        self.discover.start()
+        try:
+            async for video in self.api.trending.videos(count=TRENDING_PAGE_SIZE):
+                self.discover.items += 1
+                await _put(videos, (self.discover.items, video), self.discover)
+                if self.discover.items >= self.max_videos:
+                    break
+        except Exception as e:
+            self.discover.errors += 1
+            print(f"Error discovering trending videos: {e}")
+        finally:
+            for _ in range(self.fetchers):
+                await videos.put(_DONE)
+            self.discover.finish()
+            # Time not spent blocked on the queue was spent waiting on the API
+            self.discover.busy_seconds = self.discover.elapsed - self.discover.blocked_seconds
+
+    async def _fetch_comments(self, video, count: int) -> Tuple[List[Dict], bool]:
+        """Up to count comments, and False if the fetch failed part way (the list may be partial)"""
+        comments = []
+        try:
+            async for comment in video.comments(count=count):
+                comments.append(_comment_data(comment))
+                if len(comments) >= count:
+                    break
+        except Exception as comment_error:
+            self.fetch.errors += 1
+            print(f"    Error getting comments for {video.id}: {comment_error}")
+            return comments, False
+        return comments, True
+
+    async def fetch_video(self, index: int, video) -> Dict:
+        """Decide what to collect for one video and fetch its comments"""
+        # Printed together, before any await, so the lines stay adjacent
+        print(f"Video {index}:")
+        print(f"  Video ID: {video.id}")
+        print(f"  Video URL: {video.url}")
+        print(f"  Author: {_username(video)}")
+        print(f"  Stats: {video.stats}")
+        stats = video.stats or {}
+
+        baseline = await self._db(self.db.get_video_counters, video.id)
+        if baseline is None:
+            self.detector.decide(video.id, None, stats)
+            record = {'video_id': video.id, 'kind': 'new', 'stats': stats, 'video': _video_data(video),
+                      'hashtags': [tag.name for tag in video.hashtags or []]}
+            limit = NEW_VIDEO_COMMENTS
+        elif self.detector.decide(video.id, baseline, stats):
+            record = {'video_id': video.id, 'kind': 'changed', 'stats': stats}
+            limit = EXISTING_VIDEO_COMMENTS
+        else:
+            # Only refetch comments when the stats moved since the last fetch
+            print(f"  💤 {video.id}: stats unchanged since last fetch - skipping comments")
+            return {'video_id': video.id, 'kind': 'unchanged', 'stats': stats, 'index': index}
+
+        record['index'] = index
+        with COMMENT_FETCH_SECONDS.time():
+            record['comments'], complete = await self._fetch_comments(video, limit)
+        if not complete:
+            # Written without moving the baseline, so the next run fetches again
+            record['comments_failed'] = True
+        self.fetch.add("comments", len(record['comments']))
+        return record
+
+    async def fetch_worker(self, videos: asyncio.Queue, records: asyncio.Queue):
+        while True:
+            item = await videos.get()
+            if item is _DONE:
+                return
+            index, video = item
+            started = time.perf_counter()
+            try:
+                record = await self.fetch_video(index, video)
+            except Exception as e:
+                self.fetch.errors += 1
+                print(f"Error fetching video {getattr(video, 'id', '?')}: {e}")
+                continue
+            finally:
+                self.fetch.busy_seconds += time.perf_counter() - started
+            self.fetch.items += 1
+            await _put(records, record, self.fetch)
+
+    def _write_batch(self, batch: List[Dict]) -> Dict[str, Dict]:
+        """Runs in the DB thread"""
+        return self.db.write_collected(batch)
+
+    async def _flush(self, batch: List[Dict]):
+        started = time.perf_counter()
+        written = await self._db(self._write_batch, batch)
+        self.write.busy_seconds += time.perf_counter() - started
+        if not written:
+            self.write.errors += 1
+            return
+        self.write.add("batches", 1)
+        for record in batch:
+            counts = written.get(record['video_id'], {})
+            self.write.items += 1
+            self.totals["new_videos" if record['kind'] == 'new' else "existing_videos"] += 1
+            self.totals["new_comments"] += counts.get('comments', 0)
+            self.totals["new_hashtags"] += counts.get('hashtags', 0)
+            COLLECTED.inc(kind="new_videos" if record['kind'] == 'new' else "existing_videos")
+            COLLECTED.inc(counts.get('comments', 0), kind="new_comments")
+            COLLECTED.inc(counts.get('hashtags', 0), kind="new_hashtags")
+            self.write.add("comments", counts.get('comments', 0))
+            if record['kind'] != 'unchanged':
+                print(f"  💬 {counts.get('comments', 0)} comments saved for {record['video_id']}")
+
+    async def consume(self, records: asyncio.Queue):
+        """Write records in batches of up to write_batch, waiting at most write_linger to fill one"""
+        self.write.start()
+        done = False
+        while not done:
+            record = await records.get()
+            if record is _DONE:
                 break
-        
-        # Print final statistics
-        print(f"\n📊 Data Collection Complete!")
-        print(f"🆕 New videos collected: {new_videos}")
-        print(f"⏭️ Existing videos skipped: {existing_videos}")
-        print(f"💬 New comments collected: {new_comments}")
-        print(f"🏷️ New hashtags collected: {new_hashtags}")
-        
-        # Show database statistics
-        stats = db.get_video_stats()
-        print(f"\n📈 Database Statistics:")
-        print(f"   Total videos in DB: {stats.get('total_videos', 0)}")
-        print(f"   Total comments in DB: {stats.get('total_comments', 0)}")
-        print(f"   Total hashtags in DB: {stats.get('total_hashtags', 0)}")
-        print(f"   Avg likes per video: {stats.get('avg_likes_per_video', 0)}")
-        print(f"   Avg comments per video: {stats.get('avg_comments_per_video', 0)}")
+            batch = [record]
+            while len(batch) < self.write_batch:
+                try:
+                    record = await asyncio.wait_for(records.get(), self.write_linger)
+                except asyncio.TimeoutError:
+                    break
+                if record is _DONE:
+                    done = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+        self.write.finish()
+
+    async def run(self) -> Dict:
+        videos = asyncio.Queue(maxsize=self.queue_size)
+        records = asyncio.Queue(maxsize=self.queue_size)
+        self.fetch.start()
+        writer = asyncio.create_task(self.consume(records))
+        workers = [asyncio.create_task(self.fetch_worker(videos, records)) for _ in range(self.fetchers)]
+        producer = asyncio.create_task(self.produce(videos))
+        try:
+            await asyncio.gather(producer, *workers)
+            self.fetch.finish()
+            await records.put(_DONE)
+            await writer
+        except BaseException:
+            for task in [producer, writer, *workers]:
+                task.cancel()
+            raise
+        finally:
+            self.db_executor.shutdown(wait=True)
+        for stage in (self.discover, self.fetch, self.write):
+            metrics.STAGE_SECONDS.observe(stage.elapsed, script="comments", stage=stage.name)
+        return self.report()
+
+    def report(self) -> Dict:
+        return {
+            **self.totals,
+            "stages": [stage.to_dict() for stage in (self.discover, self.fetch, self.write)],
+            "change_detection": self.detector.report(),
+        }
+
+
+def print_report(pipeline: CollectionPipeline, db: TikTokDatabase):
+    totals = pipeline.totals
+    print(f"\n📊 Data Collection Complete!")
+    print(f"🆕 New videos collected: {totals['new_videos']}")
+    print(f"⏭️ Existing videos skipped: {totals['existing_videos']}")
+    print(f"💬 New comments collected: {totals['new_comments']}")
+    print(f"🏷️ New hashtags collected: {totals['new_hashtags']}")
+    print(f"🔍 Change detection: {pipeline.detector.summary()}")
+    print(f"⚙️ Pipeline ({pipeline.fetchers} fetchers, queues of {pipeline.queue_size}):")
+    for stage in (pipeline.discover, pipeline.fetch, pipeline.write):
+        print(f"   {stage.summary()}")
+
+    # Show database statistics
+    stats = db.get_video_stats()
+    print(f"\n📈 Database Statistics:")
+    print(f"   Total videos in DB: {stats.get('total_videos', 0)}")
+    print(f"   Total comments in DB: {stats.get('total_comments', 0)}")
+    print(f"   Total hashtags in DB: {stats.get('total_hashtags', 0)}")
+    print(f"   Avg likes per video: {stats.get('avg_likes_per_video', 0)}")
+    print(f"   Avg comments per video: {stats.get('avg_comments_per_video', 0)}")
+
+
+async def collect(api, db: TikTokDatabase, full_refresh: bool = False, **options) -> Dict:
+    """Run the pipeline against any TikTokApi-shaped api and print the report"""
+    pipeline = CollectionPipeline(api, db, ChangeDetector(full_refresh=full_refresh), **options)
+    report = await pipeline.run()
+    print_report(pipeline, db)
+    return report
+
+
+async def get_trending_data(api=None, db_path: str = "tiktok_data.db",
+                            report_file: Optional[str] = metrics.REPORT_FILE, **options) -> Optional[Dict]:
+    full_refresh = os.getenv("FULL_REFRESH") == "1"
+    db = TikTokDatabase(db_path)
+    started = time.time()
+    report = None
+    try:
+        if api is not None:
+            report = await collect(api, db, full_refresh, **options)
+            return report
+
+        # Get ms_token from environment variable
+        ms_token = os.getenv("ms_token")
+        if not ms_token:
+            print("Error: MSTOKEN environment variable not set!")
+            print("Please set your ms_token from TikTok cookies as an environment variable.")
+            return None
+
+        # Imported here so the pipeline can run offline without TikTokApi installed
+        from TikTokApi import TikTokApi
+        async with TikTokApi() as api:
+            print("Creating session with ms_token...")
+            await api.create_sessions(ms_tokens=[ms_token], num_sessions=1, sleep_after=3, browser="firefox", headless=False)
+            print("Session created successfully!")
+            report = await collect(api, db, full_refresh, **options)
+            return report
 
     except Exception as e:
         print(f"Error: {e}")
         print(f"Error type: {type(e)}")
         print(f"Error details: {str(e)}")
+        return None
+    finally:
+        db.close()
+        metrics.print_summary()
+        metrics.write_report("comments", started, report_file, ok=report is not None, pipeline=report)
+
 
 if __name__ == "__main__":
-    asyncio.run(get_trending_data())
+    parser = argparse.ArgumentParser(description="Collect trending TikTok videos and comments")
+    parser.add_argument("--db", default=None,
+                        help="SQLite database (default: tiktok_data.db; a temp dir with --fake or --replay)")
+    parser.add_argument("--fetchers", type=int, default=FETCHERS)
+    parser.add_argument("--max-videos", type=int, default=MAX_VIDEOS)
+    parser.add_argument("--fake", action="store_true",
+                        help="Collect from synthetic_data.FakeTikTokApi instead of TikTok")
+    parser.add_argument("--fake-latency", type=float, default=0.05,
+                        help="Seconds of simulated latency per fake page")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Collect from a recording (see sources.py) instead of TikTok")
+    parser.add_argument("--replay-speed", type=float, default=REPLAY_SPEED,
+                        help="0 = no delays, 1 = recorded timing, 2 = twice as fast")
+    parser.add_argument("--replay-scale", type=int, default=1,
+                        help="Replay N renamed copies of every recorded video")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record every API response to this .jsonl.gz file")
+    parser.add_argument("--metrics-report", default=None,
+                        help="JSON run report with per-stage timings and counters ('' to disable)")
+    args = parser.parse_args()
+    
+    db_path, report_file = args.db, args.metrics_report
+    if (args.fake or args.replay) and (db_path is None or report_file is None):
+        # Offline runs never write into the live database or its run report
+        scratch = tempfile.mkdtemp(prefix="comments-offline-")
+        print(f"📁 Offline outputs go to {scratch}")
+        db_path = db_path or os.path.join(scratch, "tiktok_data.db")
+        if report_file is None:
+            report_file = os.path.join(scratch, os.path.basename(metrics.REPORT_FILE))
+    db_path = db_path or "tiktok_data.db"
+    report_file = metrics.REPORT_FILE if report_file is None else report_file
 
+    api, source = None, None
+    if args.fake:
+        from synthetic_data import FakeTikTokApi
+        api = FakeTikTokApi(n_videos=args.max_videos, latency=args.fake_latency)
+    elif args.replay or args.record:
+        source = open_source(args.replay, args.record, speed=args.replay_speed, scale=args.replay_scale,
+                             live=lambda: TikTokApiSource(os.environ.get("ms_token")))
+        api = SourceApi(source, max_videos=args.max_videos)
+    try:
+        asyncio.run(get_trending_data(api, db_path, report_file, fetchers=args.fetchers,
+                                      max_videos=args.max_videos))
+    finally:
+        if source:
+            source.close()
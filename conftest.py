@@ -0,0 +1,17 @@
+import json
+from pathlib import Path
+
+import pytest
+
+TESTDATA = Path(__file__).parent / "testdata"
+
+# test_video_attributes.py is a live-network debugging script (it needs
+# TikTokApi, an ms_token and a browser), not part of the test suite
+collect_ignore = ["test_video_attributes.py"]
+
+
+@pytest.fixture(scope="session")
+def golden_phrases():
+    """Pinned comment corpus and the digests of every phrase output on it"""
+    with open(TESTDATA / "golden_phrases.json", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,6 +1,7 @@
 // Global variables for refresh functionality
 let isRefreshing = false;
 let statusCheckInterval = null;
+let statusStream = null;
 
 // Number formatting function
 function formatNumber(num) {
@@ -34,7 +35,7 @@ function updateTimestamp() {
 function loadDashboard() {
   updateTimestamp(); // Update timestamp when dashboard loads
 
-  fetch("dashboard_data.json")
+  fetch("dashboard_data.json", { cache: "no-cache" })
     .then((r) => r.json())
     .then((data) => {
       document.getElementById("stats").innerHTML = `
@@ -181,8 +182,8 @@ async function refreshData() {
       throw new Error("Failed to start scraping");
     }
 
-    // Start polling for status
-    startStatusPolling();
+    // Follow progress over Server-Sent Events (falls back to polling)
+    startStatusStream();
   } catch (error) {
     console.error("Error starting refresh:", error);
     loadingStatus.textContent = `Error: ${error.message}`;
@@ -192,6 +193,61 @@ async function refreshData() {
   }
 }
 
+function startStatusStream() {
+  if (!window.EventSource) {
+    startStatusPolling();
+    return;
+  }
+
+  statusStream = new EventSource("/api/status/stream");
+  const loadingStatus = document.querySelector(".loading-status");
+
+  statusStream.addEventListener("status", (event) => {
+    const status = JSON.parse(event.data);
+    if (status.message) {
+      loadingStatus.textContent = status.message;
+    }
+    if (!status.is_running) {
+      handleStreamDone(status);
+    }
+  });
+
+  statusStream.addEventListener("video", (event) => {
+    const video = JSON.parse(event.data);
+    if (video.stage === "comments") {
+      loadingStatus.textContent = `Video ${video.index}: ${video.comments} comments saved`;
+    }
+  });
+
+  statusStream.addEventListener("done", (event) => {
+    handleStreamDone(JSON.parse(event.data));
+  });
+
+  statusStream.onerror = () => {
+    // Stream unavailable (e.g. a proxy that buffers responses): poll instead
+    if (isRefreshing && statusStream) {
+      closeStatusStream();
+      startStatusPolling();
+    }
+  };
+}
+
+function handleStreamDone(status) {
+  // The snapshot and the "done" event can both report completion
+  if (!statusStream) {
+    return;
+  }
+  closeStatusStream();
+  finishRefresh(status);
+}
+
+function closeStatusStream() {
+  if (statusStream) {
+    statusStream.close();
+    statusStream = null;
+  }
+}
+
 function startStatusPolling() {
   statusCheckInterval = setInterval(async () => {
     try {
@@ -204,42 +260,8 @@ function startStatusPolling() {
       if (!status.is_running) {
         // Scraping completed
         clearInterval(statusCheckInterval);
-
-        if (status.error) {
-          loadingStatus.textContent = `Error: ${status.error}`;
-          setTimeout(() => {
-            stopRefresh();
-          }, 3000);
-        } else {
-          // Success - export dashboard data and reload
-          loadingStatus.textContent = "Updating dashboard data...";
-
-          try {
-            // Export dashboard data
-            const exportResponse = await fetch("/api/export", {
-              method: "POST",
-              headers: {
-                "Content-Type": "application/json",
-              },
-            });
-
-            if (exportResponse.ok) {
-              loadingStatus.textContent = "Dashboard updated successfully!";
-              setTimeout(() => {
-                loadDashboard();
-                stopRefresh();
-              }, 1000);
-            } else {
-              throw new Error("Failed to export dashboard data");
-            }
-          } catch (exportError) {
-            console.error("Error exporting dashboard data:", exportError);
-            loadingStatus.textContent = "Error updating dashboard data";
-            setTimeout(() => {
-              stopRefresh();
-            }, 3000);
-          }
-        }
+        statusCheckInterval = null;
+        await finishRefresh(status);
       }
     } catch (error) {
       console.error("Error checking status:", error);
@@ -247,6 +269,47 @@ function startStatusPolling() {
   }, 1000);
 }
 
+async function finishRefresh(status) {
+  const loadingStatus = document.querySelector(".loading-status");
+
+  if (status.error) {
+    loadingStatus.textContent = `Error: ${status.error}`;
+    setTimeout(() => {
+      stopRefresh();
+    }, 3000);
+    return;
+  }
+
+  // Success - export dashboard data and reload
+  loadingStatus.textContent = "Updating dashboard data...";
+
+  try {
+    // Export dashboard data
+    const exportResponse = await fetch("/api/export", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+    });
+
+    if (exportResponse.ok) {
+      loadingStatus.textContent = "Dashboard updated successfully!";
+      setTimeout(() => {
+        loadDashboard();
+        stopRefresh();
+      }, 1000);
+    } else {
+      throw new Error("Failed to export dashboard data");
+    }
+  } catch (exportError) {
+    console.error("Error exporting dashboard data:", exportError);
+    loadingStatus.textContent = "Error updating dashboard data";
+    setTimeout(() => {
+      stopRefresh();
+    }, 3000);
+  }
+}
+
 function stopRefresh() {
   isRefreshing = false;
   const refreshBtn = document.getElementById("refresh-btn");
@@ -255,6 +318,8 @@ function stopRefresh() {
   refreshBtn.classList.remove("loading");
   loadingOverlay.classList.add("hidden");
 
+  closeStatusStream();
+
   if (statusCheckInterval) {
     clearInterval(statusCheckInterval);
     statusCheckInterval = null;
@@ -1,27 +1,209 @@
+import os
+import re
+import html
+import json
 import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from itertools import islice
 from datetime import datetime
-from typing import Dict, List, Optional
-import re
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
 from collections import Counter
 
+from concurrent.futures import ProcessPoolExecutor
+from database_setup import TOP_COMMENTS_KEPT, migrate, rebuild_summaries
+from heavy_hitters import APPROXIMATE_TOP_K, SpaceSaving
+import metrics
+from phrase_engine import PHRASE_WORKERS, count_phrases_parallel
+from text_analytics import count_comment_phrases, is_quality_phrase, iter_comment_phrases, suppress_near_duplicates
+
+# Connection tuning (WAL lets the dashboard read while the collector writes)
+SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+DB_WRITE_SECONDS = metrics.histogram("tiktok_db_write_seconds", "Write transactions, including commit",
+                                     ("operation",))
+
+# Per-video counts returned by write_collected
+WRITE_COUNTS = ('comments', 'comments_skipped', 'comments_invalid', 'hashtags', 'hashtags_skipped')
+
+UPDATE_VIDEO_STATS_SQL = '''
+    UPDATE videos
+    SET likes_count = ?, comment_count = ?, share_count = ?, play_count = ?, scraped_at = ?
+    WHERE video_id = ?
+'''
+
+# A snapshot that leaves the videos row (and so the change-detection baseline) alone
+RECORD_VIDEO_STATS_SQL = '''
+    INSERT OR REPLACE INTO video_stats_history
+        (video_key, captured_at, likes, comments, shares, plays)
+    SELECT id, CAST(strftime('%s', 'now') AS INTEGER), ?, ?, ?, ?
+    FROM videos WHERE video_id = ?
+'''
+
+
+def _stats_values(stats: Dict) -> tuple:
+    """likes, comments, shares, plays from TikTok stats keys"""
+    return (stats.get('diggCount', 0), stats.get('commentCount', 0),
+            stats.get('shareCount', 0), stats.get('playCount', 0))
+
+
+def _video_row(video_data: Dict, scraped_at: str) -> tuple:
+    """Parameters for UPSERT_VIDEO_SQL"""
+    return (
+        video_data.get('video_id'),
+        video_data.get('video_url'),
+        video_data.get('author'),
+        video_data.get('author_avatar_medium'),
+        video_data.get('dynamic_cover'),
+        video_data.get('cover'),
+        *_stats_values(video_data.get('stats') or {}),
+        video_data.get('create_time'),
+        scraped_at
+    )
+
+# Quality phrases get_top_phrases may consider while de-duplicating
+PHRASE_CANDIDATE_POOL = int(os.environ.get("PHRASE_CANDIDATE_POOL", "5000"))
+
+# Comment search: page size cap and snippet length in tokens
+SEARCH_MAX_LIMIT = 100
+SNIPPET_TOKENS = 16
+# Control characters never appear in comment text, so they can mark
+# matches inside snippet() output until it has been HTML-escaped
+_MARK_START, _MARK_END = '\x02', '\x03'
+_SEARCH_TERM = re.compile(r'[^\s"]+')
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, `word*` matches a prefix
+
+    Words are quoted, so FTS5 operators and punctuation in user input are
+    matched literally instead of raising syntax errors.
+    """
+    terms = []
+    for term in _SEARCH_TERM.findall(text):
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if term:
+            terms.append(f'"{term}"*' if prefix else f'"{term}"')
+    return ' '.join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape a snippet and turn match markers into <mark> tags"""
+    return html.escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+# Update in place rather than INSERT OR REPLACE: the row keeps its id and the
+# summary triggers see a plain UPDATE instead of a silent delete + insert
+UPSERT_VIDEO_SQL = '''
+    INSERT INTO videos 
+    (video_id, video_url, author, author_avatar_medium, dynamic_cover, cover, likes_count, comment_count, share_count, play_count, create_time, scraped_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(video_id) DO UPDATE SET
+        video_url = excluded.video_url,
+        author = excluded.author,
+        author_avatar_medium = excluded.author_avatar_medium,
+        dynamic_cover = excluded.dynamic_cover,
+        cover = excluded.cover,
+        likes_count = excluded.likes_count,
+        comment_count = excluded.comment_count,
+        share_count = excluded.share_count,
+        play_count = excluded.play_count,
+        create_time = excluded.create_time,
+        scraped_at = excluded.scraped_at
+'''
+
 class TikTokDatabase:
-    def __init__(self, db_path: str = "tiktok_data.db"):
+    def __init__(self, db_path: str = "tiktok_data.db", read_only: bool = False,
+                 synchronous: str = SYNCHRONOUS, busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+                 mmap_size: int = MMAP_SIZE, cache_size_kb: int = CACHE_SIZE_KB,
+                 auto_migrate: bool = True):
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_LEVELS}, got {synchronous!r}")
         self.db_path = db_path
+        self.read_only = read_only
+        self.synchronous = synchronous.upper()
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.auto_migrate = auto_migrate and not read_only
+        self._migrated = False
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+    
+    def _open_connection(self):
+        """Open a new connection and apply the tuning pragmas"""
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{quote(str(self.db_path))}?mode=ro", uri=True,
+                                   timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                                   check_same_thread=False)
+        
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        if self.read_only:
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            # WAL is persistent in the file, so read-only handles inherit it
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_size_kb)}')
+        
+        # Bring the schema up to date once per instance before the first write
+        if self.auto_migrate and not self._migrated:
+            with self._connections_lock:
+                if not self._migrated:
+                    migrate(conn, verbose=False)
+                    self._migrated = True
+        return conn
     
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's database connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Yield this thread's connection inside a transaction (commit or rollback on exit)"""
+        conn = self.get_connection()
+        with conn:
+            yield conn
+    
+    def close(self):
+        """Close every connection opened by this instance"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def video_exists(self, video_id: str) -> bool:
         """Check if a video already exists in the database"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('SELECT COUNT(*) FROM videos WHERE video_id = ?', (video_id,))
-            count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM videos WHERE video_id = ?', (video_id,))
+                count = cursor.fetchone()[0]
             
-            conn.close()
             return count > 0
             
         except Exception as e:
@@ -31,13 +213,12 @@ class TikTokDatabase:
     def comment_exists(self, comment_id: str) -> bool:
         """Check if a comment already exists in the database"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('SELECT COUNT(*) FROM comments WHERE comment_id = ?', (comment_id,))
-            count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM comments WHERE comment_id = ?', (comment_id,))
+                count = cursor.fetchone()[0]
             
-            conn.close()
             return count > 0
             
         except Exception as e:
@@ -47,93 +228,165 @@ class TikTokDatabase:
     def get_video_comment_count(self, video_id: str) -> int:
         """Get the number of comments already stored for a video"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('SELECT COUNT(*) FROM comments WHERE video_id = ?', (video_id,))
-            count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM comments WHERE video_id = ?', (video_id,))
+                count = cursor.fetchone()[0]
             
-            conn.close()
             return count
             
         except Exception as e:
             print(f"Error getting video comment count: {e}")
             return 0
     
+    def get_video_counters(self, video_id: str) -> Optional[Dict]:
+        """Stored counters for a video as a change-detection baseline, or None"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute('''
+                    SELECT comment_count, likes_count, play_count, scraped_at
+                    FROM videos WHERE video_id = ?
+                ''', (video_id,))
+                row = cursor.fetchone()
+            
+            if row is None:
+                return None
+            fetched_at = None
+            if row[3]:
+                try:
+                    fetched_at = datetime.strptime(row[3], '%Y-%m-%d %H:%M:%S').timestamp()
+                except ValueError:
+                    pass
+            return {"comment_count": row[0], "likes_count": row[1], "play_count": row[2],
+                    "fetched_at": fetched_at}
+            
+        except Exception as e:
+            print(f"Error getting video counters: {e}")
+            return None
+    
+    def update_video_stats(self, video_id: str, stats: Dict) -> bool:
+        """Refresh a video's counters (TikTok stats keys) after its comments were refetched"""
+        try:
+            with DB_WRITE_SECONDS.time(operation="update_video_stats"), self.connection() as conn:
+                conn.execute(UPDATE_VIDEO_STATS_SQL, (
+                    *_stats_values(stats), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), video_id
+                ))
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error updating video stats: {e}")
+            return False
+    
+    def record_video_stats(self, video_id: str, stats: Dict) -> bool:
+        """Append a stats snapshot without touching the videos row
+        
+        Used for videos whose comments were skipped by change detection, so
+        their history keeps one point per run while their baseline stays put.
+        """
+        try:
+            with DB_WRITE_SECONDS.time(operation="record_video_stats"), self.connection() as conn:
+                conn.execute(RECORD_VIDEO_STATS_SQL, (*_stats_values(stats), video_id))
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error recording video stats: {e}")
+            return False
+    
     def insert_video(self, video_data: Dict) -> bool:
         """Insert video data into database"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Extract stats
-            stats = video_data.get('stats', {})
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO videos 
-                (video_id, video_url, author, author_avatar_medium, dynamic_cover, cover, likes_count, comment_count, share_count, play_count, create_time, scraped_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                video_data.get('video_id'),
-                video_data.get('video_url'),
-                video_data.get('author'),
-                video_data.get('author_avatar_medium'),
-                video_data.get('dynamic_cover'),
-                video_data.get('cover'),
-                stats.get('diggCount', 0),
-                stats.get('commentCount', 0),
-                stats.get('shareCount', 0),
-                stats.get('playCount', 0),
-                video_data.get('create_time'),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
-            
-            conn.commit()
-            conn.close()
+            with DB_WRITE_SECONDS.time(operation="insert_video"), self.connection() as conn:
+                conn.execute(UPSERT_VIDEO_SQL, _video_row(video_data, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            
             return True
             
         except Exception as e:
             print(f"Error inserting video: {e}")
             return False
     
+    def _add_phrase_counts(self, conn, texts: Iterable[str]):
+        """Add the phrases in texts to the phrase_counts table"""
+        self._upsert_phrase_counts(conn, count_comment_phrases(texts))
+    
+    def _upsert_phrase_counts(self, conn, counts: Counter):
+        """Add already-counted phrases to the phrase_counts table"""
+        conn.executemany('''
+            INSERT INTO phrase_counts (phrase, n, count) VALUES (?, ?, ?)
+            ON CONFLICT(phrase) DO UPDATE SET count = count + excluded.count
+        ''', ((phrase, phrase.count(' ') + 1, count) for phrase, count in counts.items()))
+    
+    def _new_comment_rows(self, conn, rows: List[tuple]) -> List[tuple]:
+        """Drop rows whose comment_id is already stored or repeated in the batch"""
+        existing = set()
+        ids = [row[0] for row in rows]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i+500]
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(r[0] for r in conn.execute(
+                f'SELECT comment_id FROM comments WHERE comment_id IN ({placeholders})', chunk))
+        
+        new_rows = []
+        for row in rows:
+            if row[0] in existing:
+                continue
+            existing.add(row[0])
+            new_rows.append(row)
+        return new_rows
+    
+    def _insert_comment_rows(self, conn, video_id: str, comments: List[Dict]) -> Dict[str, int]:
+        """Insert comments with executemany, returning inserted/skipped/invalid counts
+        
+        Comments without an id or text can't be stored and count as invalid;
+        already stored ones count as skipped. Phrase counts are updated for
+        the new comments in the same transaction.
+        """
+        rows = [(
+            comment.get('comment_id'),
+            video_id,
+            comment.get('text'),
+            comment.get('author'),
+            comment.get('likes_count', 0),
+            comment.get('create_time')
+        ) for comment in comments]
+        valid_rows = [row for row in rows if row[0] is not None and row[2] is not None]
+        counts = {'inserted': 0, 'skipped': 0, 'invalid': len(rows) - len(valid_rows)}
+        new_rows = self._new_comment_rows(conn, valid_rows)
+        if new_rows:
+            cursor = conn.executemany('''
+                INSERT OR IGNORE INTO comments 
+                (comment_id, video_id, text, author, likes_count, create_time)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', new_rows)
+            self._add_phrase_counts(conn, (row[2] for row in new_rows))
+            counts['inserted'] = max(cursor.rowcount, 0)
+        counts['skipped'] = len(valid_rows) - counts['inserted']
+        return counts
+    
+    def _insert_hashtag_rows(self, conn, video_id: str, hashtags: List[str]) -> int:
+        """Insert hashtags with executemany, relying on UNIQUE(video_id, hashtag)"""
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO hashtags (video_id, hashtag)
+            VALUES (?, ?)
+        ''', [(video_id, hashtag) for hashtag in hashtags])
+        return max(cursor.rowcount, 0)
+    
     def insert_comments(self, video_id: str, comments: List[Dict]) -> int:
         """Insert comments for a video, skipping existing ones"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with DB_WRITE_SECONDS.time(operation="insert_comments"), self.connection() as conn:
+                counts = self._insert_comment_rows(conn, video_id, comments)
             
-            inserted_count = 0
-            skipped_count = 0
+            if counts['skipped'] > 0:
+                print(f"  ⏭️ Skipped {counts['skipped']} existing comments")
+            if counts['invalid'] > 0:
+                print(f"  ⚠️ Dropped {counts['invalid']} comments without an id or text")
             
-            for comment in comments:
-                comment_id = comment.get('comment_id')
-                
-                # Check if comment already exists
-                if comment_id and self.comment_exists(comment_id):
-                    skipped_count += 1
-                    continue
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO comments 
-                    (comment_id, video_id, text, author, likes_count, create_time)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    comment_id,
-                    video_id,
-                    comment.get('text'),
-                    comment.get('author'),
-                    comment.get('likes_count', 0),
-                    comment.get('create_time')
-                ))
-                inserted_count += 1
-            
-            conn.commit()
-            conn.close()
-            
-            if skipped_count > 0:
-                print(f"  ⏭️ Skipped {skipped_count} existing comments")
-            
-            return inserted_count
+            return counts['inserted']
             
         except Exception as e:
             print(f"Error inserting comments: {e}")
@@ -142,84 +395,175 @@ class TikTokDatabase:
     def insert_hashtags(self, video_id: str, hashtags: List[str]) -> int:
         """Insert hashtags for a video, avoiding duplicates"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            inserted_count = 0
-            for hashtag in hashtags:
-                # Check if this hashtag already exists for this video
-                cursor.execute('''
-                    SELECT COUNT(*) FROM hashtags 
-                    WHERE video_id = ? AND hashtag = ?
-                ''', (video_id, hashtag))
-                
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute('''
-                        INSERT INTO hashtags (video_id, hashtag)
-                        VALUES (?, ?)
-                    ''', (video_id, hashtag))
-                    inserted_count += 1
-            
-            conn.commit()
-            conn.close()
+            with DB_WRITE_SECONDS.time(operation="insert_hashtags"), self.connection() as conn:
+                inserted_count = self._insert_hashtag_rows(conn, video_id, hashtags)
             return inserted_count
             
         except Exception as e:
             print(f"Error inserting hashtags: {e}")
             return 0
     
-    def get_trending_hashtags(self, limit: int = 20) -> List[Dict]:
-        """Get most popular hashtags"""
+    def ingest_batch(self, videos: List[Dict]) -> Dict:
+        """Write a batch of videos with their comments and hashtags in one transaction
+        
+        Each item takes the same fields as insert_video, plus optional
+        'comments' (dicts as for insert_comments) and 'hashtags' (strings),
+        and is written through write_collected as a 'new' record. Existing
+        comments and hashtags are skipped, and comments without an id or
+        text are counted as invalid. Returns inserted/skipped/invalid counts;
+        on error the whole batch is rolled back and counts are zero.
+        """
+        counts = {
+            'videos': 0,
+            'comments_inserted': 0,
+            'comments_skipped': 0,
+            'comments_invalid': 0,
+            'hashtags_inserted': 0,
+            'hashtags_skipped': 0
+        }
+        written = self.write_collected([{
+            'video_id': video_data.get('video_id'),
+            'kind': 'new',
+            'video': video_data,
+            'comments': video_data.get('comments'),
+            'hashtags': video_data.get('hashtags'),
+        } for video_data in videos])
+        if not written:
+            return counts
+        
+        counts['videos'] = len(videos)
+        for video_counts in written.values():
+            counts['comments_inserted'] += video_counts['comments']
+            counts['comments_skipped'] += video_counts['comments_skipped']
+            counts['comments_invalid'] += video_counts['comments_invalid']
+            counts['hashtags_inserted'] += video_counts['hashtags']
+            counts['hashtags_skipped'] += video_counts['hashtags_skipped']
+        return counts
+    
+    def write_collected(self, records: List[Dict]) -> Dict[str, Dict]:
+        """Write one batch of video records in a single transaction
+        
+        The one bulk-write path, used by the comments.py pipeline and by
+        ingest_batch. Each record has 'video_id', 'kind' and 'stats', plus
+        optional 'comments' and 'hashtags'. 'new' records also carry 'video'
+        (fields as for insert_video) and are upserted; 'changed' videos get
+        fresh counters; 'unchanged' ones only a stats snapshot. Records flagged
+        'comments_failed' never advance the change-detection baseline: a
+        new video is stored with zero counters and a changed one keeps its
+        old counters, both with a snapshot of the fresh stats.
+        
+        Returns per video id the inserted comments and hashtags ('comments',
+        'hashtags'), the existing ones skipped ('comments_skipped',
+        'hashtags_skipped') and the comments dropped for lacking an id or
+        text ('comments_invalid'). On error the whole batch is rolled back
+        and nothing is returned.
+        """
+        if not records:
+            return {}
+        
+        scraped_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        written = {}
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT hashtag, COUNT(*) as count
-                FROM hashtags
-                GROUP BY hashtag
-                ORDER BY count DESC
-                LIMIT ?
-            ''', (limit,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'hashtag': row[0],
-                    'count': row[1]
-                })
-            
-            conn.close()
-            return results
+            with DB_WRITE_SECONDS.time(operation="write_collected"), self.connection() as conn:
+                for record in records:
+                    video_id = record['video_id']
+                    stats = record.get('stats') or {}
+                    failed = record.get('comments_failed', False)
+                    if record['kind'] == 'new':
+                        video = dict(record['video'], stats={}) if failed else record['video']
+                        conn.execute(UPSERT_VIDEO_SQL, _video_row(video, scraped_at))
+                    if record['kind'] == 'changed' and not failed:
+                        conn.execute(UPDATE_VIDEO_STATS_SQL, (*_stats_values(stats), scraped_at, video_id))
+                    elif record['kind'] != 'new' or failed:
+                        conn.execute(RECORD_VIDEO_STATS_SQL, (*_stats_values(stats), video_id))
+                    
+                    comments = self._insert_comment_rows(conn, video_id, record.get('comments') or [])
+                    hashtags = record.get('hashtags') or []
+                    hashtags_inserted = self._insert_hashtag_rows(conn, video_id, hashtags)
+                    # A video repeated in the batch adds to its first entry
+                    counts = written.setdefault(video_id, dict.fromkeys(WRITE_COUNTS, 0))
+                    counts['comments'] += comments['inserted']
+                    counts['comments_skipped'] += comments['skipped']
+                    counts['comments_invalid'] += comments['invalid']
+                    counts['hashtags'] += hashtags_inserted
+                    counts['hashtags_skipped'] += len(hashtags) - hashtags_inserted
+            return written
             
         except Exception as e:
-            print(f"Error getting trending hashtags: {e}")
-            return []
+            print(f"Error writing collected batch: {e}")
+            return {}
+    
+    def _has_table(self, conn, name: str) -> bool:
+        """True when the schema has table name (summary tables arrive with migrations 5 and 6)"""
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (name,)).fetchone() is not None
+    
+    def get_trending_hashtags(self, limit: int = 20, approximate: bool = APPROXIMATE_TOP_K) -> List[Dict]:
+        """Get most popular hashtags
+        
+        Reads hashtag_counts, or aggregates the hashtags table on databases
+        that predate it. Query errors propagate instead of returning no data.
+        """
+        if approximate:
+            # Stream raw hashtag rows through a fixed-size summary
+            summary = SpaceSaving()
+            with self.connection() as conn:
+                summary.update(row[0] for row in conn.execute('SELECT hashtag FROM hashtags'))
+            ranked = sorted(summary.most_common(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+            return [{'hashtag': h, 'count': c} for h, c in ranked]
+        
+        with self.connection() as conn:
+            if self._has_table(conn, 'hashtag_counts'):
+                # hashtag_counts is maintained by triggers on hashtags
+                rows = conn.execute('''
+                    SELECT hashtag, count
+                    FROM hashtag_counts
+                    ORDER BY count DESC, hashtag
+                    LIMIT ?
+                ''', (limit,)).fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT hashtag, COUNT(*) AS count
+                    FROM hashtags
+                    GROUP BY hashtag
+                    ORDER BY count DESC, hashtag
+                    LIMIT ?
+                ''', (limit,)).fetchall()
+        
+        return [{'hashtag': row[0], 'count': row[1]} for row in rows]
     
     def get_top_comments(self, limit: int = 10) -> List[Dict]:
         """Get comments with highest likes"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT c.text, c.author, c.likes_count, v.video_id
-                FROM comments c
-                JOIN videos v ON c.video_id = v.video_id
-                ORDER BY c.likes_count DESC
-                LIMIT ?
-            ''', (limit,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'text': row[0],
-                    'author': row[1],
-                    'likes_count': row[2],
-                    'video_id': row[3]
-                })
+            with self.connection() as conn:
+                cursor = conn.cursor()
+            
+                if limit <= TOP_COMMENTS_KEPT:
+                    # Bounded top-N table maintained by triggers on comments
+                    cursor.execute('''
+                        SELECT text, author, likes_count, video_id
+                        FROM top_comments
+                        ORDER BY likes_count DESC, comment_rowid
+                        LIMIT ?
+                    ''', (limit,))
+                else:
+                    cursor.execute('''
+                        SELECT c.text, c.author, c.likes_count, v.video_id
+                        FROM comments c
+                        JOIN videos v ON c.video_id = v.video_id
+                        ORDER BY c.likes_count DESC
+                        LIMIT ?
+                    ''', (limit,))
+            
+                results = []
+                for row in cursor.fetchall():
+                    results.append({
+                        'text': row[0],
+                        'author': row[1],
+                        'likes_count': row[2],
+                        'video_id': row[3]
+                    })
             
-            conn.close()
             return results
             
         except Exception as e:
@@ -227,190 +571,397 @@ class TikTokDatabase:
             return []
     
     def get_video_stats(self) -> Dict:
-        """Get overall video statistics"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Get total counts
-            cursor.execute('SELECT COUNT(*) FROM videos')
-            total_videos = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM comments')
-            total_comments = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM hashtags')
-            total_hashtags = cursor.fetchone()[0]
-            
-            # Get average engagement
-            cursor.execute('''
-                SELECT AVG(likes_count) as avg_likes, AVG(comment_count) as avg_comments
-                FROM videos
-            ''')
-            avg_stats = cursor.fetchone()
-            
-            conn.close()
-            
-            return {
-                'total_videos': total_videos,
-                'total_comments': total_comments,
-                'total_hashtags': total_hashtags,
-                'avg_likes_per_video': round(avg_stats[0] or 0, 2),
-                'avg_comments_per_video': round(avg_stats[1] or 0, 2)
-            }
-            
-        except Exception as e:
-            print(f"Error getting video stats: {e}")
-            return {}
+        """Get overall video statistics
+        
+        Reads dashboard_totals, or counts the base tables on databases that
+        predate it. Query errors propagate instead of returning no data.
+        """
+        with self.connection() as conn:
+            if self._has_table(conn, 'dashboard_totals'):
+                # Running totals maintained by triggers on videos/comments/hashtags
+                (total_videos, total_comments, total_hashtags,
+                 likes_sum, likes_rows, comment_count_sum, comment_count_rows) = conn.execute('''
+                    SELECT total_videos, total_comments, total_hashtags,
+                           likes_sum, likes_rows, comment_count_sum, comment_count_rows
+                    FROM dashboard_totals WHERE id = 1
+                ''').fetchone()
+                avg_stats = (likes_sum / likes_rows if likes_rows else None,
+                             comment_count_sum / comment_count_rows if comment_count_rows else None)
+            else:
+                total_videos, avg_likes, avg_comments = conn.execute(
+                    'SELECT COUNT(*), AVG(likes_count), AVG(comment_count) FROM videos').fetchone()
+                total_comments = conn.execute('SELECT COUNT(*) FROM comments').fetchone()[0]
+                total_hashtags = conn.execute('SELECT COUNT(*) FROM hashtags').fetchone()[0]
+                avg_stats = (avg_likes, avg_comments)
+        
+        return {
+            'total_videos': total_videos,
+            'total_comments': total_comments,
+            'total_hashtags': total_hashtags,
+            'avg_likes_per_video': round(avg_stats[0] or 0, 2),
+            'avg_comments_per_video': round(avg_stats[1] or 0, 2)
+        }
     
     def get_recent_videos(self, limit: int = 10) -> List[Dict]:
         """Get most recently scraped videos"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT video_id, author, author_avatar_medium, dynamic_cover, cover, likes_count, comment_count, scraped_at
-                FROM videos
-                ORDER BY scraped_at DESC
-                LIMIT ?
-            ''', (limit,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'video_id': row[0],
-                    'author': row[1],
-                    'author_avatar_medium': row[2],
-                    'dynamic_cover': row[3],
-                    'cover': row[4],
-                    'likes_count': row[5],
-                    'comment_count': row[6],
-                    'scraped_at': row[7]
-                })
+            with self.connection() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute('''
+                    SELECT video_id, author, author_avatar_medium, dynamic_cover, cover, likes_count, comment_count, scraped_at
+                    FROM videos
+                    ORDER BY scraped_at DESC
+                    LIMIT ?
+                ''', (limit,))
+            
+                results = []
+                for row in cursor.fetchall():
+                    results.append({
+                        'video_id': row[0],
+                        'author': row[1],
+                        'author_avatar_medium': row[2],
+                        'dynamic_cover': row[3],
+                        'cover': row[4],
+                        'likes_count': row[5],
+                        'comment_count': row[6],
+                        'scraped_at': row[7]
+                    })
             
-            conn.close()
             return results
             
         except Exception as e:
             print(f"Error getting recent videos: {e}")
             return []
     
-    def get_top_phrases(self, limit: int = 20) -> List[Dict]:
-        """Get most common 2-4 word phrases from comments"""
+    def _approximate_phrase_candidates(self, conn: sqlite3.Connection) -> Iterator[tuple]:
+        """Phrases from streaming all comment texts through a SpaceSaving summary"""
+        summary = SpaceSaving()
+        summary.update(iter_comment_phrases(row[0] for row in conn.execute('SELECT text FROM comments')))
+        return iter(summary.most_common())
+    
+    def get_top_phrases(self, limit: int = 20, approximate: bool = APPROXIMATE_TOP_K) -> List[Dict]:
+        """Get most common 2-4 word phrases from comments (reads the phrase_counts index, or streams comments when approximate)"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT text FROM comments')
-            all_comments = [row[0] for row in cursor.fetchall()]
-            conn.close()
-
-            # Moderate stopwords - more than essential but less than original
-            stopwords = set([
-                'the', 'and', 'for', 'that', 'with', 'this', 'you', 'your', 'are', 'was', 'but', 'not', 'have', 'has',
-                'just', 'like', 'get', 'got', 'all', 'out', 'too', 'can', 'she', 'him', 'her', 'his', 'our', 'they',
-                'from', 'who', 'had', 'did', 'its', 'i', 'me', 'my', 'we', 'he', 'it', 'to', 'of', 'in', 'on', 'is', 'a', 'an', 'at', 'as', 'so', 'be', 'by', 'or', 'if', 'do', 'no', 'yes', 'up', 'down', 'off', 'this', 'that', 'these', 'those', 'their', 'them', 'then', 'than', 'will', 'would', 'should', 'could', 'about', 'over', 'under', 'again', 'when', 'where', 'why', 'how', 'what', 'which', 'because', 'while', 'were', 'been', 'am', 'im', 'u', 'ur', 'isnt', 'dont', 'doesnt', 'cant', 'wont', 'youre', 'youve', 'youll', 'youd', 'hes', 'shes', 'theyre', 'weve', "we're", 'ive', 'ill', 'id', 'didnt', 'wasnt', 'arent', 'havent', 'hasnt', 'hadnt', 'couldnt', 'shouldnt', 'wouldnt', 'oh', 'ok', 'okay', 'yeah', 'nah', 'huh', 'hmm', 'lol', 'lmao', 'omg', 'pls', 'please', 'thanks', 'thank', 'welcome', 'hi', 'hey', 'yo', 'sup', 'bye', 'goodbye', 'see', 'ya', 'later', 'soon', 'now', 'then', 'never', 'always', 'sometimes', 'often', 'usually', 'rarely', 'seldom', 'once', 'twice', 'first', 'last', 'next', 'new', 'old', 'young', 'big', 'small', 'large', 'little', 'long', 'short', 'high', 'low', 'early', 'late', 'best', 'worst', 'better', 'worse', 'same', 'different', 'other', 'another', 'more', 'most', 'less', 'least', 'many', 'much', 'few', 'several', 'some', 'any', 'every', 'each'
-            ])
-
-            def clean_text(text):
-                # Better text cleaning - preserve meaningful punctuation and handle emojis
-                # Remove emojis and special characters but keep basic punctuation
-                text = re.sub(r'[^\w\s\.\,\!\?\-\']', ' ', text)
-                # Normalize whitespace
-                text = re.sub(r'\s+', ' ', text)
-                return text.lower().strip()
-
-            def get_ngrams(words, n):
-                return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
-
-            def is_quality_phrase(phrase):
-                """Check if phrase is meaningful - moderate criteria"""
-                words = phrase.split()
-                # Filter out phrases that are too repetitive - moderate threshold
-                if len(set(words)) < len(words) * 0.6:  # At least 60% unique words
-                    return False
-                # Filter out very short words in longer phrases - moderate criteria
-                if len(words) > 2:
-                    short_words = sum(1 for w in words if len(w) < 3)
-                    if short_words > len(words) * 0.6:  # More than 60% short words
-                        return False
-                return True
-
-            phrase_counter = Counter()
-            for comment in all_comments:
-                if not comment or len(comment.strip()) < 4:  # Moderate minimum comment length
-                    continue
-                    
-                cleaned = clean_text(comment)
-                words = [w for w in cleaned.split() if w not in stopwords and len(w) > 1]  # Keep min length at 2
-                
-                if len(words) < 2:  # Skip comments with too few words
-                    continue
-                
-                for n in range(2, 5):  # 2-4 word phrases
-                    ngrams = get_ngrams(words, n)
-                    for ng in ngrams:
-                        if len(ng.split()) == n and is_quality_phrase(ng):
-                            phrase_counter[ng] += 1
-
-            # Get more phrases and then filter for quality
-            top_phrases = phrase_counter.most_common(limit * 2)  # Moderate number of candidates
+            with metrics.PHRASE_SECONDS.time(source="database", mode="approximate" if approximate else "exact"), \
+                    self.connection() as conn:
+                if approximate:
+                    ranked = self._approximate_phrase_candidates(conn)
+                else:
+                    # Walked lazily from the top; reading stops once limit phrases are accepted
+                    ranked = conn.execute('''
+                        SELECT phrase, count FROM phrase_counts
+                        WHERE count >= 2
+                        ORDER BY count DESC, rowid
+                    ''')
+                candidates = islice(((p, c) for p, c in ranked if is_quality_phrase(p)), PHRASE_CANDIDATE_POOL)
+                # Drop phrases that repeat, contain or sit inside an already accepted phrase
+                filtered_phrases = suppress_near_duplicates(candidates, limit)
             
-            # Filter out very similar phrases and low-quality ones - moderate filtering
-            filtered_phrases = []
-            seen_phrases = set()
+            return [{"phrase": p, "count": c} for p, c in filtered_phrases]
+        except Exception as e:
+            print(f"Error getting top phrases: {e}")
+            return []
+    
+    def search_comments(self, query: str, video_id: Optional[str] = None, author: Optional[str] = None,
+                        min_likes: int = 0, limit: int = 20, offset: int = 0) -> Dict:
+        """Full-text search over comment text, best BM25 match first, with highlighted snippets"""
+        limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+        offset = max(offset, 0)
+        page = {"query": query, "results": [], "limit": limit, "offset": offset, "has_more": False}
+        match = fts_query(query or '')
+        if not match:
+            return page
+        
+        filters, params = [], []
+        if video_id:
+            filters.append('c.video_id = ?')
+            params.append(video_id)
+        if author:
+            filters.append('c.author = ?')
+            params.append(author)
+        if min_likes:
+            filters.append('c.likes_count >= ?')
+            params.append(min_likes)
+        where = ''.join(f' AND {f}' for f in filters)
+        
+        try:
+            with self.connection() as conn:
+                has_fts = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comments_fts'").fetchone()
+                if has_fts:
+                    # Rank first, reading comments only when a filter needs them;
+                    # bm25() is lower for better matches, and one extra row tells
+                    # whether another page exists
+                    source = 'comments_fts JOIN comments c ON c.id = comments_fts.rowid' if filters else 'comments_fts'
+                    ranked = conn.execute(f'''
+                        SELECT comments_fts.rowid, bm25(comments_fts) AS score
+                        FROM {source}
+                        WHERE comments_fts MATCH ?{where}
+                        ORDER BY score
+                        LIMIT ? OFFSET ?
+                    ''', [match, *params, limit + 1, offset]).fetchall()
+                    # Then load rows and build snippets for this page only
+                    scores = {rowid: score for rowid, score in ranked[:limit]}
+                    placeholders = ', '.join('?' * len(scores))
+                    page_rows = {row[0]: row[1:] for row in conn.execute(f'''
+                        SELECT c.id, c.comment_id, c.video_id, c.author, c.likes_count, c.text,
+                               snippet(comments_fts, 0, ?, ?, '…', ?)
+                        FROM comments_fts
+                        JOIN comments c ON c.id = comments_fts.rowid
+                        WHERE comments_fts MATCH ? AND comments_fts.rowid IN ({placeholders})
+                    ''', [_MARK_START, _MARK_END, SNIPPET_TOKENS, match, *scores])} if scores else {}
+                    rows = [page_rows[rowid] + (score,) for rowid, score in scores.items() if rowid in page_rows]
+                    has_more = len(ranked) > limit
+                else:
+                    # No FTS5 in this SQLite build: substring scan, most liked first
+                    terms = [t.strip('"*') for t in match.split()]
+                    likes = ''.join(' AND c.text LIKE ?' for _ in terms)
+                    rows = conn.execute(f'''
+                        SELECT c.comment_id, c.video_id, c.author, c.likes_count, c.text, c.text, 0.0
+                        FROM comments c
+                        WHERE 1{likes}{where}
+                        ORDER BY c.likes_count DESC, c.id
+                        LIMIT ? OFFSET ?
+                    ''', [*(f'%{t}%' for t in terms), *params, limit + 1, offset]).fetchall()
+                    has_more = len(rows) > limit
+            
+            page["has_more"] = has_more
+            page["results"] = [{
+                'comment_id': row[0],
+                'video_id': row[1],
+                'author': row[2],
+                'likes_count': row[3],
+                'text': row[4],
+                'snippet': _highlight(row[5]),
+                'score': round(-row[6], 4)
+            } for row in rows[:limit]]
+            return page
             
-            for phrase, count in top_phrases:
-                if count < 2:  # Keep lower minimum frequency threshold
-                    continue
-                    
-                # Check for duplicates (case-insensitive)
-                phrase_lower = phrase.lower()
-                if phrase_lower in seen_phrases:
-                    continue
-                    
-                # Check for very similar phrases - moderate substring filtering
-                is_duplicate = False
-                for existing_phrase, _ in filtered_phrases:
-                    if phrase in existing_phrase or existing_phrase in phrase:
-                        # Only filter if one is significantly longer than the other
-                        if abs(len(phrase.split()) - len(existing_phrase.split())) <= 1:
-                            is_duplicate = True
-                            break
+        except Exception as e:
+            print(f"Error searching comments: {e}")
+            return page
+    
+    def get_video_growth(self, video_id: str, days: int = 7) -> List[Dict]:
+        """Snapshots of one video over the last `days`, with growth since the previous one"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT h.captured_at, h.likes, h.comments, h.shares, h.plays,
+                           h.likes - LAG(h.likes) OVER w,
+                           h.comments - LAG(h.comments) OVER w,
+                           h.plays - LAG(h.plays) OVER w,
+                           h.captured_at - LAG(h.captured_at) OVER w
+                    FROM video_stats_history h
+                    JOIN videos v ON v.id = h.video_key
+                    WHERE v.video_id = ? AND h.captured_at >= CAST(strftime('%s', 'now') AS INTEGER) - ?
+                    WINDOW w AS (ORDER BY h.captured_at)
+                    ORDER BY h.captured_at
+                ''', (video_id, days * 86400))
                 
-                if not is_duplicate:
-                    filtered_phrases.append((phrase, count))
-                    seen_phrases.add(phrase_lower)
+                growth = []
+                for row in cursor.fetchall():
+                    hours = row[8] / 3600 if row[8] else None
+                    growth.append({
+                        "captured_at": row[0],
+                        "likes": row[1],
+                        "comments": row[2],
+                        "shares": row[3],
+                        "plays": row[4],
+                        "likes_gained": row[5],
+                        "comments_gained": row[6],
+                        "plays_gained": row[7],
+                        "plays_per_hour": round(row[7] / hours, 2) if hours else None
+                    })
+                return growth
+            
+        except Exception as e:
+            print(f"Error getting video growth: {e}")
+            return []
+    
+    def get_fastest_rising(self, limit: int = 10, hours: int = 24, metric: str = 'plays') -> List[Dict]:
+        """Videos ranked by how fast `metric` grew across their snapshots in the last `hours`
+        
+        Only the indexed captured_at range is read; each video's first and
+        last snapshot in the window give its gain and per-hour velocity.
+        The range is materialized before the window runs: otherwise the
+        PARTITION BY order makes SQLite skip-scan the (video_key,
+        captured_at) primary key over every video instead of using
+        idx_stats_history_captured_at.
+        """
+        if metric not in ('likes', 'comments', 'shares', 'plays'):
+            raise ValueError(f"Unknown metric: {metric}")
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    WITH recent AS MATERIALIZED (
+                        SELECT video_key, captured_at, {metric} AS value
+                        FROM video_stats_history
+                        WHERE captured_at >= CAST(strftime('%s', 'now') AS INTEGER) - ?
+                    ),
+                    windowed AS (
+                        SELECT video_key, captured_at, value,
+                               FIRST_VALUE(value) OVER w AS first_value,
+                               FIRST_VALUE(captured_at) OVER w AS first_at,
+                               ROW_NUMBER() OVER (PARTITION BY video_key ORDER BY captured_at DESC) AS newest
+                        FROM recent
+                        WINDOW w AS (PARTITION BY video_key ORDER BY captured_at)
+                    )
+                    SELECT v.video_id, v.author, w.value, w.value - w.first_value,
+                           (w.value - w.first_value) * 3600.0 / (w.captured_at - w.first_at)
+                    FROM windowed w
+                    JOIN videos v ON v.id = w.video_key
+                    WHERE w.newest = 1 AND w.captured_at > w.first_at
+                    ORDER BY 5 DESC
+                    LIMIT ?
+                ''', (hours * 3600, limit))
                 
-                if len(filtered_phrases) >= limit:
-                    break
-
-            return [{"phrase": p, "count": c} for p, c in filtered_phrases]
+                return [{
+                    "video_id": row[0],
+                    "author": row[1],
+                    metric: row[2],
+                    "gained": row[3],
+                    "per_hour": round(row[4], 2)
+                } for row in cursor.fetchall()]
+            
         except Exception as e:
-            print(f"Error getting top phrases: {e}")
+            print(f"Error getting fastest rising videos: {e}")
             return []
     
+    def rebuild_summaries(self) -> bool:
+        """Recompute the dashboard summary tables from scratch"""
+        try:
+            with self.connection() as conn:
+                rebuild_summaries(conn.cursor())
+            return True
+            
+        except Exception as e:
+            print(f"Error rebuilding summaries: {e}")
+            return False
+    
+    def rebuild_phrase_counts(self, chunk_size: int = 50_000, workers: Optional[int] = None) -> int:
+        """Recount phrase_counts from every stored comment (e.g. after stopword changes)
+        
+        Comments are streamed in batches of chunk_size per worker so memory
+        stays bounded; each batch is counted across `workers` processes
+        (default PHRASE_WORKERS). Returns the number of distinct phrases stored.
+        """
+        workers = PHRASE_WORKERS if workers is None else max(1, workers)
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            # A second connection streams comments while this thread's rewrites phrase_counts
+            with closing(self._open_connection()) as reader, self.connection() as conn:
+                conn.execute('DELETE FROM phrase_counts')
+                cursor = reader.execute('SELECT text FROM comments ORDER BY id')
+                while True:
+                    rows = cursor.fetchmany(chunk_size * workers)
+                    if not rows:
+                        break
+                    counts = count_phrases_parallel([row[0] for row in rows], count_comment_phrases,
+                                                    workers=workers, executor=pool)
+                    self._upsert_phrase_counts(conn, counts)
+                total = conn.execute('SELECT COUNT(*) FROM phrase_counts').fetchone()[0]
+            return total
+            
+        except Exception as e:
+            print(f"Error rebuilding phrase counts: {e}")
+            return 0
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    
     def update_video_media(self, video_data: Dict) -> bool:
         """Update video media data (covers and avatars)"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE videos 
-                SET author_avatar_medium = ?, dynamic_cover = ?, cover = ?
-                WHERE video_id = ?
-            ''', (
-                video_data.get('author_avatar_medium'),
-                video_data.get('dynamic_cover'),
-                video_data.get('cover'),
-                video_data.get('video_id')
-            ))
-            
-            conn.commit()
-            conn.close()
+            with DB_WRITE_SECONDS.time(operation="update_video_media"), self.connection() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute('''
+                    UPDATE videos 
+                    SET author_avatar_medium = ?, dynamic_cover = ?, cover = ?
+                    WHERE video_id = ?
+                ''', (
+                    video_data.get('author_avatar_medium'),
+                    video_data.get('dynamic_cover'),
+                    video_data.get('cover'),
+                    video_data.get('video_id')
+                ))
+            
             return True
             
         except Exception as e:
             print(f"Error updating video media: {e}")
-            return False 
\ No newline at end of file
+            return False 
+    
+    def save_job(self, job: Dict) -> bool:
+        """Insert or update a job history row (see jobs.Job.to_dict)"""
+        try:
+            with self.connection() as conn:
+                conn.execute('''
+                    INSERT INTO jobs (job_id, kind, state, message, error,
+                                      created_at, started_at, finished_at, stages)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(job_id) DO UPDATE SET
+                        state = excluded.state,
+                        message = excluded.message,
+                        error = excluded.error,
+                        started_at = excluded.started_at,
+                        finished_at = excluded.finished_at,
+                        stages = excluded.stages
+                ''', (
+                    job['job_id'], job['kind'], job['state'], job.get('message'), job.get('error'),
+                    job['created_at'], job.get('started_at'), job.get('finished_at'),
+                    json.dumps(job.get('stages', []))
+                ))
+            return True
+            
+        except Exception as e:
+            print(f"Error saving job: {e}")
+            return False
+    
+    def finish_stale_jobs(self, active_states: Iterable[str], state: str, error: str,
+                          finished_at: float) -> int:
+        """Close job rows a previous process left active; returns how many"""
+        states = list(active_states)
+        try:
+            with self.connection() as conn:
+                cursor = conn.execute(f'''
+                    UPDATE jobs SET state = ?, message = ?, error = ?, finished_at = ?
+                    WHERE state IN ({','.join('?' * len(states))})
+                ''', (state, f"Error: {error}", error, finished_at, *states))
+            return cursor.rowcount
+            
+        except Exception as e:
+            print(f"Error finishing stale jobs: {e}")
+            return 0
+    
+    def get_jobs(self, limit: int = 20, job_id: Optional[str] = None) -> List[Dict]:
+        """Most recent jobs first, or the single job with job_id"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT job_id, kind, state, message, error, created_at, started_at, finished_at, stages
+                    FROM jobs
+                    WHERE ? IS NULL OR job_id = ?
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                ''', (job_id, job_id, limit))
+                
+                return [{
+                    "job_id": row[0],
+                    "kind": row[1],
+                    "state": row[2],
+                    "message": row[3],
+                    "error": row[4],
+                    "created_at": row[5],
+                    "started_at": row[6],
+                    "finished_at": row[7],
+                    "stages": json.loads(row[8]) if row[8] else []
+                } for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"Error getting jobs: {e}")
+            return []
@@ -1,16 +1,30 @@
 import sqlite3
 import os
+import sys
+import argparse
 
-def create_database():
-    """Create SQLite database and tables for TikTok data"""
-    
-    # Create database file
-    db_path = "tiktok_data.db"
-    
-    # Connect to database (creates it if it doesn't exist)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+from text_analytics import count_comment_phrases
+
+DB_PATH = "tiktok_data.db"
+
+# Rows kept in the top_comments summary; get_top_comments reads it for any
+# limit up to this size
+TOP_COMMENTS_KEPT = 100
+
+# Fills top_comments back up to TOP_COMMENTS_KEPT rows with the most-liked
+# stored comments it does not hold yet (walks idx_comments_likes from the top)
+TOP_COMMENTS_REFILL = f'''
+    INSERT INTO top_comments (comment_rowid, comment_id, video_id, text, author, likes_count)
+    SELECT c.id, c.comment_id, c.video_id, c.text, c.author, c.likes_count
+    FROM comments c
+    JOIN videos v ON c.video_id = v.video_id
+    WHERE NOT EXISTS (SELECT 1 FROM top_comments t WHERE t.comment_rowid = c.id)
+    ORDER BY c.likes_count DESC, c.id
+    LIMIT MAX(0, {TOP_COMMENTS_KEPT} - (SELECT COUNT(*) FROM top_comments))
+'''
+
+def _create_base_tables(cursor):
+    """Create the videos, comments, hashtags and sentiment tables"""
     # Create videos table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS videos (
@@ -29,7 +43,7 @@ def create_database():
             scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
     # Create comments table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS comments (
@@ -44,7 +58,7 @@ def create_database():
             FOREIGN KEY (video_id) REFERENCES videos (video_id)
         )
     ''')
-    
+
     # Create hashtags table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS hashtags (
@@ -55,7 +69,7 @@ def create_database():
             FOREIGN KEY (video_id) REFERENCES videos (video_id)
         )
     ''')
-    
+
     # Create sentiment_analysis table (for future use)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS sentiment_analysis (
@@ -69,36 +83,465 @@ def create_database():
             FOREIGN KEY (video_id) REFERENCES videos (video_id)
         )
     ''')
+
+def _add_media_columns(cursor):
+    """Add cover/avatar columns to videos tables created before they existed"""
+    cursor.execute('PRAGMA table_info(videos)')
+    existing = {row[1] for row in cursor.fetchall()}
+    for column in ('author_avatar_medium', 'dynamic_cover', 'cover'):
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} TEXT')
+            print(f"✅ Added {column} column")
+
+def _unique_hashtags(cursor):
+    """One row per (video, hashtag), so inserts can use INSERT OR IGNORE"""
+    cursor.execute('''
+        DELETE FROM hashtags
+        WHERE id NOT IN (SELECT MIN(id) FROM hashtags GROUP BY video_id, hashtag)
+    ''')
+    if cursor.rowcount > 0:
+        print(f"🧹 Removed {cursor.rowcount} duplicate hashtag rows")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_hashtags_video_hashtag
+        ON hashtags (video_id, hashtag)
+    ''')
+
+def _dashboard_indexes(cursor):
+    """Indexes for the per-video and dashboard queries in TikTokDatabase"""
+    # get_video_comment_count: COUNT(*) WHERE video_id = ? is answered from the index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments (video_id)')
+    # get_top_comments: ORDER BY likes_count DESC LIMIT n walks the index from the top
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_likes ON comments (likes_count DESC)')
+    # get_recent_videos: ORDER BY scraped_at DESC LIMIT n
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_scraped_at ON videos (scraped_at DESC)')
+    # get_trending_hashtags: GROUP BY hashtag reads this covering index in order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_hashtags_hashtag ON hashtags (hashtag)')
+
+def _phrase_counts(cursor):
+    """Incrementally maintained 2-4 word phrase counts, backfilled from comments"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS phrase_counts (
+            phrase TEXT PRIMARY KEY,
+            n INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_phrase_counts_count ON phrase_counts (count DESC)')
     
-    # Add new columns to existing videos table if they don't exist
-    try:
-        cursor.execute('ALTER TABLE videos ADD COLUMN author_avatar_medium TEXT')
-        print("✅ Added author_avatar_medium column")
-    except sqlite3.OperationalError:
-        print("ℹ️ author_avatar_medium column already exists")
+    rows = cursor.connection.execute('SELECT text FROM comments ORDER BY id')
+    while True:
+        chunk = rows.fetchmany(50_000)
+        if not chunk:
+            break
+        counts = count_comment_phrases(row[0] for row in chunk)
+        cursor.executemany('''
+            INSERT INTO phrase_counts (phrase, n, count) VALUES (?, ?, ?)
+            ON CONFLICT(phrase) DO UPDATE SET count = count + excluded.count
+        ''', ((phrase, phrase.count(' ') + 1, count) for phrase, count in counts.items()))
+
+def rebuild_summaries(cursor):
+    """Recompute the dashboard summary tables from the base tables"""
+    cursor.execute('DELETE FROM dashboard_totals')
+    cursor.execute('''
+        INSERT INTO dashboard_totals
+        (id, total_videos, total_comments, total_hashtags, likes_sum, likes_rows, comment_count_sum, comment_count_rows)
+        SELECT 1,
+            (SELECT COUNT(*) FROM videos),
+            (SELECT COUNT(*) FROM comments),
+            (SELECT COUNT(*) FROM hashtags),
+            (SELECT COALESCE(SUM(likes_count), 0) FROM videos),
+            (SELECT COUNT(likes_count) FROM videos),
+            (SELECT COALESCE(SUM(comment_count), 0) FROM videos),
+            (SELECT COUNT(comment_count) FROM videos)
+    ''')
     
-    try:
-        cursor.execute('ALTER TABLE videos ADD COLUMN dynamic_cover TEXT')
-        print("✅ Added dynamic_cover column")
-    except sqlite3.OperationalError:
-        print("ℹ️ dynamic_cover column already exists")
+    cursor.execute('DELETE FROM hashtag_counts')
+    cursor.execute('''
+        INSERT INTO hashtag_counts (hashtag, count)
+        SELECT hashtag, COUNT(*) FROM hashtags GROUP BY hashtag
+    ''')
+    
+    cursor.execute('DELETE FROM top_comments')
+    cursor.execute(TOP_COMMENTS_REFILL)
+
+def _dashboard_summaries(cursor):
+    """Summary tables for the dashboard export, kept current by triggers"""
+    # Running totals behind get_video_stats (AVG = sum / non-NULL rows)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_videos INTEGER NOT NULL DEFAULT 0,
+            total_comments INTEGER NOT NULL DEFAULT 0,
+            total_hashtags INTEGER NOT NULL DEFAULT 0,
+            likes_sum INTEGER NOT NULL DEFAULT 0,
+            likes_rows INTEGER NOT NULL DEFAULT 0,
+            comment_count_sum INTEGER NOT NULL DEFAULT 0,
+            comment_count_rows INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
     
+    # Per-hashtag counts behind get_trending_hashtags
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hashtag_counts (
+            hashtag TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_hashtag_counts_count ON hashtag_counts (count DESC, hashtag)')
+    
+    # Bounded copy of the most-liked comments behind get_top_comments
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS top_comments (
+            comment_rowid INTEGER PRIMARY KEY,
+            comment_id TEXT UNIQUE NOT NULL,
+            video_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            author TEXT,
+            likes_count INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_top_comments_likes ON top_comments (likes_count DESC, comment_rowid)')
+    
+    # Video totals and average inputs
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_summary_insert AFTER INSERT ON videos
+        BEGIN
+            UPDATE dashboard_totals SET
+                total_videos = total_videos + 1,
+                likes_sum = likes_sum + COALESCE(NEW.likes_count, 0),
+                likes_rows = likes_rows + (NEW.likes_count IS NOT NULL),
+                comment_count_sum = comment_count_sum + COALESCE(NEW.comment_count, 0),
+                comment_count_rows = comment_count_rows + (NEW.comment_count IS NOT NULL)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_summary_update AFTER UPDATE OF likes_count, comment_count ON videos
+        BEGIN
+            UPDATE dashboard_totals SET
+                likes_sum = likes_sum - COALESCE(OLD.likes_count, 0) + COALESCE(NEW.likes_count, 0),
+                likes_rows = likes_rows - (OLD.likes_count IS NOT NULL) + (NEW.likes_count IS NOT NULL),
+                comment_count_sum = comment_count_sum - COALESCE(OLD.comment_count, 0) + COALESCE(NEW.comment_count, 0),
+                comment_count_rows = comment_count_rows - (OLD.comment_count IS NOT NULL) + (NEW.comment_count IS NOT NULL)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_summary_delete AFTER DELETE ON videos
+        BEGIN
+            UPDATE dashboard_totals SET
+                total_videos = total_videos - 1,
+                likes_sum = likes_sum - COALESCE(OLD.likes_count, 0),
+                likes_rows = likes_rows - (OLD.likes_count IS NOT NULL),
+                comment_count_sum = comment_count_sum - COALESCE(OLD.comment_count, 0),
+                comment_count_rows = comment_count_rows - (OLD.comment_count IS NOT NULL)
+            WHERE id = 1;
+        END
+    ''')
+    
+    # Comment totals and the top-N table (only comments whose video is stored,
+    # matching the JOIN in get_top_comments)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS comments_summary_insert AFTER INSERT ON comments
+        BEGIN
+            UPDATE dashboard_totals SET total_comments = total_comments + 1 WHERE id = 1;
+            INSERT OR IGNORE INTO top_comments (comment_rowid, comment_id, video_id, text, author, likes_count)
+            SELECT NEW.id, NEW.comment_id, NEW.video_id, NEW.text, NEW.author, NEW.likes_count
+            WHERE EXISTS (SELECT 1 FROM videos WHERE video_id = NEW.video_id)
+              AND ((SELECT COUNT(*) FROM top_comments) < {TOP_COMMENTS_KEPT}
+                   OR NEW.likes_count > (SELECT MIN(likes_count) FROM top_comments));
+            DELETE FROM top_comments WHERE comment_rowid IN (
+                SELECT comment_rowid FROM top_comments
+                ORDER BY likes_count DESC, comment_rowid
+                LIMIT -1 OFFSET {TOP_COMMENTS_KEPT}
+            );
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_summary_delete AFTER DELETE ON comments
+        BEGIN
+            UPDATE dashboard_totals SET total_comments = total_comments - 1 WHERE id = 1;
+            DELETE FROM top_comments WHERE comment_rowid = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_summary_update AFTER UPDATE OF likes_count, text, author ON comments
+        BEGIN
+            UPDATE top_comments
+            SET likes_count = NEW.likes_count, text = NEW.text, author = NEW.author
+            WHERE comment_rowid = NEW.id;
+        END
+    ''')
+    
+    # Hashtag totals and per-tag counts
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS hashtags_summary_insert AFTER INSERT ON hashtags
+        BEGIN
+            UPDATE dashboard_totals SET total_hashtags = total_hashtags + 1 WHERE id = 1;
+            INSERT INTO hashtag_counts (hashtag, count) VALUES (NEW.hashtag, 1)
+            ON CONFLICT(hashtag) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS hashtags_summary_delete AFTER DELETE ON hashtags
+        BEGIN
+            UPDATE dashboard_totals SET total_hashtags = total_hashtags - 1 WHERE id = 1;
+            UPDATE hashtag_counts SET count = count - 1 WHERE hashtag = OLD.hashtag;
+            DELETE FROM hashtag_counts WHERE hashtag = OLD.hashtag AND count <= 0;
+        END
+    ''')
+    
+    rebuild_summaries(cursor)
+
+def _jobs_table(cursor):
+    """History of background refresh jobs (see jobs.JobManager)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            state TEXT NOT NULL,
+            message TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            stages TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at DESC)')
+
+# Counters captured per snapshot, as (history column, videos column)
+STATS_HISTORY_COLUMNS = [
+    ('likes', 'likes_count'),
+    ('comments', 'comment_count'),
+    ('shares', 'share_count'),
+    ('plays', 'play_count'),
+]
+
+def _video_stats_history(cursor):
+    """Append-only counter snapshots per video, for growth and velocity queries"""
+    # Compact rows: integer video key (videos.id, stable since the UPSERT) and
+    # epoch seconds, clustered by (video_key, captured_at) without a rowid
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_stats_history (
+            video_key INTEGER NOT NULL,
+            captured_at INTEGER NOT NULL,
+            likes INTEGER NOT NULL,
+            comments INTEGER NOT NULL,
+            shares INTEGER NOT NULL,
+            plays INTEGER NOT NULL,
+            PRIMARY KEY (video_key, captured_at)
+        ) WITHOUT ROWID
+    ''')
+    # Range scans over recent snapshots for velocity ranking
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stats_history_captured_at ON video_stats_history (captured_at)')
+    
+    values = ', '.join(f'COALESCE(NEW.{column}, 0)' for _, column in STATS_HISTORY_COLUMNS)
+    changed = ' OR '.join(f'NEW.{column} IS NOT OLD.{column}' for _, column in STATS_HISTORY_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS videos_history_insert AFTER INSERT ON videos
+        BEGIN
+            INSERT OR REPLACE INTO video_stats_history (video_key, captured_at, likes, comments, shares, plays)
+            VALUES (NEW.id, CAST(strftime('%s', 'now') AS INTEGER), {values});
+        END
+    ''')
+    # Unchanged counters add no row; the last snapshot still holds
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS videos_history_update
+        AFTER UPDATE OF likes_count, comment_count, share_count, play_count ON videos
+        WHEN {changed}
+        BEGIN
+            INSERT OR REPLACE INTO video_stats_history (video_key, captured_at, likes, comments, shares, plays)
+            VALUES (NEW.id, CAST(strftime('%s', 'now') AS INTEGER), {values});
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS videos_history_delete AFTER DELETE ON videos
+        BEGIN
+            DELETE FROM video_stats_history WHERE video_key = OLD.id;
+        END
+    ''')
+    
+    # One starting snapshot per existing video, dated when it was scraped
+    cursor.execute('''
+        INSERT OR IGNORE INTO video_stats_history (video_key, captured_at, likes, comments, shares, plays)
+        SELECT id, COALESCE(CAST(strftime('%s', scraped_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+               COALESCE(likes_count, 0), COALESCE(comment_count, 0), COALESCE(share_count, 0), COALESCE(play_count, 0)
+        FROM videos
+    ''')
+
+def _comments_fts(cursor):
+    """Full-text index over comments.text for search_comments"""
+    # External-content table: the index stores tokens only and reads text
+    # back from comments (rowid = comments.id) for snippets
     try:
-        cursor.execute('ALTER TABLE videos ADD COLUMN cover TEXT')
-        print("✅ Added cover column")
-    except sqlite3.OperationalError:
-        print("ℹ️ cover column already exists")
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+                text,
+                content='comments',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search_comments falls back to LIKE
+        print(f"⚠️ Skipping comments_fts ({e}); comment search will scan the comments table")
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments
+        BEGIN
+            INSERT INTO comments_fts (rowid, text) VALUES (NEW.id, NEW.text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF text ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+            INSERT INTO comments_fts (rowid, text) VALUES (NEW.id, NEW.text);
+        END
+    ''')
+    # Index the comments already stored
+    cursor.execute("INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')")
+
+def _top_comments_refill(cursor):
+    """Refill top_comments when a comment leaves it or loses likes
+
+    The version 6 triggers only removed rows, so after a delete or a
+    likes drop the table shrank or kept a comment that no longer ranked.
+    """
+    cursor.execute('DROP TRIGGER IF EXISTS comments_summary_delete')
+    cursor.execute('DROP TRIGGER IF EXISTS comments_summary_update')
+    cursor.execute(f'''
+        CREATE TRIGGER comments_summary_delete AFTER DELETE ON comments
+        BEGIN
+            UPDATE dashboard_totals SET total_comments = total_comments - 1 WHERE id = 1;
+            DELETE FROM top_comments WHERE comment_rowid = OLD.id;
+            {TOP_COMMENTS_REFILL};
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER comments_summary_update AFTER UPDATE OF text, author ON comments
+        BEGIN
+            UPDATE top_comments SET text = NEW.text, author = NEW.author
+            WHERE comment_rowid = NEW.id;
+        END
+    ''')
+    # Re-rank the changed comment: take it out, refill, then let it back in
+    # if it now beats the least-liked row
+    cursor.execute(f'''
+        CREATE TRIGGER comments_top_likes_update AFTER UPDATE OF likes_count ON comments
+        WHEN NEW.likes_count IS NOT OLD.likes_count
+        BEGIN
+            DELETE FROM top_comments WHERE comment_rowid = NEW.id;
+            {TOP_COMMENTS_REFILL};
+            INSERT OR IGNORE INTO top_comments (comment_rowid, comment_id, video_id, text, author, likes_count)
+            SELECT NEW.id, NEW.comment_id, NEW.video_id, NEW.text, NEW.author, NEW.likes_count
+            WHERE EXISTS (SELECT 1 FROM videos WHERE video_id = NEW.video_id)
+              AND NEW.likes_count > (SELECT MIN(likes_count) FROM top_comments);
+            DELETE FROM top_comments WHERE comment_rowid IN (
+                SELECT comment_rowid FROM top_comments
+                ORDER BY likes_count DESC, comment_rowid
+                LIMIT -1 OFFSET {TOP_COMMENTS_KEPT}
+            );
+        END
+    ''')
+    # get_top_comments only lists comments whose video is stored
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS videos_top_comments_delete AFTER DELETE ON videos
+        BEGIN
+            DELETE FROM top_comments WHERE video_id = OLD.video_id;
+            {TOP_COMMENTS_REFILL};
+        END
+    ''')
     
-    # Commit changes and close connection
-    conn.commit()
+    # Repair tables that already drifted
+    cursor.execute('DELETE FROM top_comments')
+    cursor.execute(TOP_COMMENTS_REFILL)
+
+# Ordered schema migrations: (version, description, function). Append only;
+# the database records the last applied version in PRAGMA user_version.
+MIGRATIONS = [
+    (1, "create base tables", _create_base_tables),
+    (2, "add media columns to videos", _add_media_columns),
+    (3, "unique (video_id, hashtag)", _unique_hashtags),
+    (4, "dashboard query indexes", _dashboard_indexes),
+    (5, "phrase_counts table", _phrase_counts),
+    (6, "dashboard summary tables and triggers", _dashboard_summaries),
+    (7, "jobs history table", _jobs_table),
+    (8, "video_stats_history table and triggers", _video_stats_history),
+    (9, "comments_fts full-text index and triggers", _comments_fts),
+    (10, "top_comments refill triggers", _top_comments_refill),
+]
+
+def get_schema_version(conn) -> int:
+    """Return the schema version recorded in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, verbose: bool = True) -> list:
+    """Apply every pending migration, each in its own transaction
+
+    Returns the list of versions that were applied.
+    """
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        cursor = conn.cursor()
+        try:
+            # IMMEDIATE takes the write lock up front; re-check in case another
+            # process applied this migration while we were waiting
+            cursor.execute('BEGIN IMMEDIATE')
+            if version <= get_schema_version(conn):
+                cursor.execute('COMMIT')
+                continue
+            apply(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"✅ Migration {version}: {description}")
+    return applied
+
+def create_database(db_path: str = DB_PATH):
+    """Create SQLite database and bring its schema up to date"""
+
+    # Connect to database (creates it if it doesn't exist)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+
+    # WAL is stored in the file: readers no longer block the collector
+    conn.execute('PRAGMA journal_mode = WAL')
+
+    applied = migrate(conn)
+    version = get_schema_version(conn)
     conn.close()
-    
-    print(f"✅ Database created successfully: {db_path}")
-    print("📊 Tables created:")
+
+    print(f"✅ Database ready: {db_path} (schema version {version})")
+    if not applied:
+        print("ℹ️ Schema already up to date")
+    print("📊 Tables:")
     print("   - videos")
-    print("   - comments") 
+    print("   - comments")
     print("   - hashtags")
     print("   - sentiment_analysis")
 
 if __name__ == "__main__":
-    create_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create or upgrade the TikTok database")
+    parser.add_argument("db_path", nargs="?", default=DB_PATH)
+    parser.add_argument("--rebuild-phrases", action="store_true",
+                        help="Recount phrase_counts from all comments (after stopword changes)")
+    args = parser.parse_args()
+    
+    create_database(args.db_path)
+    if args.rebuild_phrases:
+        from database_helper import TikTokDatabase
+        with TikTokDatabase(args.db_path) as db:
+            print(f"🔁 Rebuilt phrase counts: {db.rebuild_phrase_counts():,} distinct phrases")
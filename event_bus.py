@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+In-process publish/subscribe bus for refresh progress.
+
+The scraper thread publishes events and each Server-Sent Events client
+holds its own bounded queue. A slow client loses its oldest events and
+never blocks the publisher. Recent events are kept in a short replay
+buffer, so a reconnecting EventSource (Last-Event-ID) catches up on
+what it missed.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Configuration
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 100
+
+
+class Subscription:
+    """One subscriber's queue of pending events."""
+
+    def __init__(self, bus: "EventBus", maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self._bus = bus
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _put(self, event: Dict):
+        """Enqueue an event, discarding the oldest one if the queue is full."""
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next event, or None if nothing arrived within timeout seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class EventBus:
+    """Thread-safe fan-out of events to any number of subscribers."""
+
+    def __init__(self, replay_size: int = REPLAY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._recent: deque = deque(maxlen=replay_size)
+        self._next_id = 1
+
+    def publish(self, event_type: str, data: Dict) -> Dict:
+        """Send an event to every current subscriber and return it."""
+        with self._lock:
+            event = {"id": self._next_id, "event": event_type, "data": data, "time": time.time()}
+            self._next_id += 1
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._put(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """Register a new subscriber, replaying buffered events after last_event_id."""
+        subscription = Subscription(self)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event["id"] > last_event_id:
+                        subscription._put(event)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event: Dict) -> str:
+    """Encode an event in the text/event-stream wire format."""
+    payload = json.dumps(event["data"], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
@@ -1,18 +1,63 @@
 from database_helper import TikTokDatabase
+from static_assets import precompress
+from typing import Dict
 import json
+import os
+import tempfile
 
-def export_dashboard_data():
-    db = TikTokDatabase()
-    dashboard_data = {
-        "stats": db.get_video_stats(),
-        "hashtags": db.get_trending_hashtags(20),
-        "top_phrases": db.get_top_phrases(30),
-        "top_comments": db.get_top_comments(10),
-        "recent_videos": db.get_recent_videos(10)
-    }
-    with open("dashboard_data.json", "w", encoding="utf-8") as f:
-        json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
-    print("Exported dashboard_data.json")
+import metrics
+
+DATA_FILE = "dashboard_data.json"
+
+EXPORT_SECONDS = metrics.histogram("tiktok_export_seconds", "Dashboard export: database queries, JSON write, compression",
+                                   ("step",))
+
+def build_dashboard_data(db: TikTokDatabase) -> Dict:
+    """Assemble the dashboard payload from the database"""
+    with EXPORT_SECONDS.time(step="build"):
+        return {
+            "stats": db.get_video_stats(),
+            "hashtags": db.get_trending_hashtags(20),
+            "top_phrases": db.get_top_phrases(30),
+            "top_comments": db.get_top_comments(10),
+            "recent_videos": db.get_recent_videos(10)
+        }
+
+def write_dashboard_data(dashboard_data: Dict, data_file: str = DATA_FILE):
+    """Write the payload atomically so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(data_file))
+    with EXPORT_SECONDS.time(step="write"):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, data_file)
+    with EXPORT_SECONDS.time(step="compress"):
+        precompress(data_file)
+
+def is_empty_payload(dashboard_data: Dict) -> bool:
+    """True when the payload has no stats or no videos"""
+    stats = dashboard_data.get("stats") or {}
+    return not stats.get("total_videos")
+
+def export_dashboard_data(db_path: str = "tiktok_data.db", data_file: str = DATA_FILE) -> Dict:
+    """Export dashboard data to data_file and return the payload
+    
+    Raises instead of replacing an existing data_file with an empty payload.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    # Read-only handles never migrate, so create the summary tables the
+    # dashboard queries read before opening one
+    with TikTokDatabase(db_path) as db:
+        db.get_connection()
+    with TikTokDatabase(db_path, read_only=True) as db:
+        dashboard_data = build_dashboard_data(db)
+    if is_empty_payload(dashboard_data) and os.path.exists(data_file):
+        raise ValueError(f"Export from {db_path} is empty; keeping the existing {data_file}")
+    write_dashboard_data(dashboard_data, data_file)
+    print(f"Exported {data_file}")
+    return dashboard_data
 
 if __name__ == "__main__":
-    export_dashboard_data() 
\ No newline at end of file
+    export_dashboard_data()
@@ -6,16 +6,36 @@ Replaces the old TikTokApi-based comments.py with a more reliable solution.
 
 import os
 import json
-import hashlib
-import requests
+import heapq
+import argparse
+import time
+import tempfile
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
-from collections import Counter
-import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+from change_detection import ChangeDetector, RefreshState
+from heavy_hitters import APPROXIMATE_TOP_K, SpaceSaving
+from image_cache import ImageCache
+from phrase_engine import count_phrases_parallel
+from sources import REPLAY_SPEED, DataSource, RecordingSource, ReplaySource, TikHubSource
+from text_analytics import count_extract_phrases, iter_extract_phrases
+from tikhub_client import TikHubClient, endpoint_label, get_client
 
 # Configuration
-BASE_URL = "https://api.tikhub.io"
+BASE_URL = os.environ.get("TIKHUB_BASE_URL", "https://api.tikhub.io")
+MAX_WORKERS = int(os.environ.get("TIKHUB_WORKERS", "8"))
+MAX_VIDEOS = int(os.environ.get("TIKHUB_MAX_VIDEOS", "30"))
+MAX_COMMENTS = int(os.environ.get("TIKHUB_MAX_COMMENTS", "20"))
+THUMBNAILS = os.environ.get("IMAGE_THUMBNAILS", "0") == "1"
+
+# Dashboard display sizes at 2x: cover cards are ~200x350, avatars 28x28
+COVER_THUMBNAIL_SIZE = (400, 712)
+AVATAR_THUMBNAIL_SIZE = (96, 96)
 
 def get_headers():
     """Get API headers with the current API key."""
@@ -24,160 +44,308 @@ def get_headers():
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
-COVERS_DIR = SCRIPT_DIR / "images" / "covers"
-AVATARS_DIR = SCRIPT_DIR / "images" / "avatars"
+IMAGES_DIR = SCRIPT_DIR / "images"
+COVERS_DIR = IMAGES_DIR / "covers"
+AVATARS_DIR = IMAGES_DIR / "avatars"
 DATA_FILE = SCRIPT_DIR / "dashboard_data.json"
+STATE_FILE = SCRIPT_DIR / "refresh_state.json"
 
+image_cache = ImageCache(IMAGES_DIR)
 
-def fetch_explore_videos(count: int = 30) -> List[Dict]:
-    """Fetch trending/explore videos from TikHub."""
-    url = f"{BASE_URL}/api/v1/tiktok/web/fetch_explore_post"
-    params = {"count": count}
+FETCH_ERRORS = metrics.counter("tiktok_fetch_errors_total", "API streams cut short by an error", ("endpoint",))
+
+
+def fetch_error_count() -> int:
+    """API errors the streaming iterators swallowed so far, across endpoints."""
+    return int(sum(series["value"] for series in FETCH_ERRORS.snapshot()))
+
+
+def _paginate(url: str, params: Dict, items_key: str, client: TikHubClient,
+              max_items: Optional[int] = None, max_pages: Optional[int] = None,
+              max_seconds: Optional[float] = None) -> Iterator[Dict]:
+    """Lazily yield items from a cursor-paginated TikHub endpoint.
     
-    try:
-        resp = requests.get(url, headers=get_headers(), params=params, timeout=30)
+    Follows ``cursor``/``has_more`` until the endpoint runs dry or one of the
+    item, page or time limits is reached. API errors raise; the iterators
+    below end the stream on them and count them in FETCH_ERRORS.
+    """
+    started = time.monotonic()
+    cursor = None
+    pages = 0
+    yielded = 0
+    
+    while True:
+        if max_pages is not None and pages >= max_pages:
+            return
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            return
+        
+        page_params = dict(params)
+        if cursor is not None:
+            page_params["cursor"] = cursor
+        
+        resp = client.get(url, headers=get_headers(), params=page_params, timeout=30)
         resp.raise_for_status()
         data = resp.json()
         
-        if data.get("code") == 200:
-            items = data.get("data", {}).get("itemList", [])
-            print(f"✅ Fetched {len(items)} trending videos")
-            return items
-        else:
-            print(f"❌ API error: {data.get('message')}")
-            return []
+        if data.get("code") != 200:
+            raise RuntimeError(f"API error: {data.get('message')}")
+        
+        payload = data.get("data") or {}
+        items = payload.get(items_key) or []
+        pages += 1
+        
+        for item in items:
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        
+        has_more = payload.get("hasMore", payload.get("has_more"))
+        next_cursor = payload.get("cursor")
+        if not items or not has_more or next_cursor is None or next_cursor == cursor:
+            return
+        cursor = next_cursor
+
+
+def iter_explore_videos(max_items: Optional[int] = 30, max_pages: Optional[int] = None,
+                        max_seconds: Optional[float] = None, page_size: int = 30,
+                        client: Optional[TikHubClient] = None) -> Iterator[Dict]:
+    """Stream trending/explore videos from TikHub, following cursors."""
+    client = client or get_client()
+    url = f"{BASE_URL}/api/v1/tiktok/web/fetch_explore_post"
+    if max_items is not None:
+        page_size = min(page_size, max_items)
+    
+    try:
+        yield from _paginate(url, {"count": page_size}, "itemList", client,
+                             max_items=max_items, max_pages=max_pages, max_seconds=max_seconds)
     except Exception as e:
+        FETCH_ERRORS.inc(endpoint=endpoint_label(url))
         print(f"❌ Error fetching videos: {e}")
-        return []
 
 
-def fetch_video_comments(video_id: str, count: int = 20) -> List[Dict]:
-    """Fetch comments for a specific video."""
+def iter_video_comments(video_id: str, max_items: Optional[int] = 20, max_pages: Optional[int] = None,
+                        max_seconds: Optional[float] = None, page_size: int = 20,
+                        client: Optional[TikHubClient] = None) -> Iterator[Dict]:
+    """Stream comments for a specific video, following cursors."""
+    client = client or get_client()
     url = f"{BASE_URL}/api/v1/tiktok/web/fetch_post_comment"
-    params = {"aweme_id": video_id, "count": count}
+    if max_items is not None:
+        page_size = min(page_size, max_items)
     
     try:
-        resp = requests.get(url, headers=get_headers(), params=params, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        if data.get("code") == 200:
-            comments = data.get("data", {}).get("comments", [])
-            return comments if comments else []
-        return []
+        yield from _paginate(url, {"aweme_id": video_id, "count": page_size}, "comments", client,
+                             max_items=max_items, max_pages=max_pages, max_seconds=max_seconds)
     except Exception as e:
+        FETCH_ERRORS.inc(endpoint=endpoint_label(url))
         print(f"  ⚠️ Error fetching comments for {video_id}: {e}")
-        return []
 
 
-def download_image(url: str, dest_dir: Path, prefix: str = "") -> Optional[str]:
-    """Download an image and return the local filename."""
+def fetch_explore_videos(count: int = 30, client: Optional[TikHubClient] = None) -> List[Dict]:
+    """Fetch trending/explore videos from TikHub."""
+    items = list(iter_explore_videos(max_items=count, client=client))
+    print(f"✅ Fetched {len(items)} trending videos")
+    return items
+
+
+def fetch_video_comments(video_id: str, count: int = 20, client: Optional[TikHubClient] = None) -> List[Dict]:
+    """Fetch comments for a specific video."""
+    return list(iter_video_comments(video_id, max_items=count, client=client))
+
+
+def download_image(url: str, dest_dir: Path, prefix: str = "",
+                   client: Optional[TikHubClient] = None,
+                   thumbnail_size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+    """Download an image through the local cache and return the local filename."""
     if not url:
         return None
+    return image_cache.fetch(url, dest_dir, prefix, client or get_client(), thumbnail_size=thumbnail_size)
+
+
+def count_images(directory: Path) -> int:
+    """Number of cached image files in a directory."""
+    if not directory.exists():
+        return 0
+    return sum(1 for p in directory.iterdir() if p.is_file() and not p.name.startswith(".")
+               and p.suffix != ".part")
+
+
+def rank_phrases(phrase_counter, limit: int = 30) -> List[Dict]:
+    """Top phrases of a Counter or SpaceSaving summary, dropping one-offs."""
+    filtered = [(p, c) for p, c in phrase_counter.most_common(limit * 2) if c >= 2]
+    return [{"phrase": p, "count": c} for p, c in filtered[:limit]]
+
+
+def extract_phrases(comments: List[str], limit: int = 30, approximate: bool = APPROXIMATE_TOP_K) -> List[Dict]:
+    """Extract common 2-4 word phrases from comments."""
+    with metrics.PHRASE_SECONDS.time(source="fetch", mode="approximate" if approximate else "exact"):
+        if approximate:
+            # Bounded memory: counts may run high by at most N / capacity
+            summary = SpaceSaving()
+            summary.update(iter_extract_phrases(comments))
+            return rank_phrases(summary, limit)
+        
+        # Large corpora are counted across processes; small ones stay serial
+        return rank_phrases(count_phrases_parallel(comments, count_extract_phrases), limit)
+
+
+def fetch_video_assets(video: Dict, max_comments: int = MAX_COMMENTS, thumbnails: bool = THUMBNAILS,
+                       client: Optional[TikHubClient] = None, fetch_comments: bool = True,
+                       source: Optional[DataSource] = None) -> Dict:
+    """Download the cover and avatar and fetch comments for one video.
     
-    # Create a hash-based filename to avoid duplicates
-    url_hash = hashlib.md5(url.encode()).hexdigest()[:12]
-    ext = ".jpg"  # TikTok images are typically JPEG
-    filename = f"{prefix}{url_hash}{ext}"
-    filepath = dest_dir / filename
+    ``comments`` is None when ``fetch_comments`` is False. Comments come
+    from ``source`` when given; offline sources skip image downloads.
+    """
+    client = client or get_client()
+    source = source or TikHubSource(client)
+    video_id = video.get("id")
+    author = video.get("author", {})
+    video_data = video.get("video", {})
     
-    # Skip if already exists
-    if filepath.exists():
-        return filename
+    cover_url = video_data.get("cover") or video_data.get("originCover")
+    avatar_url = author.get("avatarMedium")
     
-    try:
-        resp = requests.get(url, timeout=15)
-        resp.raise_for_status()
-        
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        filepath.write_bytes(resp.content)
-        return filename
-    except Exception as e:
-        print(f"  ⚠️ Failed to download image: {e}")
-        return None
+    cover_size = COVER_THUMBNAIL_SIZE if thumbnails else None
+    avatar_size = AVATAR_THUMBNAIL_SIZE if thumbnails else None
+    
+    if source.offline:
+        cover_url = avatar_url = None
+    
+    return {
+        "cover_file": download_image(cover_url, COVERS_DIR, f"cover_{video_id}_", client=client,
+                                     thumbnail_size=cover_size),
+        "avatar_file": download_image(avatar_url, AVATARS_DIR, f"avatar_", client=client,
+                                      thumbnail_size=avatar_size),
+        "comments": (source.fetch_comments(video_id, max_comments) or []
+                     if fetch_comments else None),
+    }
 
 
-def extract_phrases(comments: List[str], limit: int = 30) -> List[Dict]:
-    """Extract common 2-4 word phrases from comments."""
-    stopwords = set([
-        'the', 'and', 'for', 'that', 'with', 'this', 'you', 'your', 'are', 'was',
-        'but', 'not', 'have', 'has', 'just', 'like', 'get', 'got', 'all', 'out',
-        'too', 'can', 'she', 'him', 'her', 'his', 'our', 'they', 'from', 'who',
-        'had', 'did', 'its', 'i', 'me', 'my', 'we', 'he', 'it', 'to', 'of', 'in',
-        'on', 'is', 'a', 'an', 'at', 'as', 'so', 'be', 'by', 'or', 'if', 'do',
-        'no', 'yes', 'up', 'down', 'off', 'lol', 'lmao', 'omg', 'im', 'u', 'ur'
-    ])
-    
-    def clean_text(text):
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.lower().strip()
-    
-    def get_ngrams(words, n):
-        return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
-    
-    phrase_counter = Counter()
-    for comment in comments:
-        if not comment or len(comment.strip()) < 4:
-            continue
-        cleaned = clean_text(comment)
-        words = [w for w in cleaned.split() if w not in stopwords and len(w) > 1]
-        if len(words) < 2:
-            continue
-        for n in range(2, 5):
-            ngrams = get_ngrams(words, n)
-            for ng in ngrams:
-                if len(ng.split()) == n:
-                    phrase_counter[ng] += 1
-    
-    # Filter low-frequency phrases
-    filtered = [(p, c) for p, c in phrase_counter.most_common(limit * 2) if c >= 2]
-    return [{"phrase": p, "count": c} for p, c in filtered[:limit]]
+def iter_video_assets(videos: Iterable[Dict], workers: int = MAX_WORKERS, max_comments: int = MAX_COMMENTS,
+                      thumbnails: bool = THUMBNAILS, client: Optional[TikHubClient] = None,
+                      should_fetch_comments: Optional[Callable[[Dict], bool]] = None,
+                      source: Optional[DataSource] = None) -> Iterator[Tuple[Dict, Dict]]:
+    """Yield ``(video, assets)`` pairs, fetching concurrently when workers > 1.
+    
+    Videos are submitted as they arrive from ``videos`` and results come back
+    in the same order, with at most ``2 * workers`` videos in flight.
+    ``should_fetch_comments`` is asked once per video, in order, before submit.
+    """
+    fetch = partial(fetch_video_assets, max_comments=max_comments, thumbnails=thumbnails,
+                    client=client or get_client(), source=source)
+    wants_comments = should_fetch_comments or (lambda video: True)
+    if workers <= 1:
+        for video in videos:
+            yield video, fetch(video, fetch_comments=wants_comments(video))
+        return
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for video in videos:
+            pending.append((video, pool.submit(fetch, video, fetch_comments=wants_comments(video))))
+            if len(pending) >= workers * 2:
+                done_video, future = pending.popleft()
+                yield done_video, future.result()
+        while pending:
+            done_video, future = pending.popleft()
+            yield done_video, future.result()
+
 
+def compact_comment(comment: Dict) -> Dict:
+    """The fields of a TikHub comment that the dashboard uses, for refresh_state.json."""
+    return {
+        "text": comment.get("text", ""),
+        "digg_count": comment.get("digg_count", 0),
+        "user": {"unique_id": comment.get("user", {}).get("unique_id", "unknown")},
+    }
 
-def main():
-    """Main function to fetch data and build dashboard JSON."""
+
+def main(workers: int = MAX_WORKERS, request_budget: Optional[int] = None,
+         max_videos: int = MAX_VIDEOS, max_comments: int = MAX_COMMENTS, thumbnails: bool = THUMBNAILS,
+         full_refresh: bool = False, approximate: bool = APPROXIMATE_TOP_K,
+         source: Optional[DataSource] = None, record: Optional[str] = None,
+         report_file: Optional[str] = metrics.REPORT_FILE,
+         data_file: Path = DATA_FILE, state_file: Path = STATE_FILE):
+    """Main function to fetch data and build dashboard JSON.
+    
+    Videos and comments come from ``source`` (default: TikHub); ``record``
+    appends every response to a recording that ReplaySource can play back.
+    The payload goes to ``data_file`` and change-detection baselines to
+    ``state_file``. Per-stage timings and counters go to the ``report_file``
+    run report.
+    """
+    run_started = time.time()
     print("🚀 TikHub Data Fetcher")
     print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 50)
     
-    if not os.environ.get("TIKHUB_API_KEY"):
+    if (source is None or not source.offline) and not os.environ.get("TIKHUB_API_KEY"):
         print("❌ TIKHUB_API_KEY environment variable not set!")
         return False
     
-    # Fetch trending videos (max ~30 per request)
-    videos = fetch_explore_videos(count=30)
-    if not videos:
-        print("❌ No videos fetched, aborting.")
-        return False
+    # One pooled client for the whole run; its budget caps total requests
+    client = TikHubClient() if request_budget is None else TikHubClient(request_budget=request_budget)
+    source = source or TikHubSource(client)
+    if record:
+        source = RecordingSource(source, record)
+    print(f"📡 Source: {source.name}")
+    image_cache.reset_stats()
+    
+    # Comments are only refetched for videos whose stats moved since the last fetch
+    state = RefreshState(state_file)
+    detector = ChangeDetector(full_refresh=full_refresh)
+    
+    def should_fetch_comments(video: Dict) -> bool:
+        video_id = video.get("id")
+        return detector.decide(video_id, state.baseline(video_id), video.get("stats", {}))
     
-    # Process videos and fetch comments
-    processed_videos = []
+    # Stream trending videos page by page; each one is processed as it arrives
+    print(f"⚡ Streaming up to {max_videos} videos with {max(1, workers)} worker(s)...")
+    videos = source.iter_videos(max_videos)
+    
+    # Only running totals and bounded top-N lists are kept in memory
+    recent_videos = []
     all_comments = []
-    all_hashtags = []
-    top_comments = []
+    # Approximate mode streams phrases into fixed-size summaries instead
+    phrase_summary = SpaceSaving() if approximate else None
+    hashtag_counts = SpaceSaving() if approximate else Counter()
+    top_comments_heap = []
+    total_videos = 0
+    total_comments = 0
+    total_hashtags = 0
+    total_likes = 0
+    total_comment_counts = 0
     
-    for i, video in enumerate(videos):
+    stream_started = time.perf_counter()
+    assets = iter_video_assets(videos, workers=workers, max_comments=max_comments,
+                               thumbnails=thumbnails, client=client,
+                               should_fetch_comments=should_fetch_comments, source=source)
+    for i, (video, video_assets) in enumerate(assets):
         video_id = video.get("id")
         author = video.get("author", {})
         stats = video.get("stats", {})
-        video_data = video.get("video", {})
         
-        print(f"\n📹 [{i+1}/{len(videos)}] Processing {video_id}...")
+        print(f"\n📹 [{i+1}] Processing {video_id}...")
         print(f"   Author: @{author.get('uniqueId', 'unknown')}")
         print(f"   Likes: {stats.get('diggCount', 0):,}")
         
-        # Download cover image
-        cover_url = video_data.get("cover") or video_data.get("originCover")
-        cover_file = download_image(cover_url, COVERS_DIR, f"cover_{video_id}_")
-        
-        # Download avatar
-        avatar_url = author.get("avatarMedium")
-        avatar_file = download_image(avatar_url, AVATARS_DIR, f"avatar_")
-        
-        # Fetch comments
-        comments = fetch_video_comments(video_id, count=20) or []
-        print(f"   Comments fetched: {len(comments)}")
+        cover_file = video_assets["cover_file"]
+        avatar_file = video_assets["avatar_file"]
+        comments = video_assets["comments"]
+        if comments is None:
+            comments = state.cached_comments(video_id)
+            state.record_seen(video_id)
+            print(f"   Comments reused: {len(comments)} (stats unchanged)")
+        elif not comments and stats.get("commentCount", 0):
+            # A failed fetch must not become (or wipe) the baseline; retry next run
+            comments = state.cached_comments(video_id)
+            state.record_seen(video_id)
+            print(f"   Comments fetch came back empty, reusing {len(comments)}")
+        else:
+            state.record_fetch(video_id, stats, [compact_comment(c) for c in comments])
+            print(f"   Comments fetched: {len(comments)}")
         
         for comment in comments:
             text = comment.get("text", "")
@@ -185,76 +353,183 @@ def main():
             comment_author = comment.get("user", {}).get("unique_id", "unknown")
             
             if text:
-                all_comments.append(text)
-                top_comments.append({
+                if phrase_summary is not None:
+                    phrase_summary.update(iter_extract_phrases((text,)))
+                else:
+                    all_comments.append(text)
+                total_comments += 1
+                # Min-heap of the 10 most-liked comments; ties keep arrival order
+                entry = (likes, -total_comments, {
                     "text": text,
                     "author": comment_author,
                     "likes_count": likes,
                     "video_id": video_id
                 })
+                if len(top_comments_heap) < 10:
+                    heapq.heappush(top_comments_heap, entry)
+                else:
+                    heapq.heappushpop(top_comments_heap, entry)
         
         # Extract hashtags
         challenges = video.get("challenges", [])
         for challenge in challenges:
             tag = challenge.get("title")
             if tag:
-                all_hashtags.append(tag)
+                hashtag_counts.update((tag,))
+                total_hashtags += 1
+        
+        total_videos += 1
+        total_likes += stats.get("diggCount", 0)
+        total_comment_counts += stats.get("commentCount", 0)
         
         # Build processed video entry
-        processed_videos.append({
-            "video_id": video_id,
-            "author": author.get("uniqueId", "unknown"),
-            "author_avatar_local": f"images/avatars/{avatar_file}" if avatar_file else None,
-            "cover_local": f"images/covers/{cover_file}" if cover_file else None,
-            "likes_count": stats.get("diggCount", 0),
-            "comment_count": stats.get("commentCount", 0),
-            "play_count": stats.get("playCount", 0),
-            "share_count": stats.get("shareCount", 0),
-            "scraped_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+        if len(recent_videos) < 10:
+            recent_videos.append({
+                "video_id": video_id,
+                "author": author.get("uniqueId", "unknown"),
+                "author_avatar_local": f"images/avatars/{avatar_file}" if avatar_file else None,
+                "cover_local": f"images/covers/{cover_file}" if cover_file else None,
+                "likes_count": stats.get("diggCount", 0),
+                "comment_count": stats.get("commentCount", 0),
+                "play_count": stats.get("playCount", 0),
+                "share_count": stats.get("shareCount", 0),
+                "scraped_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+    
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - stream_started, script="fetch_tikhub", stage="stream")
+    
+    if not total_videos:
+        print("❌ No videos fetched, aborting.")
+        client.close()
+        source.close()
+        metrics.write_report("fetch_tikhub", run_started, report_file, ok=False, source=source.name,
+                             fetch_errors=fetch_error_count())
+        return False
     
     # Build dashboard data
     print("\n📊 Building dashboard data...")
+    build_started = time.perf_counter()
     
     # Sort top comments by likes
-    top_comments.sort(key=lambda x: x["likes_count"], reverse=True)
+    top_comments = [item for _, _, item in sorted(top_comments_heap, reverse=True)]
     
-    # Count hashtags
-    hashtag_counts = Counter(all_hashtags)
+    # Count hashtags and phrases
+    if phrase_summary is not None:
+        with metrics.PHRASE_SECONDS.time(source="fetch", mode="approximate"):
+            top_phrases = rank_phrases(phrase_summary, 30)
+    else:
+        top_phrases = extract_phrases(all_comments, limit=30, approximate=False)
     trending_hashtags = [{"hashtag": h, "count": c} for h, c in hashtag_counts.most_common(20)]
     
-    # Calculate stats
-    total_likes = sum(v["likes_count"] for v in processed_videos)
-    total_comments = sum(v["comment_count"] for v in processed_videos)
-    
     dashboard_data = {
         "stats": {
-            "total_videos": len(processed_videos),
-            "total_comments": len(all_comments),
-            "total_hashtags": len(all_hashtags),
-            "avg_likes_per_video": round(total_likes / len(processed_videos), 2) if processed_videos else 0,
-            "avg_comments_per_video": round(total_comments / len(processed_videos), 2) if processed_videos else 0,
+            "total_videos": total_videos,
+            "total_comments": total_comments,
+            "total_hashtags": total_hashtags,
+            "avg_likes_per_video": round(total_likes / total_videos, 2),
+            "avg_comments_per_video": round(total_comment_counts / total_videos, 2),
             "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         },
         "hashtags": trending_hashtags,
-        "top_phrases": extract_phrases(all_comments, limit=30),
-        "top_comments": top_comments[:10],
-        "recent_videos": processed_videos[:10]
+        "top_phrases": top_phrases,
+        "top_comments": top_comments,
+        "recent_videos": recent_videos
     }
     
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - build_started, script="fetch_tikhub", stage="build")
+    
     # Write to file
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
+    with metrics.STAGE_SECONDS.time(script="fetch_tikhub", stage="write"):
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
+        
+        state.save()
     
-    print(f"\n✅ Dashboard data saved to {DATA_FILE}")
-    print(f"   Videos: {len(processed_videos)}")
-    print(f"   Comments: {len(all_comments)}")
+    print(f"\n✅ Dashboard data saved to {data_file}")
+    print(f"   Videos: {total_videos}")
+    print(f"   Comments: {total_comments}")
     print(f"   Hashtags: {len(trending_hashtags)}")
-    print(f"   Images cached: {len(list(COVERS_DIR.glob('*.jpg')))} covers, {len(list(AVATARS_DIR.glob('*.jpg')))} avatars")
+    if phrase_summary is not None:
+        print(f"   Phrase summary: {len(phrase_summary):,} counters, "
+              f"counts overestimated by at most {phrase_summary.error_bound():.1f}")
+    print(f"   HTTP requests: {client.requests_made} ({client.retries} retries)")
+    print(f"   Change detection: {detector.summary()}")
+    client.close()
+    source.close()
+    
+    # Trim the image cache back under its size cap and persist the index;
+    # offline runs download nothing and leave the cache alone
+    freed = 0
+    if not source.offline:
+        with metrics.STAGE_SECONDS.time(script="fetch_tikhub", stage="image_cache"):
+            freed = image_cache.evict()
+            image_cache.save()
+    cache_report = image_cache.report()
+    print(f"   Images cached: {count_images(COVERS_DIR)} covers, {count_images(AVATARS_DIR)} avatars")
+    print(f"   Image cache: {cache_report['hits']} hits ({cache_report['revalidated']} revalidated), "
+          f"{cache_report['misses']} misses, {cache_report['deduplicated']} deduplicated, "
+          f"{cache_report['bytes_saved']:,} bytes saved, {freed:,} bytes evicted")
+    print(f"   Downloaded: {cache_report['bytes_downloaded']:,} bytes, "
+          f"{cache_report['thumbnails']} thumbnails, {cache_report['too_large']} oversized skipped")
+    
+    metrics.print_summary()
+    report_path = metrics.write_report("fetch_tikhub", run_started, report_file, ok=True, source=source.name,
+                                       videos=total_videos, comments=total_comments,
+                                       fetch_errors=fetch_error_count())
+    if report_path:
+        print(f"   Run report: {report_path}")
     
     return True
 
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="Fetch trending TikTok data via TikHub")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Concurrent per-video fetches (1 = sequential)")
+    parser.add_argument("--request-budget", type=int, default=None,
+                        help="Maximum HTTP requests for this run (default: TIKHUB_REQUEST_BUDGET)")
+    parser.add_argument("--max-videos", type=int, default=MAX_VIDEOS,
+                        help="Videos to collect, following explore cursors across pages")
+    parser.add_argument("--max-comments", type=int, default=MAX_COMMENTS,
+                        help="Comments to collect per video, following comment cursors")
+    parser.add_argument("--thumbnails", action="store_true", default=THUMBNAILS,
+                        help="Shrink covers and avatars to dashboard size (requires Pillow)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Refetch comments for every video, ignoring refresh_state.json")
+    parser.add_argument("--approximate", action="store_true", default=APPROXIMATE_TOP_K,
+                        help="Rank phrases and hashtags in bounded memory (HEAVY_HITTERS_CAPACITY counters)")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Read videos and comments from a recording instead of TikHub (no API key needed)")
+    parser.add_argument("--replay-speed", type=float, default=REPLAY_SPEED,
+                        help="0 = no delays, 1 = recorded timing, 2 = twice as fast")
+    parser.add_argument("--replay-scale", type=int, default=1,
+                        help="Replay N renamed copies of every recorded video")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record every API response to this .jsonl.gz file")
+    parser.add_argument("--metrics-report", default=None,
+                        help="JSON run report with per-stage timings and counters ('' to disable)")
+    parser.add_argument("--output", metavar="PATH", default=None,
+                        help=f"Dashboard JSON to write (default: {DATA_FILE.name}; a temp dir with --replay)")
+    parser.add_argument("--state-file", metavar="PATH", default=None,
+                        help=f"Change-detection state (default: {STATE_FILE.name}; a temp dir with --replay)")
+    args = parser.parse_args()
+    
+    data_file, state_file, report_file = args.output, args.state_file, args.metrics_report
+    source = None
+    if args.replay:
+        source = ReplaySource(args.replay, speed=args.replay_speed, scale=args.replay_scale)
+        if None in (data_file, state_file, report_file):
+            # A replay never overwrites the live dashboard, its refresh state or run report
+            scratch = tempfile.mkdtemp(prefix="fetch_tikhub-replay-")
+            print(f"📁 Replay outputs go to {scratch}")
+            data_file = data_file or os.path.join(scratch, DATA_FILE.name)
+            state_file = state_file or os.path.join(scratch, STATE_FILE.name)
+            if report_file is None:
+                report_file = os.path.join(scratch, os.path.basename(metrics.REPORT_FILE))
+    success = main(workers=args.workers, request_budget=args.request_budget,
+                   max_videos=args.max_videos, max_comments=args.max_comments,
+                   thumbnails=args.thumbnails, full_refresh=args.full_refresh,
+                   approximate=args.approximate, source=source, record=args.record,
+                   report_file=metrics.REPORT_FILE if report_file is None else report_file,
+                   data_file=Path(data_file or DATA_FILE), state_file=Path(state_file or STATE_FILE))
     exit(0 if success else 1)
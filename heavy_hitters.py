@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory approximate top-K counting for phrases and hashtags.
+
+An exact Counter keeps every distinct phrase it has seen, and most of
+them occur once. The summaries here keep a fixed number of counters
+however long the stream is, and expose the Counter methods callers use
+(update, most_common).
+
+SpaceSaving(capacity), after Metwally et al., keeps `capacity` items:
+- Each reported count overestimates the true count by at most the
+  item's recorded error, which is at most N / capacity for a stream of
+  N items. So count - error <= true count <= count.
+- Any item whose true count exceeds N / capacity is guaranteed to be
+  monitored, so all heavy hitters above that line are reported.
+
+CountMinTopK(k, width, depth) is a Count-Min Sketch plus a k-item
+candidate set:
+- Estimates never undercount. With probability 1 - exp(-depth) they
+  overcount by at most e / width * N.
+- Memory is width * depth counters plus k candidates.
+
+Set HEAVY_HITTERS=1 (or pass --approximate to fetch_tikhub.py) to rank
+phrases and hashtags with SpaceSaving instead of exact counts, and
+HEAVY_HITTERS_CAPACITY to set the memory budget in counters.
+
+test_heavy_hitters.py checks agreement with the exact top-K and the
+error bounds on fixed-seed Zipfian data.
+"""
+
+import heapq
+import math
+import os
+import random
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Configuration
+APPROXIMATE_TOP_K = os.environ.get("HEAVY_HITTERS", "0") == "1"
+HEAVY_HITTERS_CAPACITY = int(os.environ.get("HEAVY_HITTERS_CAPACITY", "20000"))
+SKETCH_DEPTH = 4
+
+# Mersenne prime for the sketch's pairwise-independent row hashes
+_PRIME = (1 << 61) - 1
+
+
+class SpaceSaving:
+    """Space-Saving summary holding at most `capacity` counters."""
+
+    def __init__(self, capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.capacity = max(1, capacity)
+        self.total = 0
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        # Min-heap of (count, seq, item); entries go stale as counts grow
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._seq = 0
+
+    def _push(self, item: Hashable, count: int):
+        self._seq += 1
+        heapq.heappush(self._heap, (count, self._seq, item))
+        if len(self._heap) > 4 * self.capacity:
+            # Drop stale entries so the heap stays proportional to capacity
+            self._heap = [(c, s, i) for c, s, i in self._heap if self.counts.get(i) == c]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[Hashable, int]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def add(self, item: Hashable, count: int = 1):
+        """Count one occurrence (or `count` occurrences) of item."""
+        self.total += count
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the smallest counter; its count becomes the new item's error
+            evicted, floor = self._pop_min()
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[item] = floor + count
+            self.errors[item] = floor
+        self._push(item, counts[item])
+
+    def update(self, items: Iterable[Hashable]):
+        """Count every item of an iterable (Counter.update for iterables)."""
+        add = self.add
+        for item in items:
+            add(item)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """(item, estimated count) pairs, highest first, like Counter.most_common."""
+        ranked = sorted(self.counts.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def error_bound(self) -> float:
+        """Largest possible overcount of any reported item (N / capacity)."""
+        return self.total / self.capacity
+
+    def guaranteed(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """Top items whose lower bound (count - error) still beats the next count.
+
+        These are certainly in the true top-n, in the right order.
+        """
+        ranked = self.most_common()
+        limit = len(ranked) if n is None else min(n, len(ranked))
+        result = []
+        for i in range(limit):
+            item, count = ranked[i]
+            next_count = ranked[i + 1][1] if i + 1 < len(ranked) else 0
+            if count - self.errors[item] < next_count:
+                break
+            result.append((item, count))
+        return result
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+class CountMinTopK:
+    """Count-Min Sketch with a bounded candidate set for the top k items."""
+
+    def __init__(self, k: int = 100, width: int = 2 ** 16, depth: int = SKETCH_DEPTH, seed: int = 0):
+        self.k = max(1, k)
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._rows = [[0] * width for _ in range(depth)]
+        # One (a, b) pair per row: ((a * hash(item) + b) mod p) mod width
+        rng = random.Random(seed)
+        self._hashes = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(depth)]
+        self.candidates: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._seq = 0
+
+    @classmethod
+    def for_error(cls, k: int, epsilon: float, delta: float = 0.01, seed: int = 0) -> "CountMinTopK":
+        """Size the sketch so overcounts stay below epsilon * N with probability 1 - delta."""
+        return cls(k, width=math.ceil(math.e / epsilon), depth=math.ceil(math.log(1 / delta)), seed=seed)
+
+    def _indexes(self, item: Hashable) -> Iterator[int]:
+        h = hash(item)
+        width = self.width
+        return (((a * h + b) % _PRIME) % width for a, b in self._hashes)
+
+    def estimate(self, item: Hashable) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(item)))
+
+    def add(self, item: Hashable, count: int = 1):
+        self.total += count
+        estimate = None
+        for row, index in zip(self._rows, self._indexes(item)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+
+        candidates = self.candidates
+        if item in candidates or len(candidates) < self.k:
+            candidates[item] = estimate
+        else:
+            while True:
+                floor, _, smallest = self._heap[0]
+                if candidates.get(smallest) == floor:
+                    break
+                heapq.heappop(self._heap)
+            if estimate <= floor:
+                return
+            heapq.heappop(self._heap)
+            del candidates[smallest]
+            candidates[item] = estimate
+        self._seq += 1
+        heapq.heappush(self._heap, (estimate, self._seq, item))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(c, s, i) for c, s, i in self._heap if candidates.get(i) == c]
+            heapq.heapify(self._heap)
+
+    def update(self, items: Iterable[Hashable]):
+        add = self.add
+        for item in items:
+            add(item)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        ranked = sorted(self.candidates.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def error_bound(self) -> float:
+        """Overcount bound e / width * N, holding with probability 1 - exp(-depth)."""
+        return math.e / self.width * self.total
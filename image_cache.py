@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Local image cache for TikTok covers and avatars.
+
+TikTok CDN URLs carry signed, expiring query strings, so entries are keyed by
+the stable URL path instead of the full URL. A sidecar JSON index remembers
+ETag/Last-Modified validators for conditional GETs, the content hash of each
+file (identical images share one file) and when each entry was last used, so
+the cache can be trimmed back to a size cap in LRU order.
+
+Downloads are streamed to disk in chunks with a hard byte limit, the real
+image format is sniffed from the file header, and an optional Pillow stage
+can shrink images to dashboard-sized thumbnails. Thumbnails are keyed by
+size, separately from the full-size original.
+
+Files from before the index (named after an MD5 of the full signed URL)
+are adopted once as LRU-only entries: never served for a lookup, but
+counted against the size cap and evicted like any other file.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are optional
+    Image = None
+
+# Configuration
+MAX_CACHE_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+REVALIDATE_AFTER = int(os.environ.get("IMAGE_CACHE_REVALIDATE_AFTER", str(7 * 24 * 3600)))
+MAX_IMAGE_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_QUALITY = 82
+INDEX_FILENAME = ".cache_index.json"
+INDEX_VERSION = 2
+
+# <prefix><12 hex>.jpg: both the current key scheme and the pre-index one
+CACHED_NAME = re.compile(r"^.+[0-9a-f]{12}\.(jpg|png|gif|webp|avif|heic)$")
+
+IMAGE_EVENTS = metrics.counter("tiktok_image_cache_events_total",
+                               "Image cache hits, misses, revalidations and errors", ("event",))
+IMAGE_BYTES = metrics.counter("tiktok_image_bytes_total", "Image bytes downloaded, saved by the cache and evicted",
+                              ("kind",))
+
+
+class ImageTooLarge(Exception):
+    """Raised when a download exceeds the configured byte limit."""
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Detect the image format from the first bytes of a file."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand in (b"avif", b"avis"):
+            return "avif"
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "heic"
+    return None
+
+
+EXTENSIONS = {
+    "jpeg": ".jpg",
+    "png": ".png",
+    "gif": ".gif",
+    "webp": ".webp",
+    "avif": ".avif",
+    "heic": ".heic",
+}
+
+
+def stable_key(url: str, thumbnail_size: Optional[Tuple[int, int]] = None) -> str:
+    """Cache key for a URL, ignoring the host and signed query string.
+
+    Each thumbnail size gets its own key, so a thumbnail never answers a
+    request for the original or the other way round.
+    """
+    path = urlparse(url).path or url
+    if thumbnail_size:
+        path += "@{}x{}".format(*thumbnail_size)
+    return hashlib.md5(path.encode()).hexdigest()[:12]
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """Path-keyed image cache with conditional revalidation and LRU eviction."""
+
+    def __init__(self, root_dir: Path, max_bytes: int = MAX_CACHE_BYTES,
+                 revalidate_after: int = REVALIDATE_AFTER, max_image_bytes: int = MAX_IMAGE_BYTES):
+        self.root_dir = Path(root_dir)
+        self.index_path = self.root_dir / INDEX_FILENAME
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.max_image_bytes = max_image_bytes
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._touched = set()
+        self.entries, self._index_version = self._load_index()
+        self.reset_stats()
+
+    def _load_index(self) -> Tuple[Dict[str, Dict], int]:
+        """Read the sidecar index, starting empty if it is missing or corrupt."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("entries", {}), data.get("version", 1)
+        except (FileNotFoundError, ValueError):
+            return {}, 0
+
+    def _migrate(self):
+        """Bring an older index up to INDEX_VERSION (once; saved by save()).
+
+        Version 1 stored thumbnails under the original's key: those entries
+        hash differently from the download they came from and are moved out
+        of lookup. Files no entry references (the pre-index MD5-of-URL
+        names) are adopted for eviction.
+        """
+        with self._lock:
+            if self._index_version >= INDEX_VERSION:
+                return
+            referenced = set()
+            for entry_id, entry in list(self.entries.items()):
+                path = self.root_dir / entry["dir"] / entry["filename"]
+                if not path.exists():
+                    del self.entries[entry_id]
+                    continue
+                referenced.add(path)
+                if entry.get("content_hash") and entry["content_hash"] != _file_hash(path):
+                    del self.entries[entry_id]
+                    self.entries[f"legacy/{entry['dir']}/{entry['filename']}"] = dict(entry, content_hash=None)
+
+            if self.root_dir.is_dir():
+                for path in self.root_dir.rglob("*"):
+                    if path in referenced or not CACHED_NAME.match(path.name) or not path.is_file():
+                        continue
+                    rel_dir = self._rel_dir(path.parent)
+                    stat = path.stat()
+                    self.entries[f"legacy/{rel_dir}/{path.name}"] = {
+                        "filename": path.name,
+                        "dir": rel_dir,
+                        "size": stat.st_size,
+                        "content_hash": None,
+                        "validated_at": 0,
+                        "last_access": int(stat.st_mtime),
+                    }
+            self._index_version = INDEX_VERSION
+
+    def reset_stats(self):
+        """Zero the hit/miss counters for a new run."""
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "deduplicated": 0,
+            "errors": 0,
+            "too_large": 0,
+            "thumbnails": 0,
+            "evicted": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+        if name.startswith("bytes_"):
+            IMAGE_BYTES.inc(amount, kind=name[len("bytes_"):])
+        else:
+            IMAGE_EVENTS.inc(amount, event=name)
+
+    def _key_lock(self, entry_id: str) -> threading.Lock:
+        """Per-entry lock so two workers never download the same image at once."""
+        with self._lock:
+            lock = self._key_locks.get(entry_id)
+            if lock is None:
+                lock = self._key_locks[entry_id] = threading.Lock()
+            return lock
+
+    def _find_by_content(self, dest_dir: Path, content_hash: str,
+                         thumbnail_size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        """Return an existing file in dest_dir with the same content and size box, if any."""
+        rel_dir = self._rel_dir(dest_dir)
+        thumbnail = list(thumbnail_size) if thumbnail_size else None
+        with self._lock:
+            for entry in self.entries.values():
+                if (entry.get("content_hash") == content_hash and entry.get("dir") == rel_dir
+                        and entry.get("thumbnail") == thumbnail
+                        and (dest_dir / entry["filename"]).exists()):
+                    return entry["filename"]
+        return None
+
+    def _rel_dir(self, dest_dir: Path) -> str:
+        try:
+            return Path(dest_dir).relative_to(self.root_dir).as_posix()
+        except ValueError:
+            return Path(dest_dir).as_posix()
+
+    def fetch(self, url: str, dest_dir: Path, prefix: str, client,
+              thumbnail_size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        """Return the local filename for url, downloading or revalidating as needed.
+
+        When thumbnail_size is given and Pillow is installed, the stored file is
+        shrunk to fit within that box.
+        """
+        if not url:
+            return None
+
+        self._migrate()
+        dest_dir = Path(dest_dir)
+        key = stable_key(url, thumbnail_size)
+        entry_id = f"{self._rel_dir(dest_dir)}/{prefix}{key}"
+
+        with self._key_lock(entry_id):
+            with self._lock:
+                entry = self.entries.get(entry_id)
+            now = int(time.time())
+
+            if entry and (dest_dir / entry["filename"]).exists():
+                if now - entry.get("validated_at", 0) < self.revalidate_after:
+                    self._touch(entry_id, now)
+                    self._count("hits")
+                    self._count("bytes_saved", entry.get("size", 0))
+                    return entry["filename"]
+                return self._download(url, dest_dir, prefix, key, entry_id, client, entry, thumbnail_size)
+
+            return self._download(url, dest_dir, prefix, key, entry_id, client, None, thumbnail_size)
+
+    def _stream_to_temp(self, resp, dest_dir: Path) -> Tuple[str, int, str, Optional[str]]:
+        """Write a streamed response to a temp file in chunks.
+
+        Returns (temp path, byte count, sha256 hex, sniffed format). The temp
+        file is removed if the body exceeds max_image_bytes.
+        """
+        declared = resp.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_image_bytes:
+            raise ImageTooLarge(f"{declared} bytes exceeds limit of {self.max_image_bytes}")
+
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".part")
+        digest = hashlib.sha256()
+        size = 0
+        header = b""
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise ImageTooLarge(f"body exceeds limit of {self.max_image_bytes} bytes")
+                    if len(header) < 16:
+                        header += chunk[:16 - len(header)]
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, size, digest.hexdigest(), sniff_format(header)
+
+    def _make_thumbnail(self, tmp_path: str, size: Tuple[int, int]) -> Optional[str]:
+        """Shrink the image in tmp_path in place; returns the new format or None."""
+        if Image is None:
+            return None
+        try:
+            with Image.open(tmp_path) as img:
+                img.load()
+                has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+                img.thumbnail(size)
+                out = io.BytesIO()
+                if has_alpha:
+                    img.save(out, format="WEBP", quality=THUMBNAIL_QUALITY)
+                    fmt = "webp"
+                else:
+                    img.convert("RGB").save(out, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+                    fmt = "jpeg"
+            with open(tmp_path, "wb") as f:
+                f.write(out.getvalue())
+            self._count("thumbnails")
+            return fmt
+        except Exception as e:
+            print(f"  ⚠️ Thumbnail failed, keeping original: {e}")
+            return None
+
+    def _download(self, url: str, dest_dir: Path, prefix: str, key: str, entry_id: str,
+                  client, entry: Optional[Dict], thumbnail_size: Optional[Tuple[int, int]]) -> Optional[str]:
+        """GET the image, conditionally when validators are known."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            resp = client.get(url, headers=headers, timeout=15, stream=True)
+            now = int(time.time())
+
+            if resp.status_code == 304 and entry:
+                resp.close()
+                with self._lock:
+                    entry["validated_at"] = now
+                self._touch(entry_id, now)
+                self._count("revalidated")
+                self._count("hits")
+                self._count("bytes_saved", entry.get("size", 0))
+                return entry["filename"]
+
+            try:
+                resp.raise_for_status()
+                tmp_path, downloaded, content_hash, fmt = self._stream_to_temp(resp, dest_dir)
+            finally:
+                resp.close()
+            self._count("misses")
+            self._count("bytes_downloaded", downloaded)
+
+            try:
+                if fmt is None:
+                    raise ValueError("response is not a recognised image format")
+
+                filename = self._find_by_content(dest_dir, content_hash, thumbnail_size)
+                thumbnail = list(thumbnail_size) if thumbnail_size else None
+                if filename:
+                    self._count("deduplicated")
+                else:
+                    if thumbnail_size:
+                        thumbnail_fmt = self._make_thumbnail(tmp_path, thumbnail_size)
+                        if thumbnail_fmt is None:
+                            thumbnail = None  # Kept the original
+                        fmt = thumbnail_fmt or fmt
+                    filename = f"{prefix}{key}{EXTENSIONS[fmt]}"
+                    os.replace(tmp_path, dest_dir / filename)
+            finally:
+                # Gone already if it was renamed into place
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+
+            if entry and entry["filename"] != filename:
+                self._remove_if_unreferenced(dest_dir, entry["filename"], entry_id)
+
+            with self._lock:
+                self.entries[entry_id] = {
+                    "filename": filename,
+                    "dir": self._rel_dir(dest_dir),
+                    "size": (dest_dir / filename).stat().st_size,
+                    "content_hash": content_hash,
+                    "thumbnail": thumbnail,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "validated_at": now,
+                    "last_access": now,
+                }
+                self._touched.add(entry_id)
+            return filename
+        except ImageTooLarge as e:
+            self._count("too_large")
+            print(f"  ⚠️ Skipped oversized image: {e}")
+            return entry["filename"] if entry else None
+        except Exception as e:
+            self._count("errors")
+            print(f"  ⚠️ Failed to download image: {e}")
+            # A stale copy is better than no image
+            return entry["filename"] if entry else None
+
+    def _remove_if_unreferenced(self, dest_dir: Path, filename: str, replacing: str):
+        """Delete a superseded file unless another entry still points at it."""
+        rel_dir = self._rel_dir(dest_dir)
+        with self._lock:
+            shared = any(e["filename"] == filename and e.get("dir") == rel_dir
+                         for i, e in self.entries.items() if i != replacing)
+        if not shared:
+            try:
+                (dest_dir / filename).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _touch(self, entry_id: str, now: int):
+        with self._lock:
+            self.entries[entry_id]["last_access"] = now
+            self._touched.add(entry_id)
+
+    def evict(self) -> int:
+        """Delete least-recently-used files until the cache fits max_bytes.
+
+        Entries used during this run are never evicted; the run ends here, so
+        the set of used entries is cleared afterwards. Returns bytes freed.
+        """
+        self._migrate()
+        with self._lock:
+            files = {}
+            for entry_id, entry in self.entries.items():
+                path = self.root_dir / entry["dir"] / entry["filename"]
+                files.setdefault(path, []).append(entry_id)
+
+            sizes = {path: self.entries[ids[0]].get("size", 0) for path, ids in files.items()}
+            total = sum(sizes.values())
+            freed = 0
+
+            # A file is as recent as the most recently used entry pointing at it
+            def last_used(path):
+                return max(self.entries[i].get("last_access", 0) for i in files[path])
+
+            for path in sorted(files, key=last_used):
+                if total <= self.max_bytes:
+                    break
+                if any(i in self._touched for i in files[path]):
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                for entry_id in files[path]:
+                    del self.entries[entry_id]
+                total -= sizes[path]
+                freed += sizes[path]
+                self.stats["evicted"] += 1
+                IMAGE_EVENTS.inc(event="evicted")
+            self._touched.clear()
+            IMAGE_BYTES.inc(freed, kind="evicted")
+            return freed
+
+    def save(self):
+        """Persist the sidecar index atomically."""
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {"version": self._index_version, "entries": self.entries}
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def report(self) -> Dict:
+        """Hit/miss/bytes counters for the current run."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            report = dict(self.stats)
+            report["hit_rate"] = round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+            report["entries"] = len(self.entries)
+            return report
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Background jobs for refresh runs.
+
+Jobs run on a small bounded thread pool and have ids. They record how
+long each stage took and can be cancelled cooperatively: the job
+function calls `job.check_cancelled()` between steps, or watches
+`job.cancel_event` while waiting on a subprocess. Submitting a job of a
+kind that is already queued or running returns the existing job, so
+concurrent refresh requests attach to a single run. Every state change
+is written to the `jobs` table, so history survives restarts; one
+writer thread owns the manager's database connection. Rows a previous
+process left queued or running are marked failed on startup.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database_helper import TikTokDatabase
+
+# Configuration
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+HISTORY_LIMIT = 20
+MEMORY_LIMIT = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = {QUEUED, RUNNING}
+
+INTERRUPTED_ERROR = "Interrupted by a server restart"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once cancellation has been requested."""
+
+
+class Job:
+    """One background run: state, progress, stage timings and a cancel flag."""
+
+    def __init__(self, kind: str, on_update: Callable[["Job", str], None]):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = QUEUED
+        self.progress = 0
+        self.message = "Queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stages: List[Dict] = []
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._on_update = on_update
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def update(self, progress: Optional[int] = None, message: Optional[str] = None):
+        """Report progress; subscribers see the change immediately."""
+        with self._lock:
+            if progress is not None:
+                self.progress = progress
+            if message is not None:
+                self.message = message
+        self._on_update(self, "progress")
+
+    @contextmanager
+    def stage(self, name: str, progress: Optional[int] = None, message: Optional[str] = None):
+        """Time a named stage of the job."""
+        self.check_cancelled()
+        record = {"name": name, "started_at": time.time(), "seconds": None}
+        with self._lock:
+            self.stages.append(record)
+        self.update(progress, message)
+        try:
+            yield
+        finally:
+            record["seconds"] = round(time.time() - record["started_at"], 3)
+
+    def cancel(self) -> bool:
+        """Ask the job to stop. Returns False if it has already finished."""
+        if not self.is_active:
+            return False
+        self.cancel_event.set()
+        return True
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "state": self.state,
+                "progress": self.progress,
+                "message": self.message,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages": [dict(stage) for stage in self.stages],
+            }
+
+
+class JobManager:
+    """Runs jobs on a bounded pool, de-duplicates them by kind and keeps history."""
+
+    def __init__(self, db_path: str = "tiktok_data.db", max_workers: int = JOB_WORKERS,
+                 on_update: Optional[Callable[[Job, str], None]] = None):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        # Every jobs-table read and write runs on this thread, over its one connection
+        self._db = TikTokDatabase(db_path)
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-db")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}
+        self._on_update = on_update
+        self.latest: Optional[Job] = None
+        # Nothing from an earlier process is still running, whatever its row says
+        self.interrupted = self._call_db(self._db.finish_stale_jobs, ACTIVE_STATES, FAILED,
+                                         INTERRUPTED_ERROR, time.time())
+
+    def _forget_finished(self):
+        """Keep only recent finished jobs in memory; older ones live in the table."""
+        finished = [j for j in self._jobs.values() if not j.is_active]
+        for job in finished[:max(0, len(finished) - MEMORY_LIMIT)]:
+            del self._jobs[job.job_id]
+
+    def _notify(self, job: Job, change: str):
+        if self._on_update:
+            self._on_update(job, change)
+
+    def _call_db(self, fn, *args):
+        return self._db_executor.submit(fn, *args).result()
+
+    def _persist(self, job: Job):
+        self._call_db(self._db.save_job, job.to_dict())
+
+    def submit(self, kind: str, fn: Callable[[Job], None]) -> Tuple[Job, bool]:
+        """Queue fn(job) unless a job of this kind is active.
+
+        Returns (job, created); created is False when the caller attached
+        to an existing run.
+        """
+        with self._lock:
+            active = self._active.get(kind)
+            if active is not None and active.is_active:
+                return active, False
+            job = Job(kind, self._notify)
+            self._forget_finished()
+            self._jobs[job.job_id] = job
+            self._active[kind] = job
+            self.latest = job
+
+        self._persist(job)
+        self._notify(job, "queued")
+        self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def _finish(self, job: Job, state: str, message: str, error: Optional[str] = None):
+        with job._lock:
+            job.state = state
+            job.message = message
+            job.error = error
+            job.finished_at = time.time()
+            if state == SUCCEEDED:
+                job.progress = 100
+        with self._lock:
+            if self._active.get(job.kind) is job:
+                del self._active[job.kind]
+        self._persist(job)
+        self._notify(job, "finished")
+
+    def _run(self, job: Job, fn: Callable[[Job], None]):
+        try:
+            job.check_cancelled()
+            with job._lock:
+                job.state = RUNNING
+                job.started_at = time.time()
+            self._persist(job)
+            self._notify(job, "started")
+            fn(job)
+        except JobCancelled:
+            self._finish(job, CANCELLED, "Cancelled", "Job was cancelled")
+        except Exception as e:
+            self._finish(job, FAILED, f"Error: {e}", str(e))
+        else:
+            self._finish(job, SUCCEEDED, job.message)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """A job by id, from memory or from the history table."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        records = self._call_db(lambda: self._db.get_jobs(1, job_id=job_id))
+        return records[0] if records else None
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.cancel() if job is not None else False
+
+    def history(self, limit: int = HISTORY_LIMIT) -> List[Dict]:
+        """Recent jobs, newest first, with live state for jobs still in memory."""
+        records = self._call_db(self._db.get_jobs, limit)
+        with self._lock:
+            live = {job_id: job for job_id, job in self._jobs.items()}
+        return [live[r["job_id"]].to_dict() if r["job_id"] in live else r for r in records]
+
+    def shutdown(self, cancel: bool = True):
+        if cancel:
+            with self._lock:
+                for job in self._active.values():
+                    job.cancel()
+        self._executor.shutdown(wait=True)
+        self._db_executor.submit(self._db.close).result()
+        self._db_executor.shutdown(wait=True)
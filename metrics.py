@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-process metrics for the refresh path.
+
+Modules declare their instruments once, at import time:
+
+    HTTP_SECONDS = metrics.histogram("tiktok_http_request_seconds",
+                                     "HTTP request latency", ("endpoint",))
+    with HTTP_SECONDS.time(endpoint="/api/v1/..."):
+        ...
+
+- Counter.inc(amount, **labels) only goes up
+- Histogram.observe(value, **labels) buckets a value (seconds by default);
+  Histogram.time(**labels) is a timer that observes a block's duration
+
+Everything lands in one process-wide registry, which can be:
+
+- written as a JSON run report (write_report; METRICS_REPORT sets the
+  path, default run_report.json, empty to disable)
+- rendered in the Prometheus text format (to_prometheus; app.py serves it
+  at /metrics)
+- merged with a report from another process (merge_report), so the
+  collector subprocess's numbers show up in the app's /metrics
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Configuration
+REPORT_FILE = os.environ.get("METRICS_REPORT", "run_report.json")
+REPORT_FORMAT = 1
+# Latency buckets in seconds, from a cache hit to a slow retried request
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SUMMARY_LINES = 15
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """A named family of series, one per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str = "", labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    """A monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [{"labels": self._labels(key), "value": value} for key, value in self._series.items()]
+
+    def merge(self, series: List[Dict]):
+        for entry in series:
+            self.inc(entry["value"], **entry["labels"])
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_text(key)} {_format_value(value)}"
+                    for key, value in sorted(self._series.items())]
+
+
+class _HistogramSeries:
+    __slots__ = ("bucket_counts", "count", "sum", "max")
+
+    def __init__(self, n_buckets: int):
+        # One count per finite bucket plus +Inf, not cumulative
+        self.bucket_counts = [0] * (n_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(Metric):
+    """Bucketed observations (durations in seconds unless the name says otherwise)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _bucket(self, value: float) -> int:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                return i
+        return len(self.buckets)
+
+    def _get(self, key: Tuple[str, ...]) -> _HistogramSeries:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets))
+        return series
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        bucket = self._bucket(value)
+        with self._lock:
+            series = self._get(key)
+            series.bucket_counts[bucket] += 1
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, even when it raises"""
+        self._key(labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [{"labels": self._labels(key), "count": s.count, "sum": round(s.sum, 6),
+                     "max": round(s.max, 6), "bucket_counts": list(s.bucket_counts)}
+                    for key, s in self._series.items()]
+
+    def merge(self, series: List[Dict]):
+        for entry in series:
+            key = self._key(entry["labels"])
+            with self._lock:
+                s = self._get(key)
+                for i, count in enumerate(entry["bucket_counts"]):
+                    s.bucket_counts[i] += count
+                s.count += entry["count"]
+                s.sum += entry["sum"]
+                s.max = max(s.max, entry.get("max", 0.0))
+
+    def prometheus_lines(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), s.bucket_counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(s.sum)}")
+                lines.append(f"{self.name}_count{self._label_text(key)} {s.count}")
+        return lines
+
+
+class Registry:
+    """Every metric in the process, by name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, cls, name: str, help: str, labelnames: Sequence[str], **options) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **options)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str = "", labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def metrics(self) -> List[Metric]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def snapshot(self) -> Dict:
+        """Every series as plain JSON-serializable data"""
+        snapshot = {}
+        for metric in self.metrics():
+            entry = {"type": metric.kind, "help": metric.help, "labelnames": list(metric.labelnames),
+                     "series": metric.snapshot()}
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            snapshot[metric.name] = entry
+        return snapshot
+
+    def merge(self, snapshot: Dict):
+        """Add another registry's snapshot into this one"""
+        for name, entry in snapshot.items():
+            try:
+                if entry["type"] == "counter":
+                    metric = self.counter(name, entry["help"], entry["labelnames"])
+                elif entry["type"] == "histogram":
+                    metric = self.histogram(name, entry["help"], entry["labelnames"], entry["buckets"])
+                    if list(metric.buckets) != entry["buckets"]:
+                        raise ValueError("bucket boundaries differ")
+                else:
+                    continue
+                metric.merge(entry["series"])
+            except (KeyError, ValueError) as e:
+                print(f"Error merging metric {name}: {e}")
+
+    def to_prometheus(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics():
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help.replace(chr(92), chr(92) * 2)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Zero every series, keeping the registered metrics"""
+        for metric in self.metrics():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str = "", labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def histogram(name: str, help: str = "", labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, labelnames, buckets)
+
+
+# Shared by every script on the refresh path
+STAGE_SECONDS = histogram("tiktok_stage_seconds", "Wall time of each refresh stage", ("script", "stage"))
+PHRASE_SECONDS = histogram("tiktok_phrase_extraction_seconds", "Phrase counting and ranking",
+                           ("source", "mode"))
+
+
+def write_report(script: str, started: float, path: Optional[str] = REPORT_FILE, **info) -> Optional[str]:
+    """Write a JSON run report with every metric; returns its path (None when disabled)"""
+    if not path:
+        return None
+    report = {
+        "format": REPORT_FORMAT,
+        "script": script,
+        "started_at": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.time() - started, 3),
+        **info,
+        "metrics": REGISTRY.snapshot(),
+    }
+    try:
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        print(f"Error writing run report: {e}")
+        return None
+
+
+def merge_report(path: str) -> bool:
+    """Add the metrics of a run report (e.g. from a subprocess) to this process"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error reading run report: {e}")
+        return False
+    REGISTRY.merge(report.get("metrics", {}))
+    return True
+
+
+def time_breakdown(limit: int = SUMMARY_LINES) -> List[Dict]:
+    """Histogram series ranked by total time, largest first"""
+    rows = []
+    for metric in REGISTRY.metrics():
+        if not isinstance(metric, Histogram) or not metric.name.endswith("_seconds"):
+            continue
+        for entry in metric.snapshot():
+            labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items())
+            rows.append({"metric": metric.name, "labels": labels, "count": entry["count"],
+                         "seconds": entry["sum"], "max": entry["max"]})
+    rows.sort(key=lambda row: row["seconds"], reverse=True)
+    return rows[:limit]
+
+
+def print_summary(limit: int = SUMMARY_LINES):
+    """Print where the time went, by timer"""
+    rows = time_breakdown(limit)
+    if not rows:
+        return
+    print("⏱️ Where the time went:")
+    for row in rows:
+        mean = row["seconds"] / row["count"] if row["count"] else 0.0
+        name = row["metric"].removeprefix("tiktok_").removesuffix("_seconds")
+        labels = f"{{{row['labels']}}}" if row["labels"] else ""
+        print(f"   {row['seconds']:8.3f}s  {name}{labels}  "
+              f"{row['count']}x, mean {mean * 1000:.1f} ms, max {row['max'] * 1000:.1f} ms")
@@ -7,6 +7,7 @@ This helps build up your database over time without duplicates
 import asyncio
 import time
 from datetime import datetime
+import metrics
 from comments import get_trending_data
 from database_helper import TikTokDatabase
 
@@ -16,6 +17,8 @@ async def run_collection_session(session_number: int = 1):
     print(f"🚀 Starting Data Collection Session #{session_number}")
     print(f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}")
+    # Each session's run report covers that session only
+    metrics.REGISTRY.reset()
     
     # Show current database stats before collection
     db = TikTokDatabase()
@@ -25,10 +28,11 @@ async def run_collection_session(session_number: int = 1):
     print(f"   Comments: {stats_before.get('total_comments', 0)}")
     print(f"   Hashtags: {stats_before.get('total_hashtags', 0)}")
     
-    # Run the data collection
+    # Run the data collection; the session writes the run report itself
     start_time = time.time()
-    await get_trending_data()
+    await get_trending_data(report_file=None)
     end_time = time.time()
+    metrics.STAGE_SECONDS.observe(end_time - start_time, script="run_data_collection", stage="session")
     
     # Show updated database stats
     stats_after = db.get_video_stats()
@@ -38,6 +42,10 @@ async def run_collection_session(session_number: int = 1):
     print(f"   Hashtags: {stats_after.get('total_hashtags', 0)} (+{stats_after.get('total_hashtags', 0) - stats_before.get('total_hashtags', 0)})")
     
     print(f"\n⏱️ Session completed in {end_time - start_time:.2f} seconds")
+    report_path = metrics.write_report("run_data_collection", start_time, session=session_number,
+                                       stats_before=stats_before, stats_after=stats_after)
+    if report_path:
+        print(f"📄 Run report: {report_path}")
     print(f"{'='*60}")
 
 async def run_multiple_sessions(num_sessions: int = 3, delay_minutes: int = 30):
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Pluggable sources of trending videos and their comments.
+
+Both collectors read through the same small interface:
+
+- DataSource.iter_videos(max_videos) yields raw video dicts in the TikTok
+  web shape (id, author.uniqueId, stats, video.cover, challenges), as
+  returned by TikHub's explore endpoint and TikTokApi's `video.as_dict`
+- DataSource.fetch_comments(video_id, max_comments) returns raw comment
+  dicts (cid, text, digg_count, user.unique_id)
+
+Backends:
+
+- TikHubSource: TikHub REST API (fetch_tikhub.py)
+- TikTokApiSource: TikTokApi browser sessions (comments.py)
+- RecordingSource: wraps another source and appends every response, with
+  its timing, to a gzip-compressed JSONL file
+- ReplaySource: plays a recording back offline, as fast as possible or at
+  a chosen speed, optionally scaled up with renamed copies of every video
+
+SourceApi presents any DataSource with the TikTokApi surface that the
+comments.py pipeline uses, so replays drive the full ingest path too.
+
+    python fetch_tikhub.py --record run.jsonl.gz        # record a live run
+    python fetch_tikhub.py --replay run.jsonl.gz --replay-scale 10   # outputs go to a temp dir
+    python comments.py --replay run.jsonl.gz --db /tmp/replay.db
+    python sources.py synthesize synthetic.jsonl.gz --videos 200   # no network needed
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+
+# Configuration
+REPLAY_SPEED = float(os.environ.get("REPLAY_SPEED", "0"))
+RECORDING_FORMAT = 1
+
+
+class DataSource(ABC):
+    """Where trending videos and their comments come from"""
+
+    name = "source"
+    # Offline sources have no image URLs worth downloading
+    offline = False
+
+    @abstractmethod
+    def iter_videos(self, max_videos: Optional[int] = None) -> Iterator[Dict]:
+        """Yield raw video dicts, at most max_videos of them"""
+
+    @abstractmethod
+    def fetch_comments(self, video_id: str, max_comments: int = 20) -> List[Dict]:
+        """Return up to max_comments raw comment dicts for video_id"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TikHubSource(DataSource):
+    """TikHub REST endpoints, through the pooled TikHubClient"""
+
+    name = "tikhub"
+
+    def __init__(self, client=None):
+        from tikhub_client import get_client
+        self.client = client or get_client()
+
+    def iter_videos(self, max_videos: Optional[int] = None) -> Iterator[Dict]:
+        # fetch_tikhub imports this module, so its endpoints are imported late
+        from fetch_tikhub import iter_explore_videos
+        return iter_explore_videos(max_items=max_videos, client=self.client)
+
+    def fetch_comments(self, video_id: str, max_comments: int = 20) -> List[Dict]:
+        from fetch_tikhub import fetch_video_comments
+        return fetch_video_comments(video_id, count=max_comments, client=self.client)
+
+
+class TikTokApiSource(DataSource):
+    """TikTokApi browser sessions, driven from a private event loop thread
+
+    TikTokApi is async; its sessions live on one loop, and the blocking
+    methods here submit coroutines to it, so they can be called from any
+    thread (including SourceApi's worker threads).
+    """
+
+    name = "tiktokapi"
+
+    def __init__(self, ms_token: str, page_size: int = 20, headless: bool = False):
+        from TikTokApi import TikTokApi
+        self.page_size = page_size
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tiktokapi", daemon=True)
+        self._thread.start()
+        self._videos: Dict[str, object] = {}
+        self.api = TikTokApi()
+        self._run(self.api.create_sessions(ms_tokens=[ms_token], num_sessions=1, sleep_after=3,
+                                           browser="firefox", headless=headless))
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def iter_videos(self, max_videos: Optional[int] = None) -> Iterator[Dict]:
+        videos = self.api.trending.videos(count=self.page_size).__aiter__()
+        yielded = 0
+        while max_videos is None or yielded < max_videos:
+            try:
+                video = self._run(videos.__anext__())
+            except StopAsyncIteration:
+                return
+            self._videos[video.id] = video
+            yielded += 1
+            yield video.as_dict
+
+    def fetch_comments(self, video_id: str, max_comments: int = 20) -> List[Dict]:
+        video = self._videos.get(video_id) or self.api.video(id=video_id)
+
+        async def collect():
+            comments = []
+            async for comment in video.comments(count=max_comments):
+                comments.append(comment.as_dict)
+                if len(comments) >= max_comments:
+                    break
+            return comments
+        return self._run(collect())
+
+    def close(self):
+        try:
+            self._run(self.api.close_sessions())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+class RecordingSource(DataSource):
+    """Pass-through source that records every response to gzip JSONL
+
+    Lines are {"kind": "meta" | "video" | "comments", ...}. Videos carry
+    how long the source took to produce them and comments the call duration, so
+    replays can reproduce the timing of the recorded run.
+    """
+
+    def __init__(self, inner: DataSource, path: str):
+        self.inner = inner
+        self.name = f"recording({inner.name})"
+        self.offline = inner.offline
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"kind": "meta", "format": RECORDING_FORMAT, "source": inner.name,
+                     "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self.records = 0
+
+    def _write(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def iter_videos(self, max_videos: Optional[int] = None) -> Iterator[Dict]:
+        videos = iter(self.inner.iter_videos(max_videos))
+        while True:
+            # Time only the source, not the consumer between items
+            started = time.perf_counter()
+            video = next(videos, None)
+            if video is None:
+                return
+            self._write({"kind": "video", "delay": round(time.perf_counter() - started, 4), "data": video})
+            self.records += 1
+            yield video
+
+    def fetch_comments(self, video_id: str, max_comments: int = 20) -> List[Dict]:
+        started = time.perf_counter()
+        comments = self.inner.fetch_comments(video_id, max_comments)
+        self._write({"kind": "comments", "video_id": video_id, "seconds": round(time.perf_counter() - started, 4),
+                     "data": comments})
+        self.records += 1
+        return comments
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.inner.close()
+
+
+class ReplaySource(DataSource):
+    """Deterministic offline playback of a recording
+
+    speed 0 replays without delays; 1.0 reproduces the recorded timing,
+    2.0 runs twice as fast. scale N yields N renamed copies of every
+    recorded video (ids and comment ids suffixed), for load tests bigger
+    than the recording.
+    """
+
+    name = "replay"
+    offline = True
+
+    def __init__(self, path: str, speed: float = REPLAY_SPEED, scale: int = 1):
+        self.path = path
+        self.speed = speed
+        self.scale = max(1, scale)
+        self.videos: List[Dict] = []
+        self.comments: Dict[str, Dict] = {}
+        self.meta: Dict = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["kind"] == "video":
+                    self.videos.append(record)
+                elif record["kind"] == "comments":
+                    self.comments[record["video_id"]] = record
+                elif record["kind"] == "meta":
+                    self.meta = record
+
+    def _sleep(self, seconds: float):
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    @staticmethod
+    def _copy_id(value: str, copy: int) -> str:
+        return value if copy == 0 else f"{value}r{copy}"
+
+    def iter_videos(self, max_videos: Optional[int] = None) -> Iterator[Dict]:
+        yielded = 0
+        for copy in range(self.scale):
+            for record in self.videos:
+                if max_videos is not None and yielded >= max_videos:
+                    return
+                self._sleep(record.get("delay", 0))
+                video = json.loads(json.dumps(record["data"]))
+                video["id"] = self._copy_id(str(video.get("id")), copy)
+                yielded += 1
+                yield video
+
+    def fetch_comments(self, video_id: str, max_comments: int = 20) -> List[Dict]:
+        record, copy = self.comments.get(video_id), 0
+        if record is None:
+            original, _, suffix = video_id.rpartition("r")
+            if suffix.isdigit():
+                record, copy = self.comments.get(original), int(suffix)
+        if record is None:
+            return []
+        self._sleep(record.get("seconds", 0))
+        comments = json.loads(json.dumps(record["data"][:max_comments]))
+        for comment in comments:
+            comment["cid"] = self._copy_id(str(comment.get("cid")), copy)
+        return comments
+
+
+def synthesize_recording(path: str, n_videos: int = 100, comments_per_video: int = 20,
+                         latency: float = 0.05, seed: int = 42) -> int:
+    """Write a recording of synthetic videos and comments in the TikTok web shape"""
+    import random
+    from synthetic_data import HASHTAGS, _zipf_choice, synthetic_comment_text
+    rng = random.Random(seed)
+    written = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"kind": "meta", "format": RECORDING_FORMAT, "source": "synthetic"}) + "\n")
+        for v in range(n_videos):
+            video_id = f"7{v:018d}"
+            user = f"creator{v % 113}"
+            video = {
+                "id": video_id,
+                "desc": synthetic_comment_text(rng),
+                "createTime": 1735689600 + v * 60,
+                "author": {"uniqueId": user, "nickname": user.title(),
+                           "avatarMedium": f"https://example.invalid/avatar/{user}.jpeg"},
+                "stats": {"diggCount": rng.randint(0, 5_000_000), "commentCount": rng.randint(0, 50_000),
+                          "shareCount": rng.randint(0, 20_000), "playCount": rng.randint(0, 50_000_000)},
+                "video": {"cover": f"https://example.invalid/cover/{video_id}.jpeg", "duration": rng.randint(5, 180)},
+                "challenges": [{"title": tag} for tag in sorted({_zipf_choice(rng, HASHTAGS) for _ in range(4)})],
+            }
+            comments = [{
+                "cid": f"{video_id}{c:04d}",
+                "text": synthetic_comment_text(rng),
+                "digg_count": int(rng.paretovariate(1.2)) - 1,
+                "create_time": 1735689600 + v * 60 + c,
+                "user": {"unique_id": f"commenter{rng.randrange(50_000)}"},
+            } for c in range(comments_per_video)]
+            f.write(json.dumps({"kind": "video", "delay": latency / 10, "data": video}) + "\n")
+            f.write(json.dumps({"kind": "comments", "video_id": video_id, "seconds": latency,
+                                "data": comments}) + "\n")
+            written += 1
+    return written
+
+
+class _Obj:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _SourceVideo:
+    """A raw video dict with the TikTokApi Video attributes comments.py reads"""
+
+    def __init__(self, raw: Dict, source: DataSource):
+        author = raw.get("author") or {}
+        self.id = str(raw.get("id"))
+        username = author.get("uniqueId") or author.get("nickname") or "unknown"
+        self.url = f"https://www.tiktok.com/@{username}/video/{self.id}"
+        self.author = _Obj(username=username)
+        self.stats = raw.get("stats") or {}
+        self.create_time = raw.get("createTime")
+        self.hashtags = [_Obj(name=c["title"]) for c in raw.get("challenges") or [] if c.get("title")]
+        self.as_dict = raw
+        self._source = source
+
+    async def comments(self, count: int = 20):
+        raw_comments = await asyncio.to_thread(self._source.fetch_comments, self.id, count)
+        for raw in raw_comments:
+            yield _Obj(id=raw.get("cid"), text=raw.get("text", ""),
+                       author=_Obj(username=(raw.get("user") or {}).get("unique_id", "Unknown")),
+                       likes_count=raw.get("digg_count", 0))
+
+
+class SourceApi:
+    """Async TikTokApi facade over a blocking DataSource
+
+    Blocking source calls run in worker threads, so the comments.py
+    fetchers still overlap.
+    """
+
+    def __init__(self, source: DataSource, max_videos: Optional[int] = None):
+        self.source = source
+        self.max_videos = max_videos
+        self.trending = self
+
+    async def videos(self, count: int = 30):
+        iterator = self.source.iter_videos(self.max_videos)
+        while True:
+            raw = await asyncio.to_thread(next, iterator, None)
+            if raw is None:
+                return
+            yield _SourceVideo(raw, self.source)
+
+
+def open_source(replay: Optional[str] = None, record: Optional[str] = None, speed: float = REPLAY_SPEED,
+                scale: int = 1, live=None) -> DataSource:
+    """The replay source for `replay`, else `live()`, wrapped in a recorder when `record` is set"""
+    source = ReplaySource(replay, speed=speed, scale=scale) if replay else live()
+    return RecordingSource(source, record) if record else source
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Create or inspect data-source recordings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    synth = sub.add_parser("synthesize", help="Write a synthetic recording")
+    synth.add_argument("path")
+    synth.add_argument("--videos", type=int, default=100)
+    synth.add_argument("--comments", type=int, default=20)
+    synth.add_argument("--latency", type=float, default=0.05, help="Recorded seconds per comment call")
+    info = sub.add_parser("info", help="Summarize a recording")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "synthesize":
+        count = synthesize_recording(args.path, args.videos, args.comments, args.latency)
+        print(f"🎞️ Wrote {count} synthetic videos to {args.path} ({os.path.getsize(args.path):,} bytes)")
+    else:
+        replay = ReplaySource(args.path)
+        n_comments = sum(len(r["data"]) for r in replay.comments.values())
+        print(f"🎞️ {args.path}: source {replay.meta.get('source', '?')}, {len(replay.videos)} videos, "
+              f"{n_comments} comments, {os.path.getsize(args.path):,} bytes compressed")
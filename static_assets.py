@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Static asset serving with validators and precompressed variants.
+
+Each asset gets a strong ETag from its content hash, and conditional
+requests (If-None-Match / If-Modified-Since) are answered with 304 Not
+Modified. Text assets (JSON, JS, CSS, HTML, SVG, fonts) have gzip and,
+when the brotli module is installed, brotli variants stored next to them
+as `<name>.gz` / `<name>.br`. The variant is picked from Accept-Encoding.
+Hash-named cache images are served as immutable.
+
+Run `python static_assets.py` to precompress the whole tree ahead of time.
+Otherwise variants are built in memory the first time an asset is
+requested, and only written to disk if the store was created with
+write_variants=True. Bodies held in memory are bounded by CACHE_BUDGET
+and evicted least recently used; images keep only their validators,
+which are charged a fixed ENTRY_OVERHEAD each.
+"""
+
+import os
+import re
+import gzip
+import mimetypes
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from flask import Request, Response, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional
+    brotli = None
+
+# Configuration
+MEMORY_LIMIT = int(os.environ.get("ASSET_MEMORY_LIMIT", str(2 * 1024 * 1024)))
+CACHE_BUDGET = int(os.environ.get("ASSET_CACHE_BUDGET", str(32 * 1024 * 1024)))
+MIN_COMPRESS_BYTES = 512
+# Charged per cached asset for its path, validators and etags, so entries
+# without bodies (images, large files) still count against the budget
+ENTRY_OVERHEAD = 1024
+HASH_CHUNK_SIZE = 64 * 1024
+
+COMPRESSIBLE_EXTENSIONS = {".json", ".js", ".css", ".html", ".svg", ".otf", ".ttf", ".txt"}
+
+# Encodings in order of preference, with the suffix of their variant file
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+FONT_CACHE = "public, max-age=604800"
+REVALIDATE_CACHE = "no-cache"
+
+# Cache images are named <prefix>_<hex key>.<ext>, so a name never changes meaning
+HASHED_IMAGE = re.compile(r"^images/.+_[0-9a-f]{12,}\.(jpe?g|png|gif|webp|avif|heic)$")
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    """Compress data with the given content-coding."""
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def available_encodings() -> List[Tuple[str, str]]:
+    """Encodings this process can produce (brotli only if installed)."""
+    return [(enc, suffix) for enc, suffix in ENCODINGS if enc != "br" or brotli is not None]
+
+
+def is_compressible(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _is_fresh(variant_path: str, source_mtime_ns: int) -> bool:
+    try:
+        return os.stat(variant_path).st_mtime_ns >= source_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def precompress(path: str, data: Optional[bytes] = None, write: bool = True) -> Dict[str, bytes]:
+    """Write missing or stale compressed variants next to path.
+
+    Returns the variant bodies by content-coding. Variants that would not
+    be smaller than the original are dropped. With write=False, stale
+    variants are only built in memory and the directory is left alone.
+    """
+    if not is_compressible(path):
+        return {}
+    source_mtime_ns = os.stat(path).st_mtime_ns
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return {}
+
+    variants = {}
+    for encoding, suffix in available_encodings():
+        variant_path = path + suffix
+        if _is_fresh(variant_path, source_mtime_ns):
+            with open(variant_path, "rb") as f:
+                body = f.read()
+        else:
+            body = _compress(data, encoding)
+            if len(body) >= len(data):
+                if write and os.path.exists(variant_path):
+                    os.remove(variant_path)
+                continue
+            if not write:
+                variants[encoding] = body
+                continue
+            try:
+                _write_atomic(variant_path, body)
+            except OSError:
+                pass  # Read-only checkout: serve the variant from memory only
+        variants[encoding] = body
+    return variants
+
+
+def precompress_tree(root: str = ".") -> int:
+    """Precompress every compressible asset under root. Returns files written."""
+    written = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in ("node_modules", "__pycache__")]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not is_compressible(path):
+                continue
+            mtime_ns = os.stat(path).st_mtime_ns
+            stale = [s for _, s in available_encodings() if not _is_fresh(path + s, mtime_ns)]
+            if stale:
+                precompress(path)
+                written += 1
+    return written
+
+
+def cache_control_for(rel_path: str) -> str:
+    """Cache-Control policy for an asset path relative to the site root."""
+    if HASHED_IMAGE.match(rel_path):
+        return IMMUTABLE_CACHE
+    if rel_path.startswith("fonts/"):
+        return FONT_CACHE
+    return REVALIDATE_CACHE
+
+
+class Asset:
+    """One file's validators plus its identity and compressed representations."""
+
+    def __init__(self, path: str, version: Tuple[int, int], write_variants: bool = False):
+        self.path = path
+        self.version = version
+        self.last_modified = datetime.fromtimestamp(version[0] / 1e9, tz=timezone.utc).replace(microsecond=0)
+        self.bodies: Dict[str, Optional[bytes]] = {}
+        self.etags: Dict[str, str] = {}
+
+        size = version[1]
+        if size <= MEMORY_LIMIT and is_compressible(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:32]
+            self.bodies["identity"] = data
+            for encoding, body in precompress(path, data, write=write_variants).items():
+                self.bodies[encoding] = body
+        else:
+            # Large files and images stay on disk; only already-built variants are used
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()[:32]
+            self.bodies["identity"] = None
+            for encoding, suffix in available_encodings():
+                if _is_fresh(path + suffix, version[0]):
+                    self.bodies[encoding] = None
+
+        self.etags["identity"] = f'"{digest}"'
+        for encoding in self.bodies:
+            if encoding != "identity":
+                self.etags[encoding] = f'"{digest}-{encoding}"'
+
+    def negotiate(self, request: Request) -> str:
+        """Pick the best representation the client accepts."""
+        for encoding, _ in ENCODINGS:
+            if encoding in self.bodies and request.accept_encodings.quality(encoding) > 0:
+                return encoding
+        return "identity"
+
+    def not_modified(self, request: Request) -> bool:
+        """Whether the client's cached copy is still current."""
+        if request.if_none_match:
+            return any(request.if_none_match.contains_weak(tag.strip('"'))
+                       for tag in self.etags.values())
+        if request.if_modified_since:
+            return self.last_modified <= request.if_modified_since
+        return False
+
+    def file_for(self, encoding: str) -> str:
+        suffix = dict(ENCODINGS).get(encoding)
+        return self.path + suffix if suffix else self.path
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of bodies held in memory, plus the fixed cost of the entry."""
+        return ENTRY_OVERHEAD + sum(len(body) for body in self.bodies.values() if body is not None)
+
+
+class AssetStore:
+    """Serves files under root, caching validators and small bodies in memory.
+
+    Cached assets are kept in LRU order and evicted once their bodies and
+    per-entry overhead exceed budget bytes. Compressed variants are written next to their
+    source only when write_variants is set.
+    """
+
+    def __init__(self, root: str = ".", budget: int = CACHE_BUDGET, write_variants: bool = False):
+        self.root = os.path.abspath(root)
+        self.budget = budget
+        self.write_variants = write_variants
+        self._lock = threading.Lock()
+        self._assets: "OrderedDict[str, Asset]" = OrderedDict()
+        self._memory_bytes = 0
+
+    def get(self, rel_path: str) -> Optional[Asset]:
+        """Return the asset for rel_path, reloading it if the file changed."""
+        path = safe_join(self.root, rel_path)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is not None:
+                self._assets.move_to_end(path)
+        if asset is None or asset.version != version:
+            asset = Asset(path, version, self.write_variants)
+            with self._lock:
+                self._forget(path)
+                self._assets[path] = asset
+                self._memory_bytes += asset.memory_bytes
+                self._evict()
+        return asset
+
+    def _forget(self, path: str):
+        asset = self._assets.pop(path, None)
+        if asset is not None:
+            self._memory_bytes -= asset.memory_bytes
+
+    def _evict(self):
+        """Drop least recently used assets until the bodies fit the budget."""
+        while self._memory_bytes > self.budget and len(self._assets) > 1:
+            self._forget(next(iter(self._assets)))
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def invalidate(self, rel_path: Optional[str] = None):
+        """Drop cached state for one asset, or for all of them."""
+        with self._lock:
+            if rel_path is None:
+                self._assets.clear()
+                self._memory_bytes = 0
+            else:
+                path = safe_join(self.root, rel_path)
+                if path is not None:
+                    self._forget(path)
+
+    def response(self, rel_path: str, request: Request, mimetype: Optional[str] = None,
+                 cache_control: Optional[str] = None) -> Optional[Response]:
+        """Build a 200/304 response for rel_path, or None if it does not exist."""
+        asset = self.get(rel_path)
+        if asset is None:
+            return None
+        encoding = asset.negotiate(request)
+        headers = {
+            "ETag": asset.etags[encoding],
+            "Last-Modified": asset.last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "Cache-Control": cache_control or cache_control_for(rel_path.replace(os.sep, "/")),
+            "Vary": "Accept-Encoding",
+        }
+
+        if asset.not_modified(request):
+            return Response(status=304, headers=headers)
+
+        mimetype = mimetype or mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        body = asset.bodies[encoding]
+        if body is not None:
+            resp = Response(body, mimetype=mimetype)
+        else:
+            resp = send_file(asset.file_for(encoding), mimetype=mimetype,
+                             download_name=os.path.basename(rel_path),
+                             conditional=False, etag=False, max_age=None)
+        resp.headers.update(headers)
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+        return resp
+
+
+if __name__ == "__main__":
+    count = precompress_tree(".")
+    encodings = ", ".join(enc for enc, _ in available_encodings())
+    print(f"🗜️ Precompressed {count} assets ({encodings})")
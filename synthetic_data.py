@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Seed a SQLite database with synthetic TikTok data.
+Used to check query plans and benchmark against realistic table sizes
+without touching the network.
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from database_setup import migrate
+
+# Small vocabulary with a skewed (Zipf-like) pick order, so phrase and
+# hashtag counts look like real comment sections
+WORDS = [
+    'funny', 'video', 'love', 'this', 'song', 'cat', 'dog', 'best', 'ever', 'so',
+    'cute', 'dance', 'trend', 'girl', 'boy', 'crazy', 'real', 'life', 'omg', 'why',
+    'bro', 'literally', 'me', 'when', 'the', 'ending', 'part', 'two', 'need', 'more',
+    'who', 'else', 'here', 'from', 'fyp', 'sound', 'name', 'vibe', 'mood', 'same',
+    'queen', 'king', 'slay', 'iconic', 'legend', 'cooking', 'recipe', 'outfit', 'fit', 'check',
+]
+HASHTAGS = [
+    'fyp', 'foryou', 'viral', 'trending', 'funny', 'cat', 'dog', 'dance', 'music', 'comedy',
+    'fashion', 'food', 'love', 'tiktok', 'duet', 'art', 'gaming', 'sports', 'travel', 'beauty',
+]
+
+
+def _zipf_choice(rng: random.Random, items: list, skew: float = 1.1) -> str:
+    """Pick an item with probability roughly proportional to 1 / rank**skew"""
+    rank = int(len(items) * (rng.random() ** (1 + skew)))
+    return items[min(rank, len(items) - 1)]
+
+
+def synthetic_comment_text(rng: random.Random) -> str:
+    """A short comment made of 3-12 vocabulary words"""
+    return ' '.join(_zipf_choice(rng, WORDS) for _ in range(rng.randint(3, 12)))
+
+
+def seed_database(db_path: str, n_comments: int = 1_000_000, n_videos: int = None,
+                  seed: int = 42, batch_size: int = 50_000, history_days: int = 0) -> dict:
+    """Fill db_path with synthetic videos, comments and hashtags
+
+    Returns the number of rows written per table.
+    """
+    rng = random.Random(seed)
+    n_videos = n_videos or max(1, n_comments // 200)
+    started = time.time()
+    base_time = datetime(2025, 1, 1)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    migrate(conn, verbose=False)
+
+    conn.execute('BEGIN')
+    video_rows = []
+    hashtag_rows = []
+    for v in range(n_videos):
+        video_id = f"syn{v:09d}"
+        scraped_at = (base_time + timedelta(minutes=v)).strftime('%Y-%m-%d %H:%M:%S')
+        video_rows.append((
+            video_id, f"https://www.tiktok.com/@user{v % 997}/video/{video_id}", f"user{v % 997}",
+            rng.randint(0, 5_000_000), rng.randint(0, 50_000), rng.randint(0, 20_000),
+            rng.randint(0, 50_000_000), scraped_at
+        ))
+        for tag in {_zipf_choice(rng, HASHTAGS) for _ in range(rng.randint(1, 5))}:
+            hashtag_rows.append((video_id, tag))
+    conn.executemany('''
+        INSERT OR IGNORE INTO videos
+        (video_id, video_url, author, likes_count, comment_count, share_count, play_count, scraped_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', video_rows)
+    conn.executemany('INSERT OR IGNORE INTO hashtags (video_id, hashtag) VALUES (?, ?)', hashtag_rows)
+    conn.execute('COMMIT')
+
+    # Stats snapshots every 6 hours going back history_days, growing at a
+    # per-video rate so velocity rankings have something to rank
+    history_rows = 0
+    if history_days:
+        now = int(time.time())
+        keys = [row[0] for row in conn.execute("SELECT id FROM videos WHERE video_id LIKE 'syn%'")]
+        conn.execute('BEGIN')
+        for key in keys:
+            rate = rng.paretovariate(1.5)
+            plays, likes = rng.randint(0, 100_000), rng.randint(0, 5_000)
+            snapshots = []
+            for step in range(history_days * 4, -1, -1):
+                plays += int(rate * rng.randint(0, 2_000))
+                likes += int(rate * rng.randint(0, 100))
+                snapshots.append((key, now - step * 6 * 3600, likes, likes // 20, likes // 50, plays))
+            conn.executemany('''
+                INSERT OR REPLACE INTO video_stats_history (video_key, captured_at, likes, comments, shares, plays)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', snapshots)
+            history_rows += len(snapshots)
+        conn.execute('COMMIT')
+
+    written = 0
+    while written < n_comments:
+        batch = []
+        for c in range(written, min(written + batch_size, n_comments)):
+            batch.append((
+                f"sync{c:010d}", f"syn{rng.randrange(n_videos):09d}", synthetic_comment_text(rng),
+                f"commenter{rng.randrange(50_000)}", int(rng.paretovariate(1.2)) - 1
+            ))
+        conn.execute('BEGIN')
+        conn.executemany('''
+            INSERT OR IGNORE INTO comments (comment_id, video_id, text, author, likes_count)
+            VALUES (?, ?, ?, ?, ?)
+        ''', batch)
+        conn.execute('COMMIT')
+        written += len(batch)
+
+    conn.execute('ANALYZE')
+    conn.close()
+
+    # Comments were written directly, so derive the phrase index in one pass
+    from database_helper import TikTokDatabase
+    with TikTokDatabase(db_path) as db:
+        db.rebuild_phrase_counts()
+
+    counts = {'videos': n_videos, 'comments': n_comments, 'hashtags': len(hashtag_rows),
+              'stats_snapshots': history_rows}
+    print(f"🌱 Seeded {db_path}: {counts} in {time.time() - started:.1f}s")
+    return counts
+
+
+
+class _Obj:
+    """Attribute bag standing in for TikTokApi's User, Hashtag and Comment objects"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeVideo:
+    """Offline stand-in for TikTokApi's Video with the attributes comments.py reads"""
+
+    def __init__(self, index: int, rng: random.Random, latency: float = 0.0, fail_comments: bool = False):
+        self.id = f"fake{index:09d}"
+        username = f"user{index % 97}"
+        self.url = f"https://www.tiktok.com/@{username}/video/{self.id}"
+        self.author = _Obj(username=username)
+        self.stats = {'diggCount': rng.randint(0, 5_000_000), 'commentCount': rng.randint(0, 50_000),
+                      'shareCount': rng.randint(0, 20_000), 'playCount': rng.randint(0, 50_000_000)}
+        self.create_time = None
+        self.hashtags = [_Obj(name=tag) for tag in {_zipf_choice(rng, HASHTAGS) for _ in range(3)}]
+        self.as_dict = {'author': {'uniqueId': username, 'avatarMedium': None},
+                        'video': {'cover': f"https://example.invalid/{self.id}.jpg"}}
+        self._comments = [_Obj(id=f"{self.id}c{c}", text=synthetic_comment_text(rng),
+                               author=_Obj(username=f"commenter{rng.randrange(50_000)}"),
+                               likes_count=int(rng.paretovariate(1.2)) - 1) for c in range(30)]
+        self._latency = latency
+        self._fail_comments = fail_comments
+
+    async def comments(self, count: int = 20):
+        for comment in self._comments[:count]:
+            # Network latency per comment page of ~10 comments
+            if self._latency and int(comment.id.rsplit('c', 1)[1]) % 10 == 0:
+                await asyncio.sleep(self._latency)
+            if self._fail_comments:
+                raise RuntimeError(f"comments unavailable for {self.id}")
+            yield comment
+
+
+class FakeTikTokApi:
+    """Offline stand-in for TikTokApi: `api.trending.videos(count)` yields FakeVideo objects
+
+    `latency` seconds are awaited per video page and per comment page, so
+    concurrency in the collector shows up in wall time. Every
+    `fail_every`-th video raises while its comments are read.
+    """
+
+    def __init__(self, n_videos: int = 40, latency: float = 0.0, seed: int = 42, fail_every: int = 0):
+        rng = random.Random(seed)
+        self._videos = [FakeVideo(i, rng, latency, fail_comments=bool(fail_every) and i % fail_every == fail_every - 1)
+                       for i in range(n_videos)]
+        self.latency = latency
+        self.trending = self
+
+    async def create_sessions(self, **kwargs):
+        pass
+
+    async def close_sessions(self):
+        pass
+
+    async def videos(self, count: int = 30):
+        for i, video in enumerate(self._videos):
+            if self.latency and i % count == 0:
+                await asyncio.sleep(self.latency)
+            yield video
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic TikTok data")
+    parser.add_argument("db_path", help="Database file to create or extend")
+    parser.add_argument("--comments", type=int, default=1_000_000)
+    parser.add_argument("--videos", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--history-days", type=int, default=0,
+                        help="Also write 6-hourly stats snapshots for this many days")
+    args = parser.parse_args()
+    seed_database(args.db_path, n_comments=args.comments, n_videos=args.videos, seed=args.seed,
+                  history_days=args.history_days)
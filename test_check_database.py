@@ -0,0 +1,51 @@
+"""Dashboard query plans, explained on the SQL the helpers actually run."""
+
+import sqlite3
+
+import pytest
+
+from check_database import DASHBOARD_CALLS, capture_dashboard_queries, full_table_scans
+from synthetic_data import seed_database
+
+
+@pytest.fixture(scope="module")
+def seeded_db(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("plans") / "plans.db")
+    seed_database(db_path, n_comments=5_000, history_days=3)
+    return db_path
+
+
+@pytest.fixture(scope="module")
+def dashboard_queries(seeded_db):
+    return capture_dashboard_queries(seeded_db)
+
+
+def test_every_helper_is_captured(dashboard_queries):
+    assert set(dashboard_queries) == set(DASHBOARD_CALLS)
+    assert all(dashboard_queries.values())
+    assert any("video_stats_history" in sql for sql in dashboard_queries["get_fastest_rising"])
+
+
+@pytest.mark.parametrize("name", list(DASHBOARD_CALLS))
+def test_no_full_scan(seeded_db, dashboard_queries, name):
+    conn = sqlite3.connect(seeded_db)
+    try:
+        for sql in dashboard_queries[name]:
+            assert full_table_scans(conn, sql) == [], sql
+    finally:
+        conn.close()
+
+
+def test_windowing_history_directly_is_flagged(seeded_db):
+    conn = sqlite3.connect(seeded_db)
+    try:
+        # The PARTITION BY order makes SQLite walk the (video_key, captured_at)
+        # primary key (a plain or skip-scan) instead of the captured_at range
+        sql = """
+            SELECT video_key, ROW_NUMBER() OVER (PARTITION BY video_key ORDER BY captured_at)
+            FROM video_stats_history
+            WHERE captured_at >= CAST(strftime('%s', 'now') AS INTEGER) - 86400
+        """
+        assert full_table_scans(conn, sql)
+    finally:
+        conn.close()
@@ -0,0 +1,125 @@
+"""CollectionPipeline against synthetic_data.FakeTikTokApi and a temp database."""
+
+import asyncio
+import re
+
+import pytest
+
+from change_detection import ChangeDetector
+from comments import EXISTING_VIDEO_COMMENTS, NEW_VIDEO_COMMENTS, CollectionPipeline
+from database_helper import TikTokDatabase
+from synthetic_data import FakeTikTokApi
+
+
+@pytest.fixture
+def db(tmp_path):
+    with TikTokDatabase(str(tmp_path / "collect.db")) as db:
+        yield db
+
+
+def recording_writes(db):
+    """Wrap db.write_collected to record the video ids of every batch"""
+    batches = []
+    write_collected = db.write_collected
+
+    def write(records):
+        batches.append([record["video_id"] for record in records])
+        return write_collected(records)
+
+    db.write_collected = write
+    return batches
+
+
+def run(api, db, **options):
+    pipeline = CollectionPipeline(api, db, ChangeDetector(), **options)
+    return pipeline, asyncio.run(pipeline.run())
+
+
+def test_writes_every_discovered_video(db):
+    pipeline, report = run(FakeTikTokApi(n_videos=30), db, max_videos=12, fetchers=3)
+    assert report["new_videos"] == 12
+    assert report["new_comments"] == 12 * NEW_VIDEO_COMMENTS
+    stats = db.get_video_stats()
+    assert stats["total_videos"] == 12
+    assert stats["total_comments"] == 12 * NEW_VIDEO_COMMENTS
+    assert [stage["errors"] for stage in report["stages"]] == [0, 0, 0]
+
+
+def test_single_fetcher_keeps_discovery_order(db, capsys):
+    api = FakeTikTokApi(n_videos=8)
+    batches = recording_writes(db)
+    run(api, db, fetchers=1, write_batch=3, write_linger=1.0)
+    assert [video_id for batch in batches for video_id in batch] == [video.id for video in api._videos]
+    indexes = [int(n) for n in re.findall(r"^Video (\d+):", capsys.readouterr().out, re.MULTILINE)]
+    assert indexes == list(range(1, 9))
+
+
+def test_video_lines_stay_adjacent_with_concurrent_fetchers(db, capsys):
+    run(FakeTikTokApi(n_videos=10, latency=0.001), db, fetchers=4)
+    lines = capsys.readouterr().out.splitlines()
+    for i, line in enumerate(lines):
+        if re.match(r"^Video \d+:", line):
+            assert lines[i + 1].startswith("  Video ID: ")
+
+
+def test_writer_batches_up_to_write_batch(db):
+    batches = recording_writes(db)
+    pipeline, report = run(FakeTikTokApi(n_videos=10), db, fetchers=4, write_batch=4, write_linger=1.0)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert dict(report["stages"][2])["batches"] == 3
+
+
+def test_second_run_skips_unchanged_videos(db):
+    run(FakeTikTokApi(n_videos=5), db)
+    pipeline, report = run(FakeTikTokApi(n_videos=5), db)
+    assert report["new_videos"] == 0
+    assert report["existing_videos"] == 5
+    assert report["new_comments"] == 0
+
+
+def test_cancellation_stops_every_stage(db):
+    api = FakeTikTokApi(n_videos=200, latency=0.01)
+    batches = recording_writes(db)
+    pipeline = CollectionPipeline(api, db, ChangeDetector(), fetchers=2, write_batch=2, write_linger=0.01)
+
+    async def cancel_after_first_write():
+        task = asyncio.create_task(pipeline.run())
+        while not batches:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # No stage keeps running once run() has been cancelled
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        await asyncio.sleep(0.05)
+        return others
+
+    leftover = asyncio.run(cancel_after_first_write())
+    assert all(task.done() for task in leftover)
+    written = sum(len(batch) for batch in batches)
+    assert 0 < written < 200
+    assert db.get_video_stats()["total_videos"] == written
+
+
+def test_failed_comment_fetches_are_retried_next_run(db):
+    run(FakeTikTokApi(n_videos=4, fail_every=2), db)
+    failed = ["fake000000001", "fake000000003"]
+    assert [db.get_video_comment_count(video_id) for video_id in failed] == [0, 0]
+
+    pipeline, report = run(FakeTikTokApi(n_videos=4), db)
+    # Their zero baseline makes them 'changed' videos now
+    assert report["new_comments"] == 2 * EXISTING_VIDEO_COMMENTS
+    assert [db.get_video_comment_count(video_id) for video_id in failed] == [EXISTING_VIDEO_COMMENTS] * 2
+    assert pipeline.detector.skipped_videos == ["fake000000000", "fake000000002"]
+
+
+def test_failed_fetch_keeps_a_changed_videos_baseline(db):
+    run(FakeTikTokApi(n_videos=2), db)
+    baseline = db.get_video_counters("fake000000001")
+    # A different seed gives every video new stats
+    pipeline, report = run(FakeTikTokApi(n_videos=2, seed=7, fail_every=2), db)
+    assert report["existing_videos"] == 2
+    counters = db.get_video_counters("fake000000001")
+    assert {key: counters[key] for key in ("comment_count", "likes_count", "play_count")} == \
+        {key: baseline[key] for key in ("comment_count", "likes_count", "play_count")}
+    assert db.get_video_counters("fake000000000") != baseline
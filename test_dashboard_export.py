@@ -0,0 +1,127 @@
+"""Dashboard readers and export on databases from before the summary tables."""
+
+import json
+import sqlite3
+
+import pytest
+
+from database_helper import TikTokDatabase
+from database_setup import MIGRATIONS, TOP_COMMENTS_KEPT, get_schema_version
+from export_dashboard_data import export_dashboard_data
+
+
+def legacy_database(path, version=4):
+    """A database migrated only up to `version` (no summary tables before 6), with a few rows"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    for migration, _, apply in MIGRATIONS:
+        if migration > version:
+            break
+        apply(conn.cursor())
+    conn.execute(f'PRAGMA user_version = {version}')
+    conn.executemany('INSERT INTO videos (video_id, author, likes_count, comment_count) VALUES (?, ?, ?, ?)',
+                     [('v1', 'alice', 100, 4), ('v2', 'bob', 300, 8)])
+    conn.executemany('INSERT INTO comments (comment_id, video_id, text, likes_count) VALUES (?, ?, ?, ?)',
+                     [('c1', 'v1', 'best dance ever', 5), ('c2', 'v1', 'best dance ever', 9),
+                      ('c3', 'v2', 'love this song', 1)])
+    conn.executemany('INSERT INTO hashtags (video_id, hashtag) VALUES (?, ?)',
+                     [('v1', 'fyp'), ('v2', 'fyp'), ('v2', 'dance')])
+    conn.close()
+    return str(path)
+
+
+def test_readers_fall_back_to_base_tables(tmp_path):
+    path = legacy_database(tmp_path / 'legacy.db')
+    with TikTokDatabase(path, read_only=True) as db:
+        stats = db.get_video_stats()
+        hashtags = db.get_trending_hashtags(10, approximate=False)
+    assert stats == {'total_videos': 2, 'total_comments': 3, 'total_hashtags': 3,
+                     'avg_likes_per_video': 200.0, 'avg_comments_per_video': 6.0}
+    assert hashtags == [{'hashtag': 'fyp', 'count': 2}, {'hashtag': 'dance', 'count': 1}]
+
+
+def test_export_migrates_legacy_database(tmp_path):
+    path = legacy_database(tmp_path / 'legacy.db')
+    data_file = tmp_path / 'dashboard_data.json'
+    exported = export_dashboard_data(path, str(data_file))
+
+    assert json.loads(data_file.read_text(encoding='utf-8')) == exported
+    assert exported['stats']['total_videos'] == 2
+    assert exported['stats']['total_comments'] == 3
+    assert exported['hashtags'][0] == {'hashtag': 'fyp', 'count': 2}
+    assert [c['likes_count'] for c in exported['top_comments']] == [9, 5, 1]
+    assert exported['top_phrases'] == [{'phrase': 'dance ever', 'count': 2}]
+    assert len(exported['recent_videos']) == 2
+
+    conn = sqlite3.connect(path)
+    assert get_schema_version(conn) == MIGRATIONS[-1][0]
+    conn.close()
+
+
+def test_export_keeps_existing_file_when_database_is_empty(tmp_path):
+    path = str(tmp_path / 'empty.db')
+    with TikTokDatabase(path) as db:
+        db.get_connection()
+    data_file = tmp_path / 'dashboard_data.json'
+    data_file.write_text('{"stats": {"total_videos": 5}}', encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        export_dashboard_data(path, str(data_file))
+    assert data_file.read_text(encoding='utf-8') == '{"stats": {"total_videos": 5}}'
+
+
+def test_export_requires_existing_database(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        export_dashboard_data(str(tmp_path / 'missing.db'), str(tmp_path / 'out.json'))
+
+
+@pytest.fixture
+def ranked_db(tmp_path):
+    """TOP_COMMENTS_KEPT + 20 comments with distinct like counts across two videos"""
+    with TikTokDatabase(str(tmp_path / 'ranked.db')) as db:
+        conn = db.get_connection()
+        with conn:
+            conn.executemany('INSERT INTO videos (video_id, author) VALUES (?, ?)', [('v1', 'alice'), ('v2', 'bob')])
+            conn.executemany('INSERT INTO comments (comment_id, video_id, text, likes_count) VALUES (?, ?, ?, ?)',
+                             [(f'c{i}', f'v{i % 2 + 1}', f'comment {i}', i * 10)
+                              for i in range(TOP_COMMENTS_KEPT + 20)])
+        yield db
+
+
+def expected_top(db):
+    return db.get_connection().execute(f'''
+        SELECT c.comment_id FROM comments c JOIN videos v ON c.video_id = v.video_id
+        ORDER BY c.likes_count DESC, c.id LIMIT {TOP_COMMENTS_KEPT}
+    ''').fetchall()
+
+
+def top_comments(db):
+    return db.get_connection().execute(
+        'SELECT comment_id FROM top_comments ORDER BY likes_count DESC, comment_rowid').fetchall()
+
+
+def test_top_comments_refill_after_delete(ranked_db):
+    conn = ranked_db.get_connection()
+    with conn:
+        conn.execute('DELETE FROM comments WHERE likes_count >= 1000')
+    assert len(top_comments(ranked_db)) == TOP_COMMENTS_KEPT
+    assert top_comments(ranked_db) == expected_top(ranked_db)
+
+
+def test_top_comments_rerank_when_likes_change(ranked_db):
+    conn = ranked_db.get_connection()
+    with conn:
+        # The most-liked comment drops out, one from outside the table jumps in
+        conn.execute("UPDATE comments SET likes_count = 0 WHERE comment_id = 'c119'")
+        conn.execute("UPDATE comments SET likes_count = 5000 WHERE comment_id = 'c3'")
+        conn.execute("UPDATE comments SET text = 'edited' WHERE comment_id = 'c3'")
+    assert top_comments(ranked_db) == expected_top(ranked_db)
+    assert ranked_db.get_top_comments(1)[0]['text'] == 'edited'
+    assert ('c119',) not in top_comments(ranked_db)
+
+
+def test_top_comments_drop_deleted_videos(ranked_db):
+    conn = ranked_db.get_connection()
+    with conn:
+        conn.execute("DELETE FROM videos WHERE video_id = 'v2'")
+    assert top_comments(ranked_db) == expected_top(ranked_db)
+    assert len(top_comments(ranked_db)) == (TOP_COMMENTS_KEPT + 20) // 2
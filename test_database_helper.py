@@ -0,0 +1,77 @@
+"""TikTokDatabase batch writes and maintenance paths: phrase_counts rebuilds."""
+
+import sqlite3
+
+import pytest
+
+import database_helper
+from database_helper import TikTokDatabase
+
+COMMENTS = ["best dance ever", "best dance ever omg", "this song is the best", "love this song so much"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    with TikTokDatabase(str(tmp_path / "phrases.db")) as db:
+        db.ingest_batch([{"video_id": "v1", "comments": [
+            {"comment_id": f"c{i}", "text": text} for i, text in enumerate(COMMENTS)
+        ]}])
+        yield db
+
+
+def phrase_counts(db):
+    return dict(db.get_connection().execute("SELECT phrase, count FROM phrase_counts"))
+
+
+def test_rebuild_matches_incremental_counts(db):
+    incremental = phrase_counts(db)
+    assert db.rebuild_phrase_counts(chunk_size=2, workers=1) == len(incremental)
+    assert phrase_counts(db) == incremental
+
+
+def test_rebuild_closes_its_reader_when_counting_fails(db, monkeypatch):
+    opened = []
+    open_connection = db._open_connection
+
+    def tracked():
+        conn = open_connection()
+        opened.append(conn)
+        return conn
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("worker died")
+
+    incremental = phrase_counts(db)
+    monkeypatch.setattr(db, "_open_connection", tracked)
+    monkeypatch.setattr(database_helper, "count_phrases_parallel", broken)
+    assert db.rebuild_phrase_counts(workers=1) == 0
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+    # The DELETE was rolled back with the failed transaction
+    assert phrase_counts(db) == incremental
+
+
+def test_ingest_batch_counts_invalid_comments_apart_from_existing(db):
+    counts = db.ingest_batch([{"video_id": "v1", "hashtags": ["fyp", "fyp"], "comments": [
+        {"comment_id": "c0", "text": COMMENTS[0]},
+        {"comment_id": "c9", "text": "brand new comment"},
+        {"comment_id": "c9", "text": "brand new comment"},
+        {"comment_id": None, "text": "no id"},
+        {"comment_id": "c10"},
+    ]}])
+    assert counts == {"videos": 1, "comments_inserted": 1, "comments_skipped": 2, "comments_invalid": 2,
+                      "hashtags_inserted": 1, "hashtags_skipped": 1}
+
+
+def test_write_collected_reports_counts_per_video(db):
+    written = db.write_collected([
+        {"video_id": "v2", "kind": "new", "video": {"video_id": "v2"}, "stats": {},
+         "comments": [{"comment_id": "d1", "text": "hello there"}, {"text": "no id"}]},
+        {"video_id": "v1", "kind": "changed", "stats": {"diggCount": 5},
+         "comments": [{"comment_id": "c1", "text": COMMENTS[1]}]},
+    ])
+    assert written == {
+        "v2": {"comments": 1, "comments_skipped": 0, "comments_invalid": 1, "hashtags": 0, "hashtags_skipped": 0},
+        "v1": {"comments": 0, "comments_skipped": 1, "comments_invalid": 0, "hashtags": 0, "hashtags_skipped": 0},
+    }
@@ -0,0 +1,220 @@
+"""fetch_tikhub: refresh state across runs, and concurrent asset fetches against a stub API."""
+
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import fetch_tikhub
+from sources import DataSource, TikHubSource
+from tikhub_client import TikHubClient
+
+
+class StubSource(DataSource):
+    """Offline source with fixed videos; fetch_comments returns whatever comments[video_id] holds"""
+
+    name = "stub"
+    offline = True
+
+    def __init__(self, videos, comments):
+        self.videos = videos
+        self.comments = comments
+        self.fetched = []
+
+    def iter_videos(self, max_videos=None):
+        return iter(self.videos[:max_videos])
+
+    def fetch_comments(self, video_id, max_comments=20):
+        self.fetched.append(video_id)
+        return self.comments.get(video_id, [])
+
+
+def video(video_id, comment_count, likes=100):
+    return {"id": video_id, "author": {"uniqueId": "alice"},
+            "stats": {"commentCount": comment_count, "diggCount": likes, "playCount": likes * 10}}
+
+
+COMMENT = {"cid": "c1", "text": "best dance ever", "digg_count": 3, "user": {"unique_id": "bob"}}
+
+
+def run(tmp_path, source):
+    assert fetch_tikhub.main(workers=1, source=source, report_file="",
+                             data_file=tmp_path / "dashboard.json", state_file=tmp_path / "state.json")
+    return json.loads((tmp_path / "state.json").read_text())["videos"]
+
+
+def test_empty_fetch_for_new_video_is_retried(tmp_path):
+    state = run(tmp_path, StubSource([video("v1", 12)], {}))
+    assert "v1" not in state
+
+    source = StubSource([video("v1", 12)], {"v1": [COMMENT]})
+    state = run(tmp_path, source)
+    assert source.fetched == ["v1"]
+    assert [c["text"] for c in state["v1"]["comments"]] == ["best dance ever"]
+
+
+def test_empty_fetch_keeps_existing_baseline(tmp_path):
+    run(tmp_path, StubSource([video("v1", 12)], {"v1": [COMMENT]}))
+    # Stats moved enough to refetch, but the fetch comes back empty
+    source = StubSource([video("v1", 50, likes=500)], {})
+    state = run(tmp_path, source)
+    assert source.fetched == ["v1"]
+    assert state["v1"]["comment_count"] == 12
+    assert [c["text"] for c in state["v1"]["comments"]] == ["best dance ever"]
+
+
+def test_video_without_comments_records_empty_baseline(tmp_path):
+    state = run(tmp_path, StubSource([video("v1", 0)], {}))
+    assert state["v1"]["comments"] == []
+
+
+class CommentsStub(BaseHTTPRequestHandler):
+    """fetch_post_comment with a per-video random delay, tracking requests in flight"""
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            video_id = parse_qs(urlparse(self.path).query)["aweme_id"][0]
+            time.sleep(random.Random(video_id).uniform(0, 0.05))
+            body = json.dumps({"code": 200, "data": {
+                "comments": [{"cid": f"c-{video_id}", "text": f"comment on {video_id}"}],
+                "hasMore": False}}).encode()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CommentsStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("TIKHUB_BASE_URL", base_url)
+    # BASE_URL is read at import time
+    monkeypatch.setattr(fetch_tikhub, "BASE_URL", base_url)
+    CommentsStub.in_flight = CommentsStub.peak = 0
+    yield CommentsStub
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_assets_keep_input_order(stub_api):
+    videos = [video(f"v{i}", 5) for i in range(24)]
+
+    def fetch_all(workers):
+        client = TikHubClient(per_host_limit=2, max_retries=0)
+        return list(fetch_tikhub.iter_video_assets(videos, workers=workers, client=client,
+                                                   source=TikHubSource(client)))
+
+    serial = fetch_all(1)
+    assert stub_api.peak == 1
+    concurrent = fetch_all(4)
+
+    assert [v["id"] for v, _ in concurrent] == [v["id"] for v in videos]
+    assert concurrent == serial
+    assert [a["comments"][0]["text"] for _, a in concurrent] == [f"comment on v{i}" for i in range(24)]
+    assert stub_api.peak <= 2
+
+
+class PagedClient:
+    """Three cursor pages of two items; the fail_on cursor raises, and each request takes a fake second"""
+
+    def __init__(self, pages=None, fail_on=None):
+        self.pages = pages or {
+            None: {"items": [1, 2], "cursor": 10, "hasMore": True},
+            10: {"items": [3, 4], "cursor": 20, "hasMore": True},
+            20: {"items": [5, 6], "cursor": 30, "hasMore": False},
+        }
+        self.fail_on = fail_on
+        self.cursors = []
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        cursor = params.get("cursor")
+        self.cursors.append(cursor)
+        self.now += 1
+        if self.fail_on is not None and cursor == self.fail_on:
+            raise ConnectionError("connection reset")
+        page = self.pages[cursor]
+        items_key = "comments" if "comment" in url else "itemList"
+        body = {"code": 200, "data": {items_key: [{"id": i} for i in page["items"]],
+                                      "cursor": page["cursor"], "hasMore": page["hasMore"]}}
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: body)
+
+
+@pytest.fixture
+def paged(monkeypatch):
+    client = PagedClient()
+    monkeypatch.setattr(fetch_tikhub, "time", SimpleNamespace(monotonic=client.monotonic))
+    return client
+
+
+def ids(items):
+    return [item["id"] for item in items]
+
+
+def test_paginate_follows_cursors_until_has_more_is_false(paged):
+    items = fetch_tikhub._paginate("/api/v1/x", {}, "itemList", paged)
+    assert ids(items) == [1, 2, 3, 4, 5, 6]
+    assert paged.cursors == [None, 10, 20]
+
+
+@pytest.mark.parametrize("limits, expected, cursors", [
+    ({"max_items": 3}, [1, 2, 3], [None, 10]),
+    ({"max_pages": 2}, [1, 2, 3, 4], [None, 10]),
+    ({"max_seconds": 1.5}, [1, 2, 3, 4], [None, 10]),
+])
+def test_paginate_stops_at_limits(paged, limits, expected, cursors):
+    assert ids(fetch_tikhub._paginate("/api/v1/x", {}, "itemList", paged, **limits)) == expected
+    assert paged.cursors == cursors
+
+
+def test_paginate_stops_on_repeated_cursor(paged):
+    paged.pages[10]["cursor"] = 10
+    assert ids(fetch_tikhub._paginate("/api/v1/x", {}, "itemList", paged)) == [1, 2, 3, 4]
+    assert paged.cursors == [None, 10]
+
+
+def test_explore_videos_are_streamed_across_pages(paged):
+    videos = fetch_tikhub.iter_explore_videos(max_items=5, page_size=2, client=paged)
+    assert ids(videos) == [1, 2, 3, 4, 5]
+    assert paged.cursors == [None, 10, 20]
+
+
+def test_comments_stop_where_has_more_is_false(paged):
+    paged.pages[10]["hasMore"] = False
+    assert ids(fetch_tikhub.iter_video_comments("v1", max_items=None, client=paged)) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("stream", [
+    lambda client: fetch_tikhub.iter_explore_videos(max_items=None, client=client),
+    lambda client: fetch_tikhub.iter_video_comments("v1", max_items=None, client=client),
+])
+def test_stream_errors_end_the_stream_and_are_counted(paged, stream):
+    paged.fail_on = 20
+    before = fetch_tikhub.fetch_error_count()
+    assert ids(stream(paged)) == [1, 2, 3, 4]
+    assert fetch_tikhub.fetch_error_count() == before + 1
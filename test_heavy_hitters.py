@@ -0,0 +1,92 @@
+"""SpaceSaving and CountMinTopK against exact counts on fixed-seed Zipfian data."""
+
+import random
+from collections import Counter
+
+import pytest
+
+from heavy_hitters import CountMinTopK, SpaceSaving
+from text_analytics import count_extract_phrases, iter_extract_phrases
+
+N_ITEMS = 300_000
+VOCABULARY = 50_000
+MIN_RECALL = 0.95
+
+
+def zipf_stream(n_items, vocabulary, skew=1.1, seed=42):
+    """n_items draws from a Zipf(skew) distribution over `vocabulary` ranks"""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, vocabulary + 1)]
+    return rng.choices(range(vocabulary), weights=weights, k=n_items)
+
+
+def recall(approximate, exact):
+    """Share of the exact top-K that the summary also reports in its top-K"""
+    exact_items = {item for item, _ in exact}
+    return sum(item in exact_items for item, _ in approximate) / len(exact)
+
+
+@pytest.fixture(scope="module")
+def stream():
+    return zipf_stream(N_ITEMS, VOCABULARY)
+
+
+@pytest.fixture(scope="module")
+def exact(stream):
+    return Counter(stream)
+
+
+SUMMARIES = {
+    "space-saving 2k": lambda k: SpaceSaving(2_000),
+    "space-saving 20k": lambda k: SpaceSaving(20_000),
+    "count-min 4x8192": lambda k: CountMinTopK(k, width=8192, depth=4),
+}
+
+
+@pytest.mark.parametrize("k", [30, 100])
+@pytest.mark.parametrize("name", sorted(SUMMARIES))
+def test_top_k_overlap_and_error_bound(stream, exact, name, k):
+    summary = SUMMARIES[name](k)
+    summary.update(stream)
+    top = summary.most_common(k)
+
+    assert summary.total == N_ITEMS
+    assert recall(top, exact.most_common(k)) >= MIN_RECALL
+    # Never undercounts, and overcounts stay within the advertised bound
+    bound = summary.error_bound()
+    for item, count in top:
+        assert exact[item] <= count <= exact[item] + bound
+
+
+def test_space_saving_error_brackets_true_count(stream, exact):
+    summary = SpaceSaving(2_000)
+    summary.update(stream)
+    assert len(summary) == 2_000
+    for item, count in summary.most_common():
+        assert count - summary.errors[item] <= exact[item] <= count
+        assert summary.errors[item] <= summary.error_bound()
+
+
+def test_space_saving_guaranteed_items_are_exact_top_in_order(stream, exact):
+    summary = SpaceSaving(2_000)
+    summary.update(stream)
+    guaranteed = summary.guaranteed(30)
+    assert guaranteed
+    true_top = [item for item, _ in exact.most_common(len(guaranteed))]
+    assert [item for item, _ in guaranteed] == true_top
+
+
+def test_space_saving_keeps_exact_counts_under_capacity():
+    summary = SpaceSaving(10)
+    summary.update(["a", "b", "a", "c", "a", "b"])
+    assert summary.most_common() == [("a", 3), ("b", 2), ("c", 1)]
+    assert summary.error_bound() == pytest.approx(0.6)
+    assert all(error == 0 for error in summary.errors.values())
+
+
+def test_phrase_stream_top_30(golden_phrases):
+    corpus = golden_phrases["corpus"]
+    exact_phrases = count_extract_phrases(corpus)
+    summary = SpaceSaving(5_000)
+    summary.update(iter_extract_phrases(corpus))
+    assert recall(summary.most_common(30), exact_phrases.most_common(30)) >= MIN_RECALL
@@ -0,0 +1,144 @@
+"""ImageCache downloads, revalidation and eviction against a fake HTTP client."""
+
+import hashlib
+import io
+import json
+import os
+import time
+
+import pytest
+
+from image_cache import INDEX_VERSION, ImageCache, stable_key
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 2048
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=JPEG, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    """Serves one body per URL path and records every request."""
+
+    def __init__(self, bodies=None):
+        self.bodies = bodies or {}
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.requests.append((url, headers or {}))
+        return FakeResponse(body=self.bodies.get(url.split("?")[0], JPEG), headers={"ETag": '"v1"'})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(tmp_path, max_bytes=10_000)
+
+
+def part_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+def test_signed_urls_share_one_entry(cache, tmp_path):
+    client = FakeClient()
+    first = cache.fetch("https://cdn.example/a.jpg?sig=1", tmp_path / "covers", "cover_", client)
+    second = cache.fetch("https://cdn2.example/a.jpg?sig=2", tmp_path / "covers", "cover_", client)
+    assert first == second
+    assert len(client.requests) == 1
+    assert cache.report()["hits"] == 1
+
+
+def test_temp_file_removed_when_saving_fails(cache, tmp_path, monkeypatch):
+    def broken(*args):
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(cache, "_find_by_content", broken)
+    assert cache.fetch("https://cdn.example/a.jpg", tmp_path / "covers", "cover_", FakeClient()) is None
+    assert part_files(tmp_path / "covers") == []
+    assert cache.report()["errors"] == 1
+
+
+def test_temp_file_removed_for_unknown_format(cache, tmp_path):
+    client = FakeClient({"https://cdn.example/a.jpg": b"<html>not an image</html>"})
+    assert cache.fetch("https://cdn.example/a.jpg", tmp_path / "covers", "cover_", client) is None
+    assert part_files(tmp_path / "covers") == []
+
+
+def test_touched_entries_are_scoped_to_one_run(cache, tmp_path):
+    client = FakeClient({f"https://cdn.example/{i}.jpg": JPEG + bytes([i]) * 4000 for i in range(4)})
+    for i in range(4):
+        cache.fetch(f"https://cdn.example/{i}.jpg", tmp_path / "covers", "cover_", client)
+    # Everything was used this run, so nothing is evicted even over the cap
+    assert cache.evict() == 0
+    assert len(cache.entries) == 4
+    # The next run has used nothing yet, so the oldest files go
+    assert cache.evict() > 0
+    assert sum(entry["size"] for entry in cache.entries.values()) <= cache.max_bytes
+
+
+def real_jpeg(size=(400, 400)):
+    Image = pytest.importorskip("PIL.Image")
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 40, 90)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def test_thumbnails_are_keyed_apart_from_originals(cache, tmp_path):
+    client = FakeClient({"https://cdn.example/a.jpg": real_jpeg()})
+    covers = tmp_path / "covers"
+    thumbnail = cache.fetch("https://cdn.example/a.jpg?sig=1", covers, "cover_", client, thumbnail_size=(64, 64))
+    original = cache.fetch("https://cdn.example/a.jpg?sig=2", covers, "cover_", client)
+    assert thumbnail != original
+    assert (covers / original).read_bytes() == client.bodies["https://cdn.example/a.jpg"]
+    assert (covers / thumbnail).stat().st_size < (covers / original).stat().st_size
+    assert cache.fetch("https://cdn.example/a.jpg?sig=3", covers, "cover_", client,
+                       thumbnail_size=(64, 64)) == thumbnail
+    assert len(client.requests) == 2
+
+
+def test_legacy_files_are_adopted_for_eviction(tmp_path):
+    covers = tmp_path / "covers"
+    covers.mkdir()
+    legacy = covers / "cover_123_9d32ac4c0818.jpg"
+    legacy.write_bytes(JPEG * 4)
+    os.utime(legacy, (1, 1))
+
+    cache = ImageCache(tmp_path, max_bytes=len(JPEG) * 3)
+    name = cache.fetch("https://cdn.example/new.jpg", covers, "cover_456_", FakeClient())
+    assert name != legacy.name
+    cache.save()
+    cache.evict()
+    assert not legacy.exists()
+    assert (covers / name).exists()
+    assert json.loads((tmp_path / ".cache_index.json").read_text())["version"] == INDEX_VERSION
+
+
+def test_version_1_thumbnail_entries_stop_answering_lookups(tmp_path):
+    covers = tmp_path / "covers"
+    covers.mkdir()
+    old_thumbnail = f"cover_{stable_key('https://cdn.example/a.jpg')}.jpg"
+    (covers / old_thumbnail).write_bytes(JPEG + b"shrunk")
+    entry = {"filename": old_thumbnail, "dir": "covers", "size": len(JPEG) + 6,
+             "content_hash": hashlib.sha256(JPEG).hexdigest(), "validated_at": int(time.time()),
+             "last_access": int(time.time())}
+    (tmp_path / ".cache_index.json").write_text(json.dumps(
+        {"version": 1, "entries": {f"covers/cover_{stable_key('https://cdn.example/a.jpg')}": entry}}))
+
+    cache = ImageCache(tmp_path)
+    client = FakeClient()
+    name = cache.fetch("https://cdn.example/a.jpg?sig=1", covers, "cover_", client)
+    assert len(client.requests) == 1
+    assert (covers / name).read_bytes() == JPEG
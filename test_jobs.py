@@ -0,0 +1,85 @@
+"""JobManager state changes, history and its single database connection."""
+
+import threading
+
+import pytest
+
+from database_helper import TikTokDatabase
+from jobs import CANCELLED, FAILED, INTERRUPTED_ERROR, QUEUED, RUNNING, SUCCEEDED, JobManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    finished = {}
+
+    def on_update(job, change):
+        # "finished" is published after the final state has been persisted
+        if change == "finished":
+            finished.setdefault(job.job_id, threading.Event()).set()
+
+    manager = JobManager(str(tmp_path / "jobs.db"), max_workers=2, on_update=on_update)
+    manager.finished = finished
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(manager, job):
+    assert manager.finished.setdefault(job.job_id, threading.Event()).wait(5)
+
+
+def test_jobs_share_one_connection(manager):
+    for i in range(5):
+        job, created = manager.submit(f"refresh{i}", lambda job: job.update(50, "Halfway"))
+        assert created
+        wait_for(manager, job)
+    assert len(manager._db._connections) == 1
+    history = manager.history()
+    assert [record["state"] for record in history] == [SUCCEEDED] * 5
+    assert len(manager._db._connections) == 1
+
+
+def test_duplicate_submit_attaches_to_the_active_job(manager):
+    release = threading.Event()
+    first, created = manager.submit("refresh", lambda job: release.wait(5))
+    second, attached = manager.submit("refresh", lambda job: None)
+    assert created and not attached
+    assert second is first
+    release.set()
+    wait_for(manager, first)
+
+
+def test_cancelled_job_is_recorded(manager):
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        job.cancel_event.wait(5)
+        job.check_cancelled()
+
+    job, _ = manager.submit("refresh", work)
+    started.wait(5)
+    assert manager.cancel(job.job_id)
+    wait_for(manager, job)
+    assert manager.get(job.job_id)["state"] == CANCELLED
+    assert manager.history(1)[0]["error"] == "Job was cancelled"
+
+
+def test_restart_fails_jobs_left_active(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    with TikTokDatabase(db_path) as db:
+        for job_id, state in [("queued1", QUEUED), ("running1", RUNNING), ("done1", SUCCEEDED)]:
+            db.save_job({"job_id": job_id, "kind": "refresh", "state": state, "created_at": 1.0,
+                         "finished_at": 2.0 if state == SUCCEEDED else None})
+
+    manager = JobManager(db_path, max_workers=1)
+    try:
+        assert manager.interrupted == 2
+        jobs = {job["job_id"]: job for job in manager.history()}
+        for job_id in ("queued1", "running1"):
+            assert jobs[job_id]["state"] == FAILED
+            assert jobs[job_id]["error"] == INTERRUPTED_ERROR
+            assert jobs[job_id]["finished_at"] is not None
+        assert jobs["done1"]["state"] == SUCCEEDED
+        assert jobs["done1"]["finished_at"] == 2.0
+    finally:
+        manager.shutdown()
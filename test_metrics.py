@@ -0,0 +1,101 @@
+"""metrics: Prometheus exposition, run reports and merging them back in."""
+
+import importlib
+import json
+
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+@pytest.fixture
+def registry():
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Requests by status", ("endpoint", "status"))
+    requests.inc(endpoint="/api/x", status=200)
+    requests.inc(2, endpoint="/api/x", status=200)
+    requests.inc(endpoint="/api/x", status=500)
+    latency = registry.histogram("demo_latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.5):
+        latency.observe(value, endpoint="/api/x")
+    return registry
+
+
+def test_prometheus_exposition_lines(registry):
+    assert registry.to_prometheus().splitlines() == [
+        "# HELP demo_latency_seconds Latency",
+        "# TYPE demo_latency_seconds histogram",
+        'demo_latency_seconds_bucket{endpoint="/api/x",le="0.1"} 1',
+        'demo_latency_seconds_bucket{endpoint="/api/x",le="1"} 2',
+        'demo_latency_seconds_bucket{endpoint="/api/x",le="+Inf"} 3',
+        'demo_latency_seconds_sum{endpoint="/api/x"} 3.05',
+        'demo_latency_seconds_count{endpoint="/api/x"} 3',
+        "# HELP demo_requests_total Requests by status",
+        "# TYPE demo_requests_total counter",
+        'demo_requests_total{endpoint="/api/x",status="200"} 3',
+        'demo_requests_total{endpoint="/api/x",status="500"} 1',
+    ]
+
+
+def test_label_values_and_help_are_escaped():
+    registry = Registry()
+    registry.counter("demo_total", "Path like C:\\temp", ("path",)).inc(path='a "b"\\c\nd')
+    assert registry.to_prometheus().splitlines() == [
+        "# HELP demo_total Path like C:\\\\temp",
+        "# TYPE demo_total counter",
+        'demo_total{path="a \\"b\\"\\\\c\\nd"} 1',
+    ]
+
+
+def test_counters_reject_wrong_labels_and_decrements(registry):
+    requests = registry.counter("demo_requests_total", "Requests by status", ("endpoint", "status"))
+    with pytest.raises(ValueError):
+        requests.inc(endpoint="/api/x")
+    with pytest.raises(ValueError):
+        requests.inc(-1, endpoint="/api/x", status=200)
+    with pytest.raises(ValueError):
+        registry.histogram("demo_requests_total")
+
+
+def test_run_report_round_trips_through_merge_report(registry, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    path = metrics.write_report("demo", 0.0, str(tmp_path / "report.json"), ok=True, videos=3)
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert path == str(tmp_path / "report.json")
+    assert (report["format"], report["script"], report["ok"], report["videos"]) == (1, "demo", True, 3)
+    assert report["metrics"]["demo_latency_seconds"]["series"] == [
+        {"labels": {"endpoint": "/api/x"}, "count": 3, "sum": 3.05, "max": 2.5, "bucket_counts": [1, 1, 1]},
+    ]
+
+    # Merging a report adds its series to what this process already has
+    assert metrics.merge_report(path)
+    lines = registry.to_prometheus().splitlines()
+    assert 'demo_latency_seconds_bucket{endpoint="/api/x",le="+Inf"} 6' in lines
+    assert 'demo_latency_seconds_count{endpoint="/api/x"} 6' in lines
+    assert 'demo_requests_total{endpoint="/api/x",status="200"} 6' in lines
+
+    fresh = Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", fresh)
+    assert metrics.merge_report(path)
+    assert fresh.snapshot() == report["metrics"]
+
+
+def test_disabled_or_missing_reports(tmp_path):
+    assert metrics.write_report("demo", 0.0, "") is None
+    assert not metrics.merge_report(str(tmp_path / "missing.json"))
+
+
+def test_app_serves_metrics(monkeypatch, tmp_path):
+    # app opens its jobs database relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    app = importlib.import_module("app")
+    metrics.counter("demo_app_hits_total", "Test hits").inc()
+
+    resp = app.app.test_client().get("/metrics")
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain; version=0.0.4")
+    body = resp.get_data(as_text=True)
+    assert "# TYPE demo_app_hits_total counter" in body
+    assert "demo_app_hits_total 1" in body.splitlines()
+    assert "# TYPE tiktok_stage_seconds histogram" in body
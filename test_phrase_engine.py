@@ -0,0 +1,57 @@
+"""phrase_engine: parallel counts equal serial counts, down to tie order."""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import phrase_engine
+from phrase_engine import count_phrases_parallel, tree_reduce
+from text_analytics import count_comment_phrases, count_extract_phrases
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize("count", [count_extract_phrases, count_comment_phrases])
+def test_parallel_matches_serial(golden_phrases, pool, monkeypatch, count):
+    corpus = golden_phrases["corpus"]
+    monkeypatch.setattr(phrase_engine, "PARALLEL_THRESHOLD", len(corpus) // 2)
+    serial = count(corpus)
+
+    # Uneven chunks give the tree reduction an odd level to carry
+    parallel = count_phrases_parallel(corpus, count, workers=3, chunk_size=len(corpus) // 5 + 1,
+                                      executor=pool)
+
+    assert parallel == serial
+    assert list(parallel.items()) == list(serial.items())
+    assert parallel.most_common(200) == serial.most_common(200)
+
+
+def test_below_threshold_counts_serially(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("small inputs must not start a pool")
+    monkeypatch.setattr(phrase_engine, "ProcessPoolExecutor", no_pool)
+    texts = ["dance party tonight"] * 3
+    assert count_phrases_parallel(texts, count_extract_phrases, workers=4) == count_extract_phrases(texts)
+
+
+def test_tree_reduce_of_no_counters_is_empty():
+    assert tree_reduce([]) == Counter()
+
+
+def test_tree_reduce_odd_list_keeps_first_seen_order():
+    counters = [Counter({"b": 1, "a": 1}), Counter({"c": 2}), Counter({"a": 1, "d": 1}),
+                Counter({"e": 1}), Counter({"b": 2})]
+    merged = tree_reduce(counters)
+    assert merged == Counter({"b": 3, "a": 2, "c": 2, "d": 1, "e": 1})
+    assert list(merged) == ["b", "a", "c", "d", "e"]
+    assert merged.most_common(3) == [("b", 3), ("a", 2), ("c", 2)]
+
+
+def test_tree_reduce_single_counter_is_returned_as_is():
+    only = Counter({"x": 1})
+    assert tree_reduce([only]) is only
@@ -0,0 +1,66 @@
+"""Data source interface, record/replay and offline fetch_tikhub runs."""
+
+import json
+
+import pytest
+
+import fetch_tikhub
+from sources import DataSource, RecordingSource, ReplaySource, synthesize_recording
+
+
+class ListSource(DataSource):
+    name = "list"
+
+    def __init__(self, videos, comments):
+        self.videos = videos
+        self.comments = comments
+
+    def iter_videos(self, max_videos=None):
+        return iter(self.videos[:max_videos])
+
+    def fetch_comments(self, video_id, max_comments=20):
+        return self.comments.get(video_id, [])[:max_comments]
+
+
+def test_sources_must_implement_the_interface():
+    class VideosOnly(DataSource):
+        def iter_videos(self, max_videos=None):
+            return iter([])
+
+    with pytest.raises(TypeError):
+        DataSource()
+    with pytest.raises(TypeError):
+        VideosOnly()
+
+
+def test_recording_replays_the_same_responses(tmp_path):
+    videos = [{"id": "v1", "stats": {"diggCount": 3}}, {"id": "v2", "stats": {"diggCount": 5}}]
+    comments = {"v1": [{"cid": "c1", "text": "so funny"}], "v2": []}
+    path = str(tmp_path / "run.jsonl.gz")
+    with RecordingSource(ListSource(videos, comments), path) as source:
+        recorded = list(source.iter_videos(2))
+        recorded_comments = source.fetch_comments("v1", 5)
+
+    with ReplaySource(path) as replay:
+        assert list(replay.iter_videos(2)) == recorded
+        assert replay.fetch_comments("v1", 5) == recorded_comments == comments["v1"]
+
+
+def snapshot(path):
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
+def test_replay_writes_only_the_given_outputs(tmp_path):
+    recording = str(tmp_path / "synthetic.jsonl.gz")
+    synthesize_recording(recording, n_videos=5, comments_per_video=3)
+    live = [fetch_tikhub.DATA_FILE, fetch_tikhub.STATE_FILE, fetch_tikhub.IMAGES_DIR / ".cache_index.json"]
+    before = [snapshot(path) for path in live]
+
+    data_file, state_file = tmp_path / "out" / "dashboard.json", tmp_path / "out" / "state.json"
+    data_file.parent.mkdir()
+    assert fetch_tikhub.main(workers=2, max_videos=5, source=ReplaySource(recording), report_file="",
+                             data_file=data_file, state_file=state_file)
+
+    assert json.loads(data_file.read_text())["stats"]["total_videos"] == 5
+    assert state_file.exists()
+    assert [snapshot(path) for path in live] == before
@@ -0,0 +1,87 @@
+"""AssetStore memory budget and request-time variant writes."""
+
+import os
+
+from flask import Flask, request
+
+from static_assets import ENTRY_OVERHEAD, AssetStore
+
+app = Flask(__name__)
+
+
+def write_asset(root, name, size):
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(('{"comment": "so funny", "likes": 12}\n' * (size // 37 + 1))[:size])
+    return path
+
+
+def get(store, rel_path, **headers):
+    with app.test_request_context(headers=headers):
+        return store.response(rel_path, request)
+
+
+def test_requests_do_not_write_variants(tmp_path):
+    write_asset(tmp_path, "dashboard_data.json", 50_000)
+    store = AssetStore(str(tmp_path))
+    resp = get(store, "dashboard_data.json", **{"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert sorted(os.listdir(tmp_path)) == ["dashboard_data.json"]
+
+
+def test_writable_store_writes_variants(tmp_path):
+    write_asset(tmp_path, "dashboard_data.json", 50_000)
+    store = AssetStore(str(tmp_path), write_variants=True)
+    get(store, "dashboard_data.json", **{"Accept-Encoding": "gzip"})
+    assert "dashboard_data.json.gz" in os.listdir(tmp_path)
+
+
+def test_cache_stays_within_budget(tmp_path):
+    for i in range(10):
+        write_asset(tmp_path, f"data{i}.json", 20_000)
+    store = AssetStore(str(tmp_path), budget=60_000)
+    for i in range(10):
+        assert get(store, f"data{i}.json").status_code == 200
+        assert store.memory_bytes <= 60_000
+    # The most recent asset is still cached; the oldest was evicted
+    assert store.get("data9.json") is store.get("data9.json")
+    assert os.path.join(str(tmp_path), "data0.json") not in store._assets
+
+
+def test_recently_used_assets_survive_eviction(tmp_path):
+    for i in range(3):
+        write_asset(tmp_path, f"data{i}.json", 20_000)
+    store = AssetStore(str(tmp_path), budget=50_000)
+    first = store.get("data0.json")
+    store.get("data1.json")
+    store.get("data0.json")
+    store.get("data2.json")
+    assert store.get("data0.json") is first
+
+
+def test_images_keep_only_validators(tmp_path):
+    image = tmp_path / "images" / "cover_0123456789abcdef.jpg"
+    image.parent.mkdir()
+    image.write_bytes(b"\xff\xd8" + os.urandom(4096))
+    store = AssetStore(str(tmp_path))
+    resp = get(store, "images/cover_0123456789abcdef.jpg")
+    assert resp.status_code == 200
+    assert store.memory_bytes == ENTRY_OVERHEAD
+    resp.direct_passthrough = False
+    assert resp.get_data() == image.read_bytes()
+    etag = resp.headers["ETag"]
+    assert get(store, "images/cover_0123456789abcdef.jpg", **{"If-None-Match": etag}).status_code == 304
+
+
+def test_image_entries_are_evicted(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    for i in range(10):
+        (images / f"cover_{i:016x}.jpg").write_bytes(b"\xff\xd8" + os.urandom(256))
+    store = AssetStore(str(tmp_path), budget=4 * ENTRY_OVERHEAD)
+    for i in range(10):
+        assert get(store, f"images/cover_{i:016x}.jpg").status_code == 200
+        assert store.memory_bytes <= 4 * ENTRY_OVERHEAD
+    assert len(store._assets) == 4
+    assert os.path.join(str(images), f"cover_{0:016x}.jpg") not in store._assets
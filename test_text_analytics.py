@@ -0,0 +1,56 @@
+"""Phrase outputs pinned against golden digests, plus the tokenizer profiles."""
+
+import hashlib
+import json
+
+import pytest
+
+from database_helper import TikTokDatabase
+from fetch_tikhub import extract_phrases
+from text_analytics import (DATABASE_STOPWORDS, count_comment_phrases, count_extract_phrases, tokenize,
+                            suppress_near_duplicates)
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+@pytest.fixture(scope="module")
+def golden_outputs(golden_phrases, tmp_path_factory):
+    """Digest of each pinned output on the golden corpus"""
+    corpus = golden_phrases["corpus"]
+    db_path = tmp_path_factory.mktemp("golden") / "golden.db"
+    with TikTokDatabase(str(db_path)) as db:
+        db.ingest_batch([{"video_id": "golden", "comments": [
+            {"comment_id": f"golden{i}", "text": text} for i, text in enumerate(corpus)
+        ]}])
+        top_phrases = db.get_top_phrases(30, approximate=False)
+    return {
+        "count_comment_phrases": digest(list(count_comment_phrases(corpus).items())),
+        "count_extract_phrases": digest(list(count_extract_phrases(corpus).items())),
+        "extract_phrases": digest(extract_phrases(corpus, 30, approximate=False)),
+        "get_top_phrases": digest(top_phrases),
+    }
+
+
+@pytest.mark.parametrize("name", ["count_comment_phrases", "count_extract_phrases",
+                                  "extract_phrases", "get_top_phrases"])
+def test_matches_golden_digest(golden_phrases, golden_outputs, name):
+    assert golden_outputs[name] == golden_phrases["digests"][name]
+
+
+def test_profiles_tokenize_punctuation_differently():
+    assert tokenize("Don't stop!! 😂 now") == ["don", "t", "stop", "now"]
+    assert tokenize("Don't stop!! 😂 now", keep_punctuation=True) == ["don't", "stop!!", "now"]
+    assert "the" in DATABASE_STOPWORDS
+
+
+def test_counts_keep_first_seen_order_for_ties():
+    counts = count_extract_phrases(["dance party tonight", "best song ever"])
+    assert list(counts)[:2] == ["dance party", "party tonight"]
+    assert set(counts.values()) == {1}
+
+
+def test_suppress_near_duplicates_drops_contained_phrases():
+    candidates = [("best dance ever", 9), ("best dance", 8), ("love song", 5), ("dance ever", 4)]
+    assert suppress_near_duplicates(candidates, 10) == [("best dance ever", 9), ("love song", 5)]
@@ -0,0 +1,109 @@
+"""TikHubClient retries, Retry-After handling and request budget, on a mocked session."""
+
+import io
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+
+import pytest
+import requests
+
+import tikhub_client
+from tikhub_client import RETRY_STATUSES, RequestBudgetExceeded, TikHubClient
+
+URL = "https://api.tikhub.io/api/v1/tiktok/web/fetch_explore_post"
+
+
+def response(status: int, **headers) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers)
+    resp.raw = io.BytesIO(b"")
+    return resp
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Seconds the client slept between attempts, without sleeping"""
+    delays = []
+    monkeypatch.setattr(tikhub_client.time, "sleep", delays.append)
+    return delays
+
+
+def client_returning(*outcomes, **options) -> TikHubClient:
+    client = TikHubClient(**options)
+    client.session = mock.Mock(spec=requests.Session)
+    client.session.get.side_effect = list(outcomes)
+    return client
+
+
+def test_retry_after_seconds_is_honoured(sleeps):
+    client = client_returning(response(429, **{"Retry-After": "3"}), response(200))
+    assert client.get(URL).status_code == 200
+    assert sleeps == [3.0]
+    assert (client.requests_made, client.retries) == (2, 1)
+
+
+def test_retry_after_http_date_is_honoured(sleeps):
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    client = client_returning(response(503, **{"Retry-After": when}), response(200))
+    assert client.get(URL).status_code == 200
+    assert 8 <= sleeps[0] <= 10
+
+
+def test_retry_after_is_capped_at_backoff_max(sleeps):
+    client = client_returning(response(429, **{"Retry-After": "3600"}), response(200), backoff_max=5)
+    client.get(URL)
+    assert sleeps == [5]
+
+
+def test_backoff_without_retry_after_is_jittered_and_bounded(sleeps):
+    client = client_returning(*[response(502)] * 4, response(200), backoff_base=1, backoff_max=4)
+    assert client.get(URL).status_code == 200
+    assert len(sleeps) == 4
+    assert all(0 <= delay <= min(4, 2 ** attempt) for attempt, delay in enumerate(sleeps))
+
+
+@pytest.mark.parametrize("status", sorted(RETRY_STATUSES))
+def test_retries_transient_statuses(sleeps, status):
+    client = client_returning(response(status), response(200))
+    assert client.get(URL).status_code == 200
+    assert client.session.get.call_count == 2
+
+
+@pytest.mark.parametrize("status", [200, 400, 401, 403, 404, 501])
+def test_other_statuses_are_returned_at_once(sleeps, status):
+    client = client_returning(response(status))
+    assert client.get(URL).status_code == status
+    assert client.session.get.call_count == 1
+    assert sleeps == []
+
+
+def test_connection_errors_are_retried_then_raised(sleeps):
+    client = client_returning(*[requests.ConnectionError("reset")] * 3, max_retries=2)
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL)
+    assert client.session.get.call_count == 3
+    assert client.retries == 2
+
+
+def test_last_transient_response_is_returned_after_max_retries(sleeps):
+    client = client_returning(*[response(500)] * 3, max_retries=2)
+    assert client.get(URL).status_code == 500
+    assert client.session.get.call_count == 3
+
+
+def test_budget_counts_every_attempt(sleeps):
+    client = client_returning(response(429), response(429), response(200), request_budget=2)
+    with pytest.raises(RequestBudgetExceeded):
+        client.get(URL)
+    assert client.session.get.call_count == 2
+    assert client.requests_made == 2
+
+
+def test_exhausted_budget_sends_nothing(sleeps):
+    client = client_returning(response(200), request_budget=1)
+    client.get(URL)
+    with pytest.raises(RequestBudgetExceeded):
+        client.get(URL)
+    assert client.session.get.call_count == 1
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Text normalization and phrase counting shared by the fetch and database paths.
+
+Both paths count 2-4 word phrases, with two long-standing profiles:
+
+- database (TikTokDatabase / phrase_counts): keeps basic punctuation
+  (. , ! ? - ') inside tokens and uses the long stopword list
+- fetch (fetch_tikhub.extract_phrases): strips all punctuation and uses
+  the short stopword list
+
+Patterns are compiled once and stopword sets are frozen at import. A
+comment is tokenized in a single pass: one substitution, then lower()
+and split(). N-grams are counted as token tuples and joined into
+strings once per distinct phrase at the end. Outputs, including the
+first-seen order that breaks count ties, match the implementations this
+module replaced; test_text_analytics.py checks that against golden
+digests pinned in testdata/golden_phrases.json.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+
+MIN_COMMENT_LENGTH = 4
+MIN_WORD_LENGTH = 2
+NGRAM_SIZES = (2, 3, 4)
+
+# Everything except word characters and whitespace
+_NON_WORD = re.compile(r'[^\w\s]')
+# Same, but basic punctuation survives inside tokens
+_NON_WORD_KEEP_PUNCTUATION = re.compile(r"[^\w\s\.\,\!\?\-\']")
+
+# Moderate stopwords - more than essential but less than original
+DATABASE_STOPWORDS: FrozenSet[str] = frozenset([
+    'the', 'and', 'for', 'that', 'with', 'this', 'you', 'your', 'are', 'was', 'but', 'not', 'have', 'has',
+    'just', 'like', 'get', 'got', 'all', 'out', 'too', 'can', 'she', 'him', 'her', 'his', 'our', 'they',
+    'from', 'who', 'had', 'did', 'its', 'i', 'me', 'my', 'we', 'he', 'it', 'to', 'of', 'in', 'on', 'is',
+    'a', 'an', 'at', 'as', 'so', 'be', 'by', 'or', 'if', 'do', 'no', 'yes', 'up', 'down', 'off', 'these',
+    'those', 'their', 'them', 'then', 'than', 'will', 'would', 'should', 'could', 'about', 'over', 'under',
+    'again', 'when', 'where', 'why', 'how', 'what', 'which', 'because', 'while', 'were', 'been', 'am', 'im',
+    'u', 'ur', 'isnt', 'dont', 'doesnt', 'cant', 'wont', 'youre', 'youve', 'youll', 'youd', 'hes', 'shes',
+    'theyre', 'weve', "we're", 'ive', 'ill', 'id', 'didnt', 'wasnt', 'arent', 'havent', 'hasnt', 'hadnt',
+    'couldnt', 'shouldnt', 'wouldnt', 'oh', 'ok', 'okay', 'yeah', 'nah', 'huh', 'hmm', 'lol', 'lmao', 'omg',
+    'pls', 'please', 'thanks', 'thank', 'welcome', 'hi', 'hey', 'yo', 'sup', 'bye', 'goodbye', 'see', 'ya',
+    'later', 'soon', 'now', 'never', 'always', 'sometimes', 'often', 'usually', 'rarely', 'seldom', 'once',
+    'twice', 'first', 'last', 'next', 'new', 'old', 'young', 'big', 'small', 'large', 'little', 'long',
+    'short', 'high', 'low', 'early', 'late', 'best', 'worst', 'better', 'worse', 'same', 'different',
+    'other', 'another', 'more', 'most', 'less', 'least', 'many', 'much', 'few', 'several', 'some', 'any',
+    'every', 'each',
+])
+
+FETCH_STOPWORDS: FrozenSet[str] = frozenset([
+    'the', 'and', 'for', 'that', 'with', 'this', 'you', 'your', 'are', 'was',
+    'but', 'not', 'have', 'has', 'just', 'like', 'get', 'got', 'all', 'out',
+    'too', 'can', 'she', 'him', 'her', 'his', 'our', 'they', 'from', 'who',
+    'had', 'did', 'its', 'i', 'me', 'my', 'we', 'he', 'it', 'to', 'of', 'in',
+    'on', 'is', 'a', 'an', 'at', 'as', 'so', 'be', 'by', 'or', 'if', 'do',
+    'no', 'yes', 'up', 'down', 'off', 'lol', 'lmao', 'omg', 'im', 'u', 'ur',
+])
+
+
+def tokenize(text: str, keep_punctuation: bool = False) -> List[str]:
+    """Lowercased tokens of text in one pass (sub, lower, split)."""
+    pattern = _NON_WORD_KEEP_PUNCTUATION if keep_punctuation else _NON_WORD
+    return pattern.sub(' ', text).lower().split()
+
+
+def content_words(text: str, stopwords: FrozenSet[str], keep_punctuation: bool = False) -> List[str]:
+    """Tokens of text that are not stopwords and at least MIN_WORD_LENGTH long."""
+    return [w for w in tokenize(text, keep_punctuation)
+            if len(w) >= MIN_WORD_LENGTH and w not in stopwords]
+
+
+def ngrams(tokens: List[str], n: int) -> Iterator[Tuple[str, ...]]:
+    """Consecutive n-token tuples of tokens."""
+    return zip(*(tokens[i:] for i in range(n)))
+
+
+def count_phrase_tuples(comments: Iterable[str], stopwords: FrozenSet[str],
+                        keep_punctuation: bool = False) -> Counter:
+    """Count 2-4 token n-grams per comment, keyed by token tuple."""
+    counts = Counter()
+    for comment in comments:
+        if not comment or len(comment.strip()) < MIN_COMMENT_LENGTH:
+            continue
+        words = content_words(comment, stopwords, keep_punctuation)
+        if len(words) < 2:
+            continue
+        for n in NGRAM_SIZES:
+            counts.update(ngrams(words, n))
+    return counts
+
+
+def iter_phrases(comments: Iterable[str], stopwords: FrozenSet[str],
+                 keep_punctuation: bool = False) -> Iterator[str]:
+    """Yield every 2-4 word phrase occurrence, for streaming counters."""
+    for comment in comments:
+        if not comment or len(comment.strip()) < MIN_COMMENT_LENGTH:
+            continue
+        words = content_words(comment, stopwords, keep_punctuation)
+        if len(words) < 2:
+            continue
+        for n in NGRAM_SIZES:
+            for gram in ngrams(words, n):
+                yield ' '.join(gram)
+
+
+def join_phrases(tuple_counts: Counter) -> Counter:
+    """Turn tuple keys into space-joined phrases, keeping first-seen order."""
+    # Tokens never contain whitespace, so distinct tuples give distinct strings
+    return Counter({' '.join(key): count for key, count in tuple_counts.items()})
+
+
+def count_comment_phrases(comments: Iterable[str]) -> Counter:
+    """Phrase counts with the database profile (phrase_counts)."""
+    return join_phrases(count_phrase_tuples(comments, DATABASE_STOPWORDS, keep_punctuation=True))
+
+
+def count_extract_phrases(comments: Iterable[str]) -> Counter:
+    """Phrase counts with the fetch profile (fetch_tikhub.extract_phrases)."""
+    return join_phrases(count_phrase_tuples(comments, FETCH_STOPWORDS))
+
+
+def iter_comment_phrases(comments: Iterable[str]) -> Iterator[str]:
+    """Phrase occurrences with the database profile."""
+    return iter_phrases(comments, DATABASE_STOPWORDS, keep_punctuation=True)
+
+
+def iter_extract_phrases(comments: Iterable[str]) -> Iterator[str]:
+    """Phrase occurrences with the fetch profile."""
+    return iter_phrases(comments, FETCH_STOPWORDS)
+
+
+def is_quality_phrase(phrase: str) -> bool:
+    """Check if phrase is meaningful - moderate criteria"""
+    words = phrase.split()
+    # Filter out phrases that are too repetitive - moderate threshold
+    if len(set(words)) < len(words) * 0.6:  # At least 60% unique words
+        return False
+    # Filter out very short words in longer phrases - moderate criteria
+    if len(words) > 2:
+        short_words = sum(1 for w in words if len(w) < 3)
+        if short_words > len(words) * 0.6:  # More than 60% short words
+            return False
+    return True
+
+
+def _sorted_ngrams(tokens: List[str], n: int) -> Iterator[Tuple[str, ...]]:
+    """Order-insensitive keys of the contiguous n-token runs of tokens."""
+    return (tuple(sorted(gram)) for gram in ngrams(tokens, n))
+
+
+def suppress_near_duplicates(candidates: Iterable[Tuple[str, int]], limit: int) -> List[Tuple[str, int]]:
+    """Accept ranked (phrase, count) pairs, skipping near-duplicates of accepted ones.
+
+    A candidate is a near-duplicate when its words, in any order, form a
+    contiguous run of an accepted phrase at most one word longer, or an
+    accepted phrase one word shorter forms a run of the candidate. Runs are
+    looked up in an index of sorted sub-n-grams, so each candidate costs a
+    few dict probes however many phrases have been accepted.
+    """
+    accepted: List[Tuple[str, int]] = []
+    # sorted run of n or n-1 words of an accepted phrase -> accepted phrase lengths
+    runs: Dict[Tuple[str, ...], Set[int]] = {}
+    for phrase, count in candidates:
+        if count < 2:
+            continue
+        tokens = phrase.lower().split()
+        size = len(tokens)
+        if tuple(sorted(tokens)) in runs:
+            continue
+        if any(size - 1 in runs.get(key, ()) for key in _sorted_ngrams(tokens, size - 1)):
+            continue
+        accepted.append((phrase, count))
+        if len(accepted) >= limit:
+            break
+        for n in (size, size - 1):
+            for key in _sorted_ngrams(tokens, n):
+                runs.setdefault(key, set()).add(size)
+    return accepted
+
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the TikHub API and TikTok CDN downloads.
+One pooled session is reused for every request of a refresh run, with
+retries, backoff and a per-run request budget.
+"""
+
+import os
+import time
+import random
+import threading
+import requests
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Configuration
+POOL_SIZE = int(os.environ.get("TIKHUB_POOL_SIZE", "16"))
+PER_HOST_LIMIT = int(os.environ.get("TIKHUB_PER_HOST_LIMIT", "4"))
+MAX_RETRIES = int(os.environ.get("TIKHUB_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.environ.get("TIKHUB_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("TIKHUB_BACKOFF_MAX", "30"))
+REQUEST_BUDGET = int(os.environ.get("TIKHUB_REQUEST_BUDGET", "0")) or None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+HTTP_SECONDS = metrics.histogram("tiktok_http_request_seconds",
+                                 "Time to response headers per attempt", ("endpoint",))
+HTTP_REQUESTS = metrics.counter("tiktok_http_requests_total", "Request attempts by outcome",
+                                ("endpoint", "status"))
+HTTP_RETRIES = metrics.counter("tiktok_http_retries_total", "Retried attempts", ("endpoint",))
+
+
+def endpoint_label(url: str) -> str:
+    """API paths by name; CDN downloads by host, so image URLs don't each get a series."""
+    parsed = urlparse(url)
+    return parsed.path if parsed.path.startswith("/api/") else parsed.netloc
+
+
+class RequestBudgetExceeded(Exception):
+    """Raised when a run has used up its request budget."""
+
+
+class HostLimiter:
+    """Caps the number of in-flight requests per host across worker threads."""
+
+    def __init__(self, limit: int = PER_HOST_LIMIT):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        """Hold one of the host's request slots for the duration of the block."""
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.Semaphore(self.limit)
+        with semaphore:
+            yield
+
+
+class TikHubClient:
+    """Pooled, retrying HTTP client shared by all fetches in a run."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, per_host_limit: int = PER_HOST_LIMIT,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, request_budget: Optional[int] = REQUEST_BUDGET):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_budget = request_budget
+        self.host_limiter = HostLimiter(per_host_limit)
+
+        # Keep-alive connections are reused across requests and threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.requests_made = 0
+        self.retries = 0
+
+    def _spend_request(self):
+        """Count one request against the budget, raising once it is used up."""
+        with self._lock:
+            if self.request_budget is not None and self.requests_made >= self.request_budget:
+                raise RequestBudgetExceeded(f"Request budget of {self.request_budget} exhausted")
+            self.requests_made += 1
+
+    def _backoff_delay(self, attempt: int, resp: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before the next attempt (Retry-After or full-jitter backoff)."""
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    delay = (when - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET a URL, retrying transient failures (429/5xx, connection errors)."""
+        attempt = 0
+        endpoint = endpoint_label(url)
+        while True:
+            self._spend_request()
+            resp = None
+            try:
+                with self.host_limiter.slot(url):
+                    with HTTP_SECONDS.time(endpoint=endpoint):
+                        resp = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                HTTP_REQUESTS.inc(endpoint=endpoint, status="error")
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                HTTP_REQUESTS.inc(endpoint=endpoint, status=resp.status_code)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return resp
+                resp.close()
+
+            delay = self._backoff_delay(attempt, resp)
+            with self._lock:
+                self.retries += 1
+            HTTP_RETRIES.inc(endpoint=endpoint)
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        """Release pooled connections."""
+        self.session.close()
+
+
+_default_client: Optional[TikHubClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> TikHubClient:
+    """Return the process-wide shared client, creating it on first use."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = TikHubClient()
+        return _default_client